@@ -0,0 +1,176 @@
+#!/usr/bin/env python
+"""
+Throughput and latency benchmark of the client against a local MockShapeShiftServer.
+
+Runs the same workload through each client mode and reports requests/sec, p50/p99 latency of the
+successful calls, the fraction of calls that failed (see --error-rate) and the peak memory allocated
+while running it (tracemalloc, measured in a separate sequential pass):
+
+    urlopen        ShapeShiftIO over UrlopenTransport: a new connection per call, as before pooling.
+    pooled         ShapeShiftIO over the keep-alive ConnectionPool (the default).
+    pooled-cached  as pooled, with a TTLCache installed.
+    async          AsyncShapeShiftIO, concurrency requests in flight on one event loop.
+    async-uncoalesced  as async, without single-flight coalescing.
+
+Example:
+
+    python benchmarks/bench_client.py --requests 2000 --concurrency 16 --latency 0.001
+"""
+
+import argparse
+import os
+import sys
+import threading
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
+
+from shapeshiftio import shapeshiftio as api
+from shapeshiftio.cache import TTLCache
+from shapeshiftio.mockserver import MockShapeShiftServer
+from shapeshiftio.pool import ConnectionPool, UrlopenTransport
+
+try:
+    import asyncio
+    from shapeshiftio.aio import AsyncShapeShiftIO
+except (ImportError, SyntaxError):
+    AsyncShapeShiftIO = None
+
+MODES = ("urlopen", "pooled", "pooled-cached", "async", "async-uncoalesced")
+
+
+def _call(client, endpoint, i):
+    """ One workload call; pairs and addresses rotate so uncached runs do not all hit one URL. """
+    if endpoint == "rate":
+        return client.rate(("btc_ltc", "eth_btc", "ltc_xmr", "doge_btc")[i % 4])
+    if endpoint == "market_info":
+        return client.market_info(("btc_ltc", "eth_btc", "ltc_xmr", "doge_btc")[i % 4])
+    if endpoint == "tx_status":
+        return client.tx_status("1BoatSLRHtKNngkdXEeobR76b53LETtpy%d" % (i % 100))
+    if endpoint == "coin_list":
+        return client.coin_list()
+    raise ValueError("Unknown endpoint " + endpoint)
+
+
+def _sync_client(mode, url):
+    if mode == "urlopen":
+        return api.ShapeShiftIO(url_base=url, transport=UrlopenTransport())
+    if mode == "pooled":
+        return api.ShapeShiftIO(url_base=url, transport=ConnectionPool(maxsize=64))
+    return api.ShapeShiftIO(url_base=url, transport=ConnectionPool(maxsize=64), cache=TTLCache())
+
+
+def run_sync(mode, url, endpoint, requests, concurrency):
+    """ Returns (elapsed, latencies, errors) of requests calls spread over concurrency threads. """
+    client = _sync_client(mode, url)
+    latencies = []
+    errors = []
+    counter = iter(range(requests))
+    lock = threading.Lock()
+
+    def worker():
+        while True:
+            with lock:
+                i = next(counter, None)
+            if i is None:
+                return
+            start = time.perf_counter()
+            try:
+                _call(client, endpoint, i)
+            except Exception as e:
+                errors.append(e)
+            else:
+                latencies.append(time.perf_counter() - start)
+
+    threads = [threading.Thread(target=worker) for _ in range(concurrency)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - start
+    client.transport.close()
+    return elapsed, latencies, errors
+
+
+def run_async(mode, url, endpoint, requests, concurrency):
+    """ Returns (elapsed, latencies, errors) of requests coroutine calls, concurrency at a time. """
+    async def main():
+        client = AsyncShapeShiftIO(url_base=url, concurrency=concurrency, coalesce=(mode == "async"))
+        latencies = []
+        errors = []
+
+        async def one(i):
+            start = time.perf_counter()
+            try:
+                await _call(client, endpoint, i)
+            except Exception as e:
+                errors.append(e)
+            else:
+                latencies.append(time.perf_counter() - start)
+
+        start = time.perf_counter()
+        await asyncio.gather(*[one(i) for i in range(requests)])
+        elapsed = time.perf_counter() - start
+        client.close()
+        return elapsed, latencies, errors
+
+    return asyncio.run(main())
+
+
+def run(mode, url, endpoint, requests, concurrency):
+    if mode.startswith("async"):
+        return run_async(mode, url, endpoint, requests, concurrency)
+    return run_sync(mode, url, endpoint, requests, concurrency)
+
+
+def allocation_peak(mode, url, endpoint, requests):
+    """ Peak KiB allocated by the client while making requests calls sequentially. """
+    tracemalloc.start()
+    try:
+        run(mode, url, endpoint, requests, 1)
+        return tracemalloc.get_traced_memory()[1] / 1024.0
+    finally:
+        tracemalloc.stop()
+
+
+def percentile(sorted_values, fraction):
+    if not sorted_values:
+        return 0.0
+    return sorted_values[min(int(len(sorted_values) * fraction), len(sorted_values) - 1)]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("--modes", default=",".join(MODES), help="comma separated, from: " + ", ".join(MODES))
+    parser.add_argument("--endpoint", default="rate", choices=("rate", "market_info", "tx_status", "coin_list"))
+    parser.add_argument("--requests", type=int, default=1000)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--latency", type=float, default=0.0, help="seconds the mock server adds per response")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="fraction of responses that are HTTP 500s")
+    parser.add_argument("--alloc-requests", type=int, default=200, help="calls in the allocation pass, 0 to skip")
+    args = parser.parse_args(argv)
+
+    # The module-wide single-flight group would hide per-request costs of the sync modes.
+    api.default_flight = None
+
+    print("%-18s %10s %10s %10s %10s %12s" % ("mode", "req/s", "p50 ms", "p99 ms", "errors %", "alloc KiB"))
+    with MockShapeShiftServer(latency=args.latency, error_rate=args.error_rate) as server:
+        for mode in args.modes.split(","):
+            if mode.startswith("async") and AsyncShapeShiftIO is None:
+                print("%-18s skipped: asyncio client unavailable" % mode)
+                continue
+            run(mode, server.url, args.endpoint, min(args.requests, 50), args.concurrency)  # warm up
+            elapsed, latencies, errors = run(mode, server.url, args.endpoint, args.requests, args.concurrency)
+            latencies.sort()
+            calls = len(latencies) + len(errors)
+            peak = allocation_peak(mode, server.url, args.endpoint, args.alloc_requests) if args.alloc_requests else 0.0
+            print("%-18s %10.0f %10.2f %10.2f %10.1f %12.1f" % (mode, calls / elapsed,
+                                                                percentile(latencies, 0.50) * 1000,
+                                                                percentile(latencies, 0.99) * 1000,
+                                                                100.0 * len(errors) / max(calls, 1), peak))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,73 @@
+#!/usr/bin/env python
+"""
+Cold-start benchmark: time to import the package (and optionally send a first request) in a fresh
+interpreter, as a short-lived worker would.
+
+Each scenario runs in --runs new processes; the time is measured inside the process around the
+statement only, so interpreter startup is excluded. Reported are the median and best times.
+
+    baseline           what "import shapeshiftio" loaded before the package went lazy: shapeshiftio.shapeshiftio
+                       with urllib.request, urllib.parse and json imported eagerly
+    import             import shapeshiftio
+    from-import        from shapeshiftio import rate
+    first-request      from shapeshiftio import ShapeShiftIO, then one rate() against a MockShapeShiftServer
+    everything         from shapeshiftio import *, i.e. every submodule, including the optional ones
+
+Example:
+
+    python benchmarks/bench_import.py --runs 20
+"""
+
+import argparse
+import compileall
+import os
+import subprocess
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
+
+from shapeshiftio.mockserver import MockShapeShiftServer
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
+
+SCENARIOS = (
+    ("baseline", "import json, urllib.parse, urllib.request\nimport shapeshiftio.shapeshiftio"),
+    ("import", "import shapeshiftio"),
+    ("from-import", "from shapeshiftio import rate"),
+    ("first-request", "from shapeshiftio import ShapeShiftIO\nShapeShiftIO(url_base=URL).rate('btc_eth')"),
+    ("everything", "from shapeshiftio import *"),
+)
+
+TEMPLATE = """
+import time
+URL = %r
+start = time.perf_counter()
+%s
+print(time.perf_counter() - start)
+"""
+
+
+def _run(statement, url):
+    """ Runs statement in a new interpreter and returns the seconds it took. """
+    env = dict(os.environ)
+    env["PYTHONPATH"] = ROOT + os.pathsep + env.get("PYTHONPATH", "")
+    output = subprocess.check_output([sys.executable, "-c", TEMPLATE % (url, statement)], env=env)
+    return float(output.decode("ascii").strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--runs", type=int, default=10, help="fresh processes per scenario")
+    args = parser.parse_args()
+
+    with MockShapeShiftServer() as server:
+        # Write the bytecode up front (even under PYTHONDONTWRITEBYTECODE) so no scenario compiles sources.
+        compileall.compile_dir(os.path.join(ROOT, "shapeshiftio"), quiet=1)
+        print("%-14s %10s %10s" % ("scenario", "median ms", "best ms"))
+        for name, statement in SCENARIOS:
+            times = sorted(_run(statement, server.url) for _ in range(args.runs))
+            print("%-14s %10.1f %10.1f" % (name, 1000 * times[len(times) // 2], 1000 * times[0]))
+
+
+if __name__ == "__main__":
+    main()
@@ -8,4 +8,5 @@ setup(name='shapeshiftio',
         author_email='abitfan@ruggedinbox.com',
         license='MIT',
         packages=['shapeshiftio'],
+        extras_require={'http2': ['h2']},
         zip_safe=False)
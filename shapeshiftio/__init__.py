@@ -1 +1,71 @@
-from .shapeshiftio import ShapeShiftIO, rate, limit, market_info, recent_tx, tx_status, time_remaining, coin_list, tx_by_api_key, tx_by_address, validate_address, shift, set_mail, send_amount, cancel_pending
+"""
+Python client for the ShapeShift API.
+
+Names are imported lazily: `import shapeshiftio` loads nothing else, and the first access to a name
+(including `from shapeshiftio import rate`) imports only the submodule defining it. Network modules
+(http.client, ssl, socket) and the JSON backend are in turn imported when the first request is sent.
+"""
+
+import sys
+
+# Public name -> submodule defining it.
+_exports = {}
+for _module, _names in (
+        ("shapeshiftio", "ShapeShiftIO rate limit market_info recent_tx tx_status time_remaining coin_list "
+                         "tx_by_api_key tx_by_address iter_tx_by_api_key iter_tx_by_address validate_address "
+                         "shift set_mail send_amount cancel_pending"),
+        ("pool", "ConnectionPool UrlopenTransport"),
+        ("http2", "HTTP2Transport"),
+        ("cassette", "RecordingTransport ReplayTransport CassetteMiss"),
+        ("cache", "TTLCache"),
+        ("snapshot", "MarketSnapshot"),
+        ("sharedsnapshot", "SharedMarketSnapshot"),
+        ("routing", "RouteGraph Route"),
+        ("quoting", "quote_batch QuoteBatch"),
+        ("singleflight", "SingleFlight"),
+        ("fanout", "FanOut"),
+        ("ratelimit", "RateLimiter"),
+        ("resilience", "Resilience CircuitBreaker CircuitOpenError"),
+        ("instrument", "Instrumentation CallbackInstrumentation Metrics LatencyHistogram"),
+        ("watcher", "AddressWatcher StatusChange"),
+        ("feed", "TradeFeed"),
+        ("orders", "OrderManager OrderEvent"),
+        ("txsync", "TxSync"),
+        ("addresses", "AddressValidator"),
+        ("records", "TypedShapeShiftIO Rate Limit MarketInfo TxStatus ShiftResult"),
+        # The asyncio client needs Python 3.5+.
+        ("aio", "AsyncShapeShiftIO AsyncConnectionPool AsyncSingleFlight")):
+    for _name in _names.split():
+        _exports[_name] = _module
+del _module, _names, _name
+
+__all__ = sorted(_exports)
+
+
+def __getattr__(name):
+    from importlib import import_module
+    module = _exports.get(name)
+    if module is None:
+        # Submodules, e.g. shapeshiftio.shapeshiftio.default_cache after a plain `import shapeshiftio`.
+        try:
+            return import_module("." + name, __name__)
+        except ImportError as e:
+            if getattr(e, "name", None) != __name__ + "." + name:
+                raise
+        raise AttributeError("module 'shapeshiftio' has no attribute '%s'" % name)
+    value = getattr(import_module("." + module, __name__), name)
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted(set(globals()) | set(_exports))
+
+
+# Module __getattr__ needs Python 3.7+; older versions import everything up front.
+if sys.version_info < (3, 7):
+    for _name in __all__:
+        try:
+            __getattr__(_name)
+        except (ImportError, SyntaxError):
+            pass
@@ -0,0 +1,328 @@
+"""
+Offline address pre-validation.
+
+AddressValidator checks the checksummed address formats of the common coins locally (Base58Check,
+Bech32/Bech32m segwit and EIP-55 mixed-case hex) and rejects malformed addresses without a network
+call. The remote validate_address is only called for coins without a local format, and to confirm
+addresses that passed the local check; its verdicts are kept in an LRU.
+
+Formats are registered per coin symbol as in coin_list. Coins whose addresses need more than a
+checksum (e.g. Monero, or Bitcoin Cash's cashaddr) are deliberately left to the remote check.
+"""
+
+from collections import OrderedDict
+import hashlib
+import struct
+import threading
+
+from .shapeshiftio import coin_list, validate_address
+
+_bitcoin_alphabet = "123456789ABCDEFGHJKLMNPQRSTUVWXYZabcdefghijkmnopqrstuvwxyz"
+_ripple_alphabet = "rpshnaf39wBUDNEGHJKLM4PQRST7VWXYZ2bcdeCg65jkm8oFqi1tuvAxyz"
+_bech32_charset = "qpzry9x8gf2tvdw0s3jn54khce6mua7l"
+_bech32_const = 1
+_bech32m_const = 0x2bc830a3
+
+
+def _base58_decode(address, alphabet):
+    """ Internal. Returns the decoded bytearray, or None on a character outside the alphabet. """
+    number = 0
+    for char in address:
+        digit = alphabet.find(char)
+        if digit < 0:
+            return None
+        number = number * 58 + digit
+    body = bytearray()
+    while number:
+        number, byte = divmod(number, 256)
+        body.append(byte)
+    zeros = len(address) - len(address.lstrip(alphabet[0]))
+    body.extend(bytearray(zeros))
+    body.reverse()
+    return body
+
+
+def is_base58check(address, versions, alphabet=_bitcoin_alphabet, payload_size=20):
+    """
+    True if address is Base58Check encoded with one of the given version prefixes (bytes) followed by
+    payload_size bytes, and its double-SHA256 checksum matches.
+    """
+    if not 25 <= len(address) <= 40:
+        return False
+    raw = _base58_decode(address, alphabet)
+    if raw is None or len(raw) < 5:
+        return False
+    body, checksum = bytes(raw[:-4]), bytes(raw[-4:])
+    if hashlib.sha256(hashlib.sha256(body).digest()).digest()[:4] != checksum:
+        return False
+    for version in versions:
+        if body.startswith(version) and len(body) == len(version) + payload_size:
+            return True
+    return False
+
+
+def _bech32_polymod(values):
+    """ Internal """
+    generator = (0x3b6a57b2, 0x26508e6d, 0x1ea119fa, 0x3d4233dd, 0x2a1462b3)
+    checksum = 1
+    for value in values:
+        top = checksum >> 25
+        checksum = (checksum & 0x1ffffff) << 5 ^ value
+        for i in range(5):
+            if (top >> i) & 1:
+                checksum ^= generator[i]
+    return checksum
+
+
+def _bech32_decode(address):
+    """ Internal. Returns (hrp, data without checksum, checksum constant), or None if malformed. """
+    if address.lower() != address and address.upper() != address:
+        return None
+    address = address.lower()
+    separator = address.rfind("1")
+    if separator < 1 or separator + 7 > len(address) or len(address) > 90:
+        return None
+    hrp = address[:separator]
+    if any(ord(char) < 33 or ord(char) > 126 for char in hrp):
+        return None
+    data = []
+    for char in address[separator + 1:]:
+        value = _bech32_charset.find(char)
+        if value < 0:
+            return None
+        data.append(value)
+    expanded = [ord(char) >> 5 for char in hrp] + [0] + [ord(char) & 31 for char in hrp]
+    return hrp, data[:-6], _bech32_polymod(expanded + data)
+
+
+def _convert_bits(data, from_bits, to_bits):
+    """ Internal. Regroups bits without padding; returns None if the leftover bits are not zero padding. """
+    accumulator = bits = 0
+    result = []
+    for value in data:
+        accumulator = (accumulator << from_bits) | value
+        bits += from_bits
+        while bits >= to_bits:
+            bits -= to_bits
+            result.append((accumulator >> bits) & ((1 << to_bits) - 1))
+    if bits >= from_bits or (accumulator << (to_bits - bits)) & ((1 << to_bits) - 1):
+        return None
+    return result
+
+
+def is_segwit(address, hrps):
+    """ True if address is a valid segwit address (Bech32 for v0, Bech32m for v1+) for one of the hrps. """
+    decoded = _bech32_decode(address)
+    if decoded is None:
+        return False
+    hrp, data, constant = decoded
+    if hrp not in hrps or not data or data[0] > 16:
+        return False
+    if constant != (_bech32_const if data[0] == 0 else _bech32m_const):
+        return False
+    program = _convert_bits(data[1:], 5, 8)
+    if program is None or not 2 <= len(program) <= 40:
+        return False
+    return data[0] != 0 or len(program) in (20, 32)
+
+
+def is_bech32(address, hrps):
+    """ True if address is plain Bech32 (not segwit), e.g. Zcash Sapling addresses, for one of the hrps. """
+    decoded = _bech32_decode(address)
+    return decoded is not None and decoded[0] in hrps and decoded[2] == _bech32_const
+
+
+# Keccak-f[1600]. hashlib's sha3_256 pads differently from the Keccak-256 Ethereum uses, so it cannot
+# be used for EIP-55.
+_keccak_round_constants = (
+    0x0000000000000001, 0x0000000000008082, 0x800000000000808A, 0x8000000080008000,
+    0x000000000000808B, 0x0000000080000001, 0x8000000080008081, 0x8000000000008009,
+    0x000000000000008A, 0x0000000000000088, 0x0000000080008009, 0x000000008000000A,
+    0x000000008000808B, 0x800000000000008B, 0x8000000000008089, 0x8000000000008003,
+    0x8000000000008002, 0x8000000000000080, 0x000000000000800A, 0x800000008000000A,
+    0x8000000080008081, 0x8000000000008080, 0x0000000080000001, 0x8000000080008008)
+# Rotation offset of lane (x, y), as _keccak_rotations[x][y].
+_keccak_rotations = ((0, 36, 3, 41, 18), (1, 44, 10, 45, 2), (62, 6, 43, 15, 61), (28, 55, 25, 21, 56),
+                     (27, 20, 39, 8, 14))
+_mask64 = (1 << 64) - 1
+
+
+def _keccak_f(lanes):
+    """ Internal. One permutation of the 25 lanes, indexed x + 5 * y. """
+    for round_constant in _keccak_round_constants:
+        parity = [lanes[x] ^ lanes[x + 5] ^ lanes[x + 10] ^ lanes[x + 15] ^ lanes[x + 20] for x in range(5)]
+        for x in range(5):
+            rotated = ((parity[(x + 1) % 5] << 1) | (parity[(x + 1) % 5] >> 63)) & _mask64
+            d = parity[(x - 1) % 5] ^ rotated
+            for y in range(0, 25, 5):
+                lanes[x + y] ^= d
+        moved = [0] * 25
+        for x in range(5):
+            for y in range(5):
+                lane, shift = lanes[x + 5 * y], _keccak_rotations[x][y]
+                moved[y + 5 * ((2 * x + 3 * y) % 5)] = ((lane << shift) | (lane >> (64 - shift))) & _mask64
+        for y in range(0, 25, 5):
+            for x in range(5):
+                lanes[x + y] = moved[x + y] ^ (~moved[(x + 1) % 5 + y] & moved[(x + 2) % 5 + y])
+        lanes[0] ^= round_constant
+
+
+def keccak256(data):
+    """ Keccak-256 digest of data (bytes), as used by Ethereum. """
+    rate = 136
+    padded = bytearray(data) + bytearray(b"\x01")
+    padded += bytearray(-len(padded) % rate)
+    padded[-1] |= 0x80
+    lanes = [0] * 25
+    for offset in range(0, len(padded), rate):
+        for i, lane in enumerate(struct.unpack("<17Q", bytes(padded[offset:offset + rate]))):
+            lanes[i] ^= lane
+        _keccak_f(lanes)
+    return struct.pack("<4Q", *lanes[:4])
+
+
+def to_checksum_address(address):
+    """ EIP-55 mixed-case form of a 0x-prefixed 40 hex digit address. """
+    digits = address[2:].lower()
+    hashed = bytearray(keccak256(digits.encode("ascii")))
+    return "0x" + "".join(char.upper() if char.isalpha() and (hashed[i // 2] >> (4 if i % 2 == 0 else 0)) & 8
+                          else char for i, char in enumerate(digits))
+
+
+_HEX_DIGITS = frozenset("0123456789abcdefABCDEF")
+
+
+def is_eip55(address):
+    """
+    True for a 0x-prefixed 40 hex digit address whose mixed case matches the EIP-55 checksum.
+    All-lower or all-upper case addresses carry no checksum and are accepted as well.
+    """
+    if len(address) != 42 or address[:2] not in ("0x", "0X"):
+        return False
+    digits = address[2:]
+    # Not int(digits, 16), which also accepts "_", "+" and "-".
+    if not _HEX_DIGITS.issuperset(digits):
+        return False
+    if digits.lower() == digits or digits.upper() == digits:
+        return True
+    return to_checksum_address(address) == "0x" + digits
+
+
+def _base58check(*versions, **kwargs):
+    """ Internal """
+    return lambda address: is_base58check(address, versions, **kwargs)
+
+
+def _segwit(*hrps):
+    """ Internal """
+    return lambda address: is_segwit(address, hrps)
+
+
+def _bech32(*hrps):
+    """ Internal """
+    return lambda address: is_bech32(address, hrps)
+
+
+# Coin symbol -> checks; an address is valid locally if any check accepts it.
+default_formats = {
+    "BTC": (_base58check(b"\x00", b"\x05"), _segwit("bc")),
+    "LTC": (_base58check(b"\x30", b"\x32", b"\x05"), _segwit("ltc")),
+    "DOGE": (_base58check(b"\x1e", b"\x16"),),
+    "DASH": (_base58check(b"\x4c", b"\x10"),),
+    "ZEC": (_base58check(b"\x1c\xb8", b"\x1c\xbd"), _bech32("zs")),
+    "DGB": (_base58check(b"\x1e", b"\x3f"), _segwit("dgb")),
+    "VTC": (_base58check(b"\x47", b"\x05"), _segwit("vtc")),
+    "XRP": (_base58check(b"\x00", alphabet=_ripple_alphabet),),
+    "ETH": (is_eip55,),
+    "ETC": (is_eip55,),
+}
+
+
+class AddressValidator(object):
+    """
+    Validates addresses locally where the coin's format is known, remotely otherwise.
+
+    url_store, timeout  used for the remote validate_address and coin_list calls.
+    formats             coin symbol -> tuple of checks (callables taking the address); defaults to default_formats.
+    maxsize             number of remote verdicts kept, least recently used evicted first.
+
+    validate() returns a response shaped like validate_address: {"isvalid": ..., "error": ...}.
+    Thread-safe.
+    """
+    def __init__(self, url_store=None, timeout=None, formats=None, maxsize=4096):
+        self.url_store = url_store
+        self.timeout = timeout
+        self.formats = dict(default_formats if formats is None else formats)
+        self.maxsize = maxsize
+        self.coins = None       # symbols listed by coin_list, once load_coins() ran
+        self._verdicts = OrderedDict()      # (coin, address) -> remote response
+        self._lock = threading.Lock()
+        self.local_rejects = 0
+        self.remote_calls = 0
+        self.hits = 0
+
+    def register(self, coin, *checks):
+        """ Sets the local checks of a coin, replacing any default ones. """
+        self.formats[coin.upper()] = checks
+
+    def load_coins(self):
+        """
+        Restricts local validation to the coins coin_list currently lists; other coins are then always
+        checked remotely, which also reports them as unknown.
+        """
+        coins = coin_list(self.url_store, self.timeout)
+        self.coins = set(symbol.upper() for symbol in coins) if isinstance(coins, dict) else None
+        return self.coins
+
+    def knows(self, coin):
+        """ True if coin has a local format. """
+        coin = coin.upper()
+        return coin in self.formats and (self.coins is None or coin in self.coins)
+
+    def check(self, address, coin):
+        """ Local check only: True or False, or None if the coin's format is not known. """
+        if not self.knows(coin):
+            return None
+        address = address.strip()
+        return any(check(address) for check in self.formats[coin.upper()])
+
+    def validate(self, address, coin):
+        """ Rejects malformed addresses locally, asks the remote validate_address otherwise (cached). """
+        local = self.check(address, coin)
+        if local is False:
+            with self._lock:
+                self.local_rejects += 1
+            return {"isvalid": False, "error": "Invalid " + coin.upper() + " address"}
+
+        key = (coin.upper(), address)
+        with self._lock:
+            verdict = self._verdicts.get(key)
+            if verdict is not None:
+                self.hits += 1
+                self._verdicts.pop(key)
+                self._verdicts[key] = verdict
+                return verdict
+            self.remote_calls += 1
+        verdict = validate_address(address, coin, self.url_store, self.timeout)
+        # Only definite answers are kept; errors such as rate limiting are retried next time.
+        if isinstance(verdict, dict) and "isvalid" in verdict:
+            with self._lock:
+                self._verdicts[key] = verdict
+                while len(self._verdicts) > self.maxsize:
+                    self._verdicts.popitem(last=False)
+        return verdict
+
+    def is_valid(self, address, coin):
+        """ validate() as a boolean. """
+        return bool(self.validate(address, coin).get("isvalid"))
+
+    def clear(self):
+        """ Forgets all remote verdicts. """
+        with self._lock:
+            self._verdicts.clear()
+
+    def stats(self):
+        """ Returns the local reject, remote call and cache hit counters and the cache size as a dict. """
+        with self._lock:
+            return {"local_rejects": self.local_rejects, "remote_calls": self.remote_calls, "hits": self.hits,
+                    "size": len(self._verdicts)}
@@ -0,0 +1,316 @@
+"""
+asyncio client for the API found at https://shapeshift.io/api
+
+AsyncShapeShiftIO mirrors every API function in shapeshiftio.py as a coroutine. All calls of a client
+share one keep-alive connection pool and run on the event loop, so hundreds of requests can be in
+flight on a single thread. Requires Python 3.5+.
+"""
+
+import asyncio
+import ssl
+from http.client import parse_headers
+from io import BytesIO
+from urllib.error import HTTPError
+from urllib.parse import urlencode, urlsplit
+
+from . import shapeshiftio as _sync
+from .fastjson import loads
+
+# Errors seen when the server has closed a kept-alive connection while it sat idle.
+_STALE_ERRORS = (ConnectionError, asyncio.IncompleteReadError)
+
+# Methods that may be resent after a stale connection failed; a POST may already have been acted on.
+_IDEMPOTENT_METHODS = frozenset(("GET", "HEAD"))
+
+_default_ports = {"http": 80, "https": 443}
+
+
+class AsyncSingleFlight(object):
+    """
+    Coalesces concurrent identical GETs on one event loop: callers asking for a URL that is already
+    being fetched await the same task and get the same result or exception.
+    A caller's timeout or cancellation does not cancel the shared request while others still await
+    it; once the last caller has gone, the request is cancelled, freeing its concurrency slot.
+    """
+    def __init__(self):
+        self._calls = {}    # key -> [task, number of callers awaiting it]
+        self.calls = 0
+        self.coalesced = 0
+
+    async def do(self, key, factory):
+        """ Returns await factory(), sharing one execution between concurrent callers with the same key. """
+        entry = self._calls.get(key)
+        if entry is None:
+            task = asyncio.ensure_future(factory())
+            entry = self._calls[key] = [task, 0]
+            task.add_done_callback(lambda done: self._done(key, done))
+            self.calls += 1
+        else:
+            self.coalesced += 1
+        entry[1] += 1
+        try:
+            return await asyncio.shield(entry[0])
+        finally:
+            entry[1] -= 1
+            if entry[1] == 0 and not entry[0].done():
+                # Nobody wants the result any more; a new caller starts a fresh request.
+                if self._calls.get(key) is entry:
+                    del self._calls[key]
+                entry[0].cancel()
+
+    def _done(self, key, task):
+        """ Internal. Also marks the exception retrieved in case every waiter gave up. """
+        entry = self._calls.get(key)
+        if entry is not None and entry[0] is task:
+            del self._calls[key]
+        if not task.cancelled():
+            task.exception()
+
+
+class AsyncConnectionPool(object):
+    """
+    Keep-alive pool of asyncio stream connections.
+
+    maxsize       maximum number of idle connections kept per host.
+    idle_timeout  seconds an unused connection may sit in the pool before it is closed instead of reused.
+    """
+    def __init__(self, maxsize=100, idle_timeout=30.0, headers=None):
+        self.maxsize = maxsize
+        self.idle_timeout = idle_timeout
+        self.headers = {"User-Agent": "shapeshiftio"}
+        if headers:
+            self.headers.update(headers)
+        self._idle = {}     # key -> [(reader, writer, released_at), ...], oldest first
+        self._ssl = None
+
+    async def request(self, method, url, body=None, headers=None):
+        """
+        Sends one request and returns the response body as bytes.
+        Raises HTTPError for 4xx/5xx statuses, like urlopen().
+        """
+        parts = urlsplit(url)
+        key = (parts.scheme, parts.hostname, parts.port or _default_ports[parts.scheme])
+        path = parts.path or "/"
+        if parts.query:
+            path += "?" + parts.query
+        all_headers = dict(self.headers)
+        if headers:
+            all_headers.update(headers)
+        all_headers["Host"] = parts.netloc
+        if body is not None:
+            all_headers["Content-Length"] = str(len(body))
+        head = "%s %s HTTP/1.1\r\n" % (method, path)
+        head += "".join("%s: %s\r\n" % item for item in all_headers.items()) + "\r\n"
+        head = head.encode("latin-1")
+
+        conn, reused = await self._acquire(key)
+        try:
+            try:
+                status, reason, msg, data, keep = await self._roundtrip(conn, method, head, body)
+            except _STALE_ERRORS as e:
+                # Only a reused connection may have gone stale; a fresh one failing is a real error.
+                # A connection that returned part of a response was not stale either.
+                if not reused or method not in _IDEMPOTENT_METHODS or getattr(e, "partial", b""):
+                    raise
+                conn[1].close()
+                conn = await self._connect(key)
+                status, reason, msg, data, keep = await self._roundtrip(conn, method, head, body)
+        except BaseException:
+            # Includes cancellation by a timeout: the connection is mid-response and cannot be reused.
+            conn[1].close()
+            raise
+
+        if keep:
+            self._release(key, conn)
+        else:
+            conn[1].close()
+
+        if status >= 400:
+            raise HTTPError(url, status, reason, msg, BytesIO(data))
+        return data
+
+    def close(self):
+        """ Closes every idle connection. """
+        for idle in self._idle.values():
+            for _, writer, _ in idle:
+                writer.close()
+        self._idle.clear()
+
+    async def _roundtrip(self, conn, method, head, body):
+        """ Internal. Returns (status, reason, headers, body, keep_alive). """
+        reader, writer = conn
+        writer.write(head)
+        if body is not None:
+            writer.write(body)
+        await writer.drain()
+
+        status_line, _, header_block = (await reader.readuntil(b"\r\n\r\n")).partition(b"\r\n")
+        version, status, reason = (status_line.decode("latin-1").split(" ", 2) + [""])[:3]
+        status = int(status)
+        msg = parse_headers(BytesIO(header_block))
+        keep = version == "HTTP/1.1" and msg.get("Connection", "").lower() != "close"
+
+        if method == "HEAD" or status in (204, 304) or 100 <= status < 200:
+            data = b""
+        elif msg.get("Transfer-Encoding", "").lower() == "chunked":
+            data = await self._read_chunked(reader)
+        elif msg.get("Content-Length") is not None:
+            data = await reader.readexactly(int(msg["Content-Length"]))
+        else:
+            data = await reader.read()
+            keep = False
+        return status, reason.strip(), msg, data, keep
+
+    async def _read_chunked(self, reader):
+        """ Internal """
+        chunks = []
+        while True:
+            size = int((await reader.readline()).split(b";", 1)[0], 16)
+            if size == 0:
+                # Skip any trailers up to the terminating blank line.
+                while (await reader.readline()) not in (b"\r\n", b"\n", b""):
+                    pass
+                return b"".join(chunks)
+            chunks.append(await reader.readexactly(size))
+            await reader.readexactly(2)
+
+    async def _acquire(self, key):
+        """ Internal. Returns ((reader, writer), reused). """
+        idle = self._idle.get(key)
+        now = asyncio.get_event_loop().time()
+        while idle:
+            reader, writer, released_at = idle.pop()
+            if now - released_at < self.idle_timeout and not reader.at_eof():
+                return (reader, writer), True
+            writer.close()
+        return await self._connect(key), False
+
+    async def _connect(self, key):
+        """ Internal """
+        scheme, host, port = key
+        if scheme == "https":
+            if self._ssl is None:
+                self._ssl = ssl.create_default_context()
+            return await asyncio.open_connection(host, port, ssl=self._ssl, server_hostname=host)
+        return await asyncio.open_connection(host, port)
+
+    def _release(self, key, conn):
+        """ Internal """
+        idle = self._idle.setdefault(key, [])
+        if len(idle) < self.maxsize:
+            idle.append((conn[0], conn[1], asyncio.get_event_loop().time()))
+        else:
+            conn[1].close()
+
+
+class AsyncShapeShiftIO(object):
+    """
+    asyncio ShapeShiftIO API class. Stores the last called API in self.url
+
+    timeout      default seconds allowed for a whole call, including the wait for a free slot. None waits forever.
+    concurrency  maximum number of requests in flight at once.
+    transport    optional AsyncConnectionPool, to share connections between clients.
+    url_base     overrides shapeshift_url_base for this client.
+    coalesce     whether concurrent identical GETs share one request. POSTs are never coalesced.
+
+    Every method takes an optional timeout that overrides the default for that call; asyncio.TimeoutError
+    is raised when it runs out.
+    """
+    def __init__(self, timeout=None, concurrency=100, transport=None, coalesce=True, url_base=None):
+        self.url = None
+        self.url_base = url_base
+        self.timeout = timeout
+        self.transport = transport if transport is not None else AsyncConnectionPool()
+        self.flight = AsyncSingleFlight() if coalesce else None
+        self.concurrency = concurrency
+        # Created by the first request: before Python 3.10 a Semaphore binds to the event loop current
+        # at its creation, which for a client built outside asyncio.run() is not the one it runs on.
+        self._semaphore = None
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        self.close()
+
+    def close(self):
+        """ Closes the idle connections of this client's pool. """
+        self.transport.close()
+
+    async def _get(self, path, timeout):
+        """ Internal """
+        return await self._call("GET", path, None, timeout)
+
+    async def _post(self, path, postdata, timeout):
+        """ Internal """
+        return await self._call("POST", path, postdata, timeout)
+
+    async def _call(self, method, path, postdata, timeout):
+        """ Internal """
+        url = (self.url_base or _sync.shapeshift_url_base) + path
+        self.url = url
+        if postdata is None and self.flight is not None:
+            call = self.flight.do(url, lambda: self._send(method, url, postdata))
+        else:
+            call = self._send(method, url, postdata)
+        return await asyncio.wait_for(call, self.timeout if timeout is None else timeout)
+
+    async def _send(self, method, url, postdata):
+        """ Internal """
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.concurrency)
+        async with self._semaphore:
+            if postdata is None:
+                response = await self.transport.request(method, url)
+            else:
+                body = urlencode(postdata).encode("ascii")
+                response = await self.transport.request(method, url, body, _sync._form_headers)
+        return loads(response)
+
+    async def rate(self, pair, timeout=None):
+        return await self._get("/rate/" + pair, timeout)
+
+    async def limit(self, pair, timeout=None):
+        return await self._get("/limit/" + pair, timeout)
+
+    async def market_info(self, pair=None, timeout=None):
+        return await self._get("/marketinfo/" + (pair or ""), timeout)
+
+    async def recent_tx(self, max_results=5, timeout=None):
+        return await self._get("/recenttx/" + str(max_results), timeout)
+
+    async def tx_status(self, address, timeout=None):
+        return await self._get("/txStat/" + address, timeout)
+
+    async def time_remaining(self, address, timeout=None):
+        return await self._get("/timeremaining/" + address, timeout)
+
+    async def coin_list(self, timeout=None):
+        return await self._get("/getcoins", timeout)
+
+    async def tx_by_api_key(self, api_key, timeout=None):
+        return await self._get("/txbyapi_key/" + api_key, timeout)
+
+    async def tx_by_address(self, api_key, address, timeout=None):
+        return await self._get("/txbyaddress/" + address + "/" + api_key, timeout)
+
+    async def validate_address(self, address, coin, timeout=None):
+        return await self._get("/validateAddress/" + address + "/" + coin, timeout)
+
+    async def shift(self, postdata, timeout=None):
+        return await self._post("/shift", postdata, timeout)
+
+    async def set_mail(self, postdata, timeout=None):
+        return await self._post("/mail", postdata, timeout)
+
+    async def send_amount(self, postdata, timeout=None):
+        return await self._post("/sendamount", postdata, timeout)
+
+    async def cancel_pending(self, postdata, timeout=None):
+        return await self._post("/cancelpending", postdata, timeout)
+
+# Transfer all the function docstrings to the coroutine methods as well.
+for _name in ("rate", "limit", "market_info", "recent_tx", "tx_status", "time_remaining", "coin_list",
+              "tx_by_api_key", "tx_by_address", "validate_address", "shift", "set_mail", "send_amount",
+              "cancel_pending"):
+    getattr(AsyncShapeShiftIO, _name).__doc__ = getattr(_sync, _name).__doc__
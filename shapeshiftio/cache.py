@@ -0,0 +1,113 @@
+"""
+Opt-in response cache for the market data endpoints (coin_list, market_info, rate, limit).
+
+Install one for the module functions with shapeshiftio.shapeshiftio.default_cache = TTLCache(),
+or per client with ShapeShiftIO(cache=TTLCache()).
+"""
+
+from collections import OrderedDict
+import threading
+import time
+
+
+class TTLCache(object):
+    """
+    Thread-safe LRU cache of parsed responses, keyed by endpoint and URL (and so by pair).
+
+    ttls       dict of endpoint name -> seconds a response stays fresh. Endpoints without a TTL are never cached.
+    maxsize    maximum number of entries; the least recently used entry is evicted first.
+    stale_ttl  seconds past expiry during which the stale value is still served while one background
+               thread fetches a fresh one (stale-while-revalidate). 0 disables it.
+
+    Cached values are shared between callers and must not be mutated.
+    """
+    default_ttls = {"coin_list": 300.0, "market_info": 30.0, "rate": 10.0, "limit": 30.0}
+
+    def __init__(self, ttls=None, maxsize=1024, stale_ttl=60.0):
+        self.ttls = dict(self.default_ttls)
+        if ttls:
+            self.ttls.update(ttls)
+        self.maxsize = maxsize
+        self.stale_ttl = stale_ttl
+        self._entries = OrderedDict()     # (endpoint, url) -> (value, expires_at)
+        self._refreshing = set()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.stale_hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, endpoint, url, loader):
+        """ Returns the cached response for endpoint/url, calling loader() to fetch it when needed. """
+        ttl = self.ttls.get(endpoint)
+        if ttl is None:
+            return loader()
+        key = (endpoint, url)
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                value, expires_at = entry
+                if now < expires_at:
+                    self.hits += 1
+                    self._touch(key)
+                    return value
+                if now < expires_at + self.stale_ttl:
+                    self.stale_hits += 1
+                    self._touch(key)
+                    if key not in self._refreshing:
+                        self._refreshing.add(key)
+                        thread = threading.Thread(target=self._refresh, args=(key, ttl, loader))
+                        thread.daemon = True
+                        thread.start()
+                    return value
+            self.misses += 1
+        value = loader()
+        self._store(key, value, ttl)
+        return value
+
+    def invalidate(self, endpoint=None):
+        """ Drops every entry, or only those of one endpoint. """
+        with self._lock:
+            if endpoint is None:
+                self._entries.clear()
+            else:
+                for key in [key for key in self._entries if key[0] == endpoint]:
+                    del self._entries[key]
+
+    def stats(self):
+        """ Returns the hit/miss counters and the current size as a dict. """
+        with self._lock:
+            return {"hits": self.hits, "stale_hits": self.stale_hits, "misses": self.misses,
+                    "evictions": self.evictions, "size": len(self._entries)}
+
+    def __len__(self):
+        return len(self._entries)
+
+    def _refresh(self, key, ttl, loader):
+        """ Internal. On failure the stale value keeps being served until its stale window ends. """
+        try:
+            self._store(key, loader(), ttl)
+        except Exception:
+            pass
+        finally:
+            with self._lock:
+                self._refreshing.discard(key)
+
+    def _store(self, key, value, ttl):
+        """ Internal. API errors come back as HTTP 200 {"error": ...} and are not cached. """
+        if isinstance(value, dict) and "error" in value:
+            return
+        with self._lock:
+            self._entries[key] = (value, time.time() + ttl)
+            self._touch(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def _touch(self, key):
+        """ Internal. Marks key as most recently used. Caller holds the lock. """
+        try:
+            self._entries.move_to_end(key)
+        except AttributeError:
+            self._entries[key] = self._entries.pop(key)
@@ -0,0 +1,208 @@
+"""
+Record/replay transports, for tests and backtests without network access.
+
+    recorder = RecordingTransport("session.cassette")
+    client = ShapeShiftIO(transport=recorder)     # use normally; every exchange is appended
+    recorder.close()
+
+    client = ShapeShiftIO(transport=ReplayTransport("session.cassette"))
+
+The cassette is an append-only file of length-prefixed records, one per exchange: the wall-clock time,
+the HTTP status, the method, URL, request body and response body. A crash while recording loses at most
+the record being written; loading stops at a truncated tail.
+
+ReplayTransport reads the whole cassette into a dict keyed by (method, URL, body). Repeated requests
+get the recorded responses in recording order, so hours of changing rates replay as they happened; the
+last one is served again once they run out. With speed set, responses are also paced to the recorded
+timing (speed=1.0 is real time, 60.0 replays an hour in a minute); without it they come at memory speed.
+"""
+
+from io import BytesIO
+import struct
+import threading
+import time
+
+try:
+    from urllib2 import HTTPError
+except ImportError:
+    from urllib.error import HTTPError
+
+from .pool import ConnectionPool
+
+_magic = b"SSCASS1\n"
+_length = struct.Struct("<I")
+# timestamp, status, method length, URL length, request body length; the response body fills the rest.
+_fields = struct.Struct("<dHHII")
+
+
+class CassetteMiss(LookupError):
+    """ Raised by ReplayTransport for a request the cassette has no record of. """
+
+
+class _BufferedResponse(BytesIO):
+    """ Internal. Fully read response returned by open(), usable in a with block like a real one. """
+    def __init__(self, data, status):
+        BytesIO.__init__(self, data)
+        self.status = status
+
+
+def _pack(timestamp, status, method, url, body, response):
+    """ Internal """
+    method, url = method.encode("ascii"), url.encode("utf-8")
+    body = body or b""
+    record = _fields.pack(timestamp, status, len(method), len(url), len(body)) + method + url + body + response
+    return _length.pack(len(record)) + record
+
+
+def read_cassette(path):
+    """ Yields (timestamp, status, method, url, body, response) for every complete record of a cassette file. """
+    with open(path, "rb") as f:
+        data = f.read()
+    if data[:len(_magic)] != _magic:
+        raise ValueError(path + " is not a cassette file")
+    view = memoryview(data)
+    pos = len(_magic)
+    while pos + _length.size <= len(data):
+        size = _length.unpack_from(data, pos)[0]
+        start = pos + _length.size
+        end = start + size
+        if end > len(data):
+            break   # truncated by an interrupted write
+        timestamp, status, method_len, url_len, body_len = _fields.unpack_from(data, start)
+        offset = start + _fields.size
+        method = view[offset:offset + method_len].tobytes().decode("ascii")
+        offset += method_len
+        url = view[offset:offset + url_len].tobytes().decode("utf-8")
+        offset += url_len
+        body = view[offset:offset + body_len].tobytes()
+        offset += body_len
+        yield timestamp, status, method, url, body, view[offset:end].tobytes()
+        pos = end
+
+
+class RecordingTransport(object):
+    """
+    Transport that sends requests through another transport (by default a new ConnectionPool) and
+    appends every exchange, HTTP errors included, to the cassette at path. An existing cassette is
+    appended to. Thread-safe.
+    """
+    def __init__(self, path, transport=None):
+        self.path = path
+        self.transport = transport if transport is not None else ConnectionPool()
+        self.recorded = 0
+        self._lock = threading.Lock()
+        self._file = open(path, "ab")
+        if self._file.tell() == 0:
+            self._file.write(_magic)
+            self._file.flush()
+
+    def request(self, method, url, body=None, headers=None, timeout=None, trace=None):
+        """ Sends one request, records it and returns the response body as bytes. """
+        try:
+            data = self.transport.request(method, url, body, headers, timeout, trace)
+        except HTTPError as e:
+            error_body = e.read() if e.fp is not None else b""
+            self._record(e.code, method, url, body, error_body)
+            # The body was consumed by recording it; hand the caller an error it can still read.
+            raise HTTPError(e.url, e.code, e.msg, e.hdrs, BytesIO(error_body))
+        self._record(200, method, url, body, data)
+        return data
+
+    def open(self, method, url, body=None, headers=None, timeout=None, trace=None):
+        """ Like request(), but returns the body as a file-like object. The body is recorded in full first. """
+        return _BufferedResponse(self.request(method, url, body, headers, timeout, trace), 200)
+
+    def close(self):
+        """ Closes the cassette file and the underlying transport. """
+        with self._lock:
+            if not self._file.closed:
+                self._file.close()
+        self.transport.close()
+
+    def _record(self, status, method, url, body, response):
+        """ Internal """
+        record = _pack(time.time(), status, method, url, body, response)
+        with self._lock:
+            self._file.write(record)
+            self._file.flush()
+            self.recorded += 1
+
+
+class ReplayTransport(object):
+    """
+    Transport that answers from a cassette file without any network access.
+
+    speed  None to serve at memory speed, or the factor by which the recorded timing is sped up.
+    loop   start over at the first recorded response of a request once its responses run out,
+           instead of repeating the last one.
+
+    Raises CassetteMiss for requests that were never recorded, and HTTPError for recorded errors.
+    """
+    def __init__(self, path, speed=None, loop=False):
+        self.path = path
+        self.speed = speed
+        self.loop = loop
+        self.served = 0
+        self._index = {}        # (method, url, body) -> [(timestamp, status, response), ...]
+        self._cursor = {}       # (method, url, body) -> index of the next record to serve
+        self._first = None
+        self._started = None
+        self._lock = threading.Lock()
+        for timestamp, status, method, url, body, response in read_cassette(path):
+            self._index.setdefault((method, url, body), []).append((timestamp, status, response))
+            if self._first is None or timestamp < self._first:
+                self._first = timestamp
+
+    def __len__(self):
+        """ Number of recorded exchanges. """
+        return sum(len(records) for records in self._index.values())
+
+    def request(self, method, url, body=None, headers=None, timeout=None, trace=None):
+        """ Returns the next recorded response body for this request. """
+        timestamp, status, data = self._next(method, url, body or b"")
+        if self.speed:
+            self._pace(timestamp)
+        if trace is not None:
+            trace.status = status
+            trace.bytes_sent = len(body or b"")
+            trace.bytes_received = len(data)
+        if status >= 400:
+            raise HTTPError(url, status, "Replayed error", {}, BytesIO(data))
+        return data
+
+    def open(self, method, url, body=None, headers=None, timeout=None, trace=None):
+        """ Like request(), but returns the body as a file-like object. """
+        return _BufferedResponse(self.request(method, url, body, headers, timeout, trace), 200)
+
+    def rewind(self):
+        """ Starts every request over at its first recorded response, and restarts the pacing clock. """
+        with self._lock:
+            self._cursor.clear()
+            self._started = None
+
+    def close(self):
+        pass
+
+    def _next(self, method, url, body):
+        """ Internal """
+        key = (method, url, body)
+        with self._lock:
+            records = self._index.get(key)
+            if records is None:
+                raise CassetteMiss("No recorded response for %s %s" % (method, url))
+            position = self._cursor.get(key, 0)
+            if position >= len(records):
+                position = 0 if self.loop else len(records) - 1
+            self._cursor[key] = position + 1
+            self.served += 1
+            return records[position]
+
+    def _pace(self, timestamp):
+        """ Internal. Sleeps until the recorded time of this response, scaled by speed, has come. """
+        with self._lock:
+            if self._started is None:
+                self._started = time.time()
+            due = self._started + (timestamp - self._first) / self.speed
+        delay = due - time.time()
+        if delay > 0:
+            time.sleep(delay)
@@ -0,0 +1,74 @@
+"""
+Bounded thread pool behind ShapeShiftIO's batch helpers (rates, limits, market_infos, tx_statuses).
+
+FanOut.map() runs a function over many items and yields a Result per item as soon as it finishes,
+in completion order. An exception only marks its own Result; the rest of the batch carries on.
+The workers call the normal module functions, so they share the client's ConnectionPool (and its
+cache, limiter, etc.) instead of each opening connections of its own.
+"""
+
+from collections import namedtuple
+import threading
+
+# value is the function's return value, error the exception it raised (value is then None).
+# Responses carrying an API "error" key are values, as with the single-item functions.
+Result = namedtuple("Result", "item value error")
+
+
+class FanOut(object):
+    """
+    workers  maximum number of calls running at once. The default matches ConnectionPool's per-host
+             connection limit, so no worker waits for a connection.
+    window   maximum number of items submitted ahead of the consumer, by default 2 * workers; items
+             are drawn from the iterable lazily, so it can be a generator of any length.
+
+    The threads are started on first use and shared by every batch, also across threads.
+    """
+    def __init__(self, workers=10, window=None):
+        self.workers = workers
+        self.window = window or 2 * workers
+        self._executor = None
+        self._lock = threading.Lock()
+
+    def map(self, function, items):
+        """ Yields Result(item, value, error) for function(item) over items, as the calls complete. """
+        from concurrent.futures import wait, FIRST_COMPLETED
+        executor = self._get_executor()
+        items = iter(items)
+        pending = {}
+        exhausted = False
+        try:
+            while True:
+                while not exhausted and len(pending) < self.window:
+                    try:
+                        item = next(items)
+                    except StopIteration:
+                        exhausted = True
+                        break
+                    pending[executor.submit(function, item)] = item
+                if not pending:
+                    return
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    item = pending.pop(future)
+                    error = future.exception()
+                    yield Result(item, None if error is not None else future.result(), error)
+        finally:
+            # The consumer stopped early: drop what has not started yet.
+            for future in pending:
+                future.cancel()
+
+    def close(self):
+        """ Stops the threads once running calls are done. The pool restarts on next use. """
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=False)
+
+    def _get_executor(self):
+        """ Internal. concurrent.futures is imported here, on the first batch, not with the package. """
+        from concurrent.futures import ThreadPoolExecutor
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=self.workers)
+            return self._executor
@@ -0,0 +1,28 @@
+"""
+JSON decoding backend for responses: orjson when it is installed, the standard library otherwise.
+
+Both return the same plain dicts, lists, strings and numbers, so callers cannot tell them apart.
+The backend is imported on the first loads() call rather than with the package; backend names it
+from then on.
+"""
+
+backend = None
+_loads = None
+
+
+def loads(data):
+    """ Decodes one JSON document (bytes or str). """
+    if _loads is None:
+        _select()
+    return _loads(data)
+
+
+def _select():
+    """ Internal """
+    global backend, _loads
+    try:
+        from orjson import loads as _loads
+        backend = "orjson"
+    except ImportError:
+        from json import loads as _loads
+        backend = "json"
@@ -0,0 +1,194 @@
+"""
+Live feed of recent transactions.
+
+recent_tx returns at most the 50 latest trades, newest first, and consecutive polls overlap by an
+unknown amount. TradeFeed polls /recenttx/50, drops the trades it has already seen using a small
+index of 64-bit fingerprints, and yields only new ones, oldest first. The poll interval follows the
+observed trade rate so each poll sees about half a window of new trades: slow markets are polled
+rarely, and busy ones often enough that no trade falls out of the 50-trade window unseen.
+
+The last capacity trades are kept in a ring buffer preallocated as columns, and per-pair volume over
+the last volume_window seconds is updated as trades enter and leave that window.
+"""
+
+from array import array
+import hashlib
+import struct
+import threading
+import time
+
+from .shapeshiftio import recent_tx
+
+# The API's maximum for recenttx.
+max_window = 50
+
+
+def fingerprint(trade):
+    """ 64-bit fingerprint of a recent_tx trade, which has no id of its own. """
+    key = "%s|%s|%r|%r" % (trade.get("curIn"), trade.get("curOut"), trade.get("amount"), trade.get("timestamp"))
+    return struct.unpack("<q", hashlib.md5(key.encode("utf-8")).digest()[:8])[0]
+
+
+class TradeFeed(object):
+    """
+    url_store, timeout  passed to recent_tx, so a ShapeShiftIO's transport and settings apply.
+    capacity            number of trades kept in the ring buffer.
+    volume_window       seconds of trades counted in volumes(), measured from the newest trade's timestamp.
+    min_interval, max_interval
+                        bounds of the poll interval.
+    target_fill         fraction of the 50-trade window a poll should find new.
+
+    poll() fetches once; trades() polls forever, sleeping in between, until stop() is called.
+    gaps counts polls whose whole window was new, i.e. trades may have been missed before them.
+    """
+    def __init__(self, url_store=None, timeout=None, capacity=1000, volume_window=3600.0, min_interval=1.0,
+                 max_interval=60.0, target_fill=0.5):
+        if capacity < 1:
+            raise ValueError("capacity must be positive")
+        self.url_store = url_store
+        self.timeout = timeout
+        self.capacity = capacity
+        self.volume_window = volume_window
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.target_fill = target_fill
+        self.interval = min_interval
+        self.polls = 0
+        self.gaps = 0
+        self.total = 0              # trades seen since creation; also the sequence number of the next one
+        # Ring buffer columns, slot = sequence number % capacity.
+        self._cur_in = [None] * capacity
+        self._cur_out = [None] * capacity
+        self._amount = array("d", [0.0]) * capacity
+        self._timestamp = array("d", [0.0]) * capacity
+        # Fingerprints of the last _index_size trades, enough to cover any overlap with a new window.
+        self._index_size = 4 * max_window
+        self._fingerprints = array("q", [0]) * self._index_size
+        self._index = {}            # fingerprint -> occurrences among the last _index_size trades
+        self._volume_start = 0      # sequence number of the oldest trade counted in _volumes
+        self._volumes = {}          # pair -> [count, amount]
+        self._newest = None
+        self._last_poll = None
+        self._rate = None           # trades per second, moving average
+        self._stopped = False
+        self._lock = threading.Lock()
+
+    def poll(self):
+        """ Fetches the latest window once. Returns the new trades, oldest first. """
+        response = recent_tx(max_window, self.url_store, self.timeout)
+        now = time.time()
+        if not isinstance(response, list):
+            raise ValueError("Unexpected recent_tx response: " + repr(response)[:200])
+        new = []
+        with self._lock:
+            for trade in reversed(response):
+                mark = fingerprint(trade)
+                if mark in self._index:
+                    continue
+                self._append(trade, mark)
+                new.append(trade)
+            self.polls += 1
+            if self._rate is None and len(new) > 1:
+                # Seed the trade rate from the timestamps of the first window.
+                span = float(new[-1].get("timestamp") or 0) - float(new[0].get("timestamp") or 0)
+                if span > 0:
+                    self._rate = (len(new) - 1) / span
+            if len(response) >= max_window and len(new) >= len(response) and self.polls > 1:
+                self.gaps += 1
+            self._adapt(len(new), now)
+        return new
+
+    def trades(self):
+        """ Yields new trades as they appear, oldest first, until stop() is called. """
+        self._stopped = False
+        while not self._stopped:
+            started = time.time()
+            for trade in self.poll():
+                yield trade
+            time.sleep(max(self.interval - (time.time() - started), 0.0))
+
+    def __iter__(self):
+        return self.trades()
+
+    def stop(self):
+        """ Makes trades() return after its current poll. """
+        self._stopped = True
+
+    def last(self, count=None):
+        """ The last count (default: all kept) trades from the ring buffer, oldest first. """
+        with self._lock:
+            kept = min(self.total, self.capacity)
+            count = kept if count is None else min(count, kept)
+            return [self._trade(seq) for seq in range(self.total - count, self.total)]
+
+    def volumes(self):
+        """ Per pair ("btc_eth") trade count and summed input amount over the last volume_window seconds. """
+        with self._lock:
+            return dict((pair, (entry[0], entry[1])) for pair, entry in self._volumes.items())
+
+    def _append(self, trade, mark):
+        """ Internal. Adds a trade to the ring buffer, the fingerprint index and the volumes. """
+        seq = self.total
+        slot = seq % self.capacity
+        if seq - self._volume_start >= self.capacity:
+            # The slot about to be overwritten still counts towards the volumes.
+            self._expire(self._volume_start)
+            self._volume_start += 1
+        cur_in, cur_out = str(trade.get("curIn", "")).lower(), str(trade.get("curOut", "")).lower()
+        amount = float(trade.get("amount") or 0.0)
+        timestamp = float(trade.get("timestamp") or 0.0)
+        self._cur_in[slot], self._cur_out[slot] = cur_in, cur_out
+        self._amount[slot], self._timestamp[slot] = amount, timestamp
+
+        index_slot = seq % self._index_size
+        if seq >= self._index_size:
+            old = self._fingerprints[index_slot]
+            if self._index[old] == 1:
+                del self._index[old]
+            else:
+                self._index[old] -= 1
+        self._fingerprints[index_slot] = mark
+        self._index[mark] = self._index.get(mark, 0) + 1
+
+        entry = self._volumes.setdefault(cur_in + "_" + cur_out, [0, 0.0])
+        entry[0] += 1
+        entry[1] += amount
+        self.total += 1
+        if self._newest is None or timestamp > self._newest:
+            self._newest = timestamp
+        horizon = self._newest - self.volume_window
+        while self._volume_start < self.total and self._timestamp[self._volume_start % self.capacity] < horizon:
+            self._expire(self._volume_start)
+            self._volume_start += 1
+
+    def _expire(self, seq):
+        """ Internal. Removes a trade from the volumes. """
+        slot = seq % self.capacity
+        pair = self._cur_in[slot] + "_" + self._cur_out[slot]
+        entry = self._volumes[pair]
+        entry[0] -= 1
+        if entry[0]:
+            entry[1] -= self._amount[slot]
+        else:
+            del self._volumes[pair]
+
+    def _trade(self, seq):
+        """ Internal """
+        slot = seq % self.capacity
+        return {"curIn": self._cur_in[slot], "curOut": self._cur_out[slot], "amount": self._amount[slot],
+                "timestamp": self._timestamp[slot]}
+
+    def _adapt(self, new, now):
+        """ Internal. Sets the next interval from the trade rate seen since the previous poll. """
+        if self._last_poll is not None and now > self._last_poll:
+            observed = new / (now - self._last_poll)
+            self._rate = observed if self._rate is None else 0.7 * self._rate + 0.3 * observed
+        self._last_poll = now
+        if new >= max_window and self.polls > 1:
+            # The window was entirely new: we are too slow, whatever the average says.
+            self.interval = max(self.min_interval, self.interval / 2.0)
+        elif self._rate:
+            self.interval = self.target_fill * max_window / self._rate
+        else:
+            self.interval *= 1.5
+        self.interval = min(max(self.interval, self.min_interval), self.max_interval)
@@ -0,0 +1,500 @@
+"""
+Optional HTTP/2 transport: any number of concurrent requests multiplexed over one connection per host.
+
+ConnectionPool needs a socket per request in flight; HTTP2Transport sends them all as streams of a
+single connection, so fanning out over thousands of addresses costs one socket and one TLS handshake.
+Order POSTs are sent ahead of polling GETs: they go first when the server's concurrent stream limit
+is reached, and they are opened with a higher stream weight so the server can schedule them first.
+Both directions are flow controlled; received data is acknowledged as it is consumed.
+
+Needs the h2 package (pip install shapeshiftio[http2]). Install it per client with
+ShapeShiftIO(transport=HTTP2Transport()).
+Hosts that do not negotiate h2 through ALPN are served by a ConnectionPool instead.
+"""
+
+from io import BytesIO
+import heapq
+import itertools
+import struct
+import threading
+
+from . import pool as _pool
+from .pool import ConnectionPool, _clock
+
+# Imported by _import_h2() when the first HTTP2Transport is created.
+H2Connection = H2Configuration = ConnectionState = events = ErrorCodes = SettingCodes = None
+
+_ALPN_PROTOCOLS = ["h2", "http/1.1"]
+_FRAME_HEADER_SIZE = 9
+_GOAWAY = 0x7
+
+# Headers that are meaningful for HTTP/1.1 only; HTTP/2 forbids them.
+_CONNECTION_HEADERS = frozenset(("connection", "host", "keep-alive", "proxy-connection", "transfer-encoding",
+                                 "upgrade"))
+
+
+def _import_h2():
+    """ Internal """
+    global H2Connection, H2Configuration, ConnectionState, events, ErrorCodes, SettingCodes
+    try:
+        from h2.connection import ConnectionState, H2Connection
+        from h2.config import H2Configuration
+        from h2.errors import ErrorCodes
+        from h2.settings import SettingCodes
+        import h2.events as events
+    except ImportError:
+        raise ImportError("HTTP2Transport needs the h2 package: pip install h2")
+
+
+class HTTP2Transport(object):
+    """
+    Thread-safe HTTP/2 transport with the same request()/open()/close() interface as ConnectionPool.
+
+    ssl_context  SSLContext for https:// URLs; h2 and http/1.1 are set as its ALPN protocols.
+    cleartext    speak HTTP/2 with prior knowledge (h2c) to http:// URLs, e.g. a local proxy. Without it
+                 http:// URLs go to the fallback pool.
+    fallback     ConnectionPool for hosts without HTTP/2; one is created on first use by default.
+    max_streams  maximum number of streams in flight per connection, on top of the server's own limit.
+    window       receive window per stream and for the connection, in bytes.
+    post_weight  HTTP/2 stream weight (1-256) of requests with a body, i.e. order POSTs.
+    get_weight   stream weight of GETs.
+    """
+    def __init__(self, headers=None, ssl_context=None, cleartext=False, fallback=None, max_streams=None,
+                 window=1 << 20, post_weight=256, get_weight=16):
+        if H2Connection is None:
+            _import_h2()
+        self.headers = {"user-agent": "shapeshiftio"}
+        if headers:
+            self.headers.update((name.lower(), value) for name, value in headers.items())
+        self._fallback_headers = dict(headers or {})
+        if ssl_context is not None:
+            # Without ALPN no server would ever select h2.
+            ssl_context.set_alpn_protocols(_ALPN_PROTOCOLS)
+        self.ssl_context = ssl_context
+        self.cleartext = cleartext
+        self.fallback = fallback
+        self.max_streams = max_streams
+        self.window = window
+        self.post_weight = post_weight
+        self.get_weight = get_weight
+        self._connections = {}  # key -> _Connection
+        self._no_h2 = set()     # keys whose server declined h2
+        self._lock = threading.Lock()
+
+    def request(self, method, url, body=None, headers=None, timeout=None, trace=None):
+        """
+        Sends one request and returns the response body as bytes.
+        Raises HTTPError for 4xx/5xx statuses, like urlopen().
+        """
+        response = self.open(method, url, body, headers, timeout, trace)
+        try:
+            data = response.read()
+        finally:
+            response.close()
+        if trace is not None:
+            trace.bytes_received = len(data)
+        return data
+
+    def open(self, method, url, body=None, headers=None, timeout=None, trace=None):
+        """
+        Sends one request and returns the response as a file-like object. The body has been received
+        in full by then, since the connection cannot wait for one stream's reader.
+        Raises HTTPError for 4xx/5xx statuses, like urlopen().
+        """
+        if _pool.httplib is None:
+            _pool._import_network()
+        parts = _pool.urlsplit(url)
+        key = (parts.scheme, parts.hostname, parts.port)
+        conn = None
+        if key not in self._no_h2 and (parts.scheme == "https" or self.cleartext):
+            conn = self._connection(key, timeout, trace)
+        if conn is None:
+            return self._fallback().open(method, url, body, headers, timeout, trace)
+
+        path = parts.path or "/"
+        if parts.query:
+            path += "?" + parts.query
+        all_headers = dict(self.headers)
+        if headers:
+            all_headers.update((name.lower(), value) for name, value in headers.items())
+        status, response_headers, data = conn.request(
+            method, parts.netloc, parts.scheme, path, all_headers, body, timeout,
+            self.post_weight if body else self.get_weight, bool(body), trace)
+
+        response = _Response(data, status, _pool.httplib.responses.get(status, ""), response_headers)
+        if status >= 400:
+            raise _pool.HTTPError(url, status, response.reason, response_headers, response)
+        return response
+
+    def close(self):
+        """ Closes every connection; requests still in flight fail. """
+        with self._lock:
+            connections = list(self._connections.values())
+            self._connections.clear()
+        for conn in connections:
+            conn.close()
+        if self.fallback is not None:
+            self.fallback.close()
+
+    def _fallback(self):
+        """ Internal """
+        with self._lock:
+            if self.fallback is None:
+                self.fallback = ConnectionPool(headers=self._fallback_headers)
+            return self.fallback
+
+    def _connection(self, key, timeout, trace):
+        """ Internal. The live connection to key, opened if needed; None when the server declined h2. """
+        with self._lock:
+            conn = self._connections.get(key)
+            if conn is not None and conn.error is None:
+                return conn
+            sock = self._connect(key, timeout, trace)
+            if sock is None:
+                self._no_h2.add(key)
+                return None
+            conn = self._connections[key] = _Connection(sock, self.window, self.max_streams)
+            return conn
+
+    def _connect(self, key, timeout, trace):
+        """ Internal. Returns the connected socket, or None when TLS negotiated something other than h2. """
+        scheme, host, port = key
+        start = _clock()
+        sock = _pool.socket.create_connection((host, port or (443 if scheme == "https" else 80)), timeout)
+        connected = _clock()
+        sock.setsockopt(_pool.socket.IPPROTO_TCP, _pool.socket.TCP_NODELAY, 1)
+        if scheme == "https":
+            if self.ssl_context is None:
+                self.ssl_context = _pool.ssl.create_default_context()
+                self.ssl_context.set_alpn_protocols(_ALPN_PROTOCOLS)
+            try:
+                sock = self.ssl_context.wrap_socket(sock, server_hostname=host)
+            except Exception:
+                sock.close()
+                raise
+            if sock.selected_alpn_protocol() != "h2":
+                sock.close()
+                return None
+        # The socket is shared by every stream; request timeouts are enforced per stream instead.
+        sock.settimeout(None)
+        if trace is not None:
+            trace.phases["connect"] = connected - start
+            if scheme == "https":
+                trace.phases["tls"] = _clock() - connected
+        return sock
+
+
+class _Response(BytesIO):
+    """ Internal. A fully received response body. """
+    def __init__(self, data, status, reason, headers):
+        BytesIO.__init__(self, data)
+        self.status = status
+        self.reason = reason
+        self.headers = headers
+
+    def getcode(self):
+        return self.status
+
+
+class _Stream(object):
+    """ Internal. State of one request's stream. """
+    __slots__ = ("status", "headers", "data", "error", "done")
+
+    def __init__(self):
+        self.status = None
+        self.headers = {}
+        self.data = []
+        self.error = None
+        self.done = threading.Event()
+
+
+class _Connection(object):
+    """
+    Internal. One HTTP/2 connection. Callers update the h2 state under the lock and queue its output;
+    a writer thread sends it, so nobody holds the lock in a blocking send, and a reader thread
+    receives every frame and completes the streams. Both run until the socket is closed, which the
+    reader does once the connection has failed and its last stream has ended.
+    """
+    def __init__(self, sock, window, max_streams):
+        self.error = None       # set once the connection is unusable for new streams
+        self._closed = False    # set once the socket is closed
+        self._sock = sock
+        self._max_streams = max_streams
+        self._streams = {}      # stream id -> _Stream, until the response ends
+        self._queue = []        # heap of (rank, ticket) of requests waiting for a stream slot
+        self._tickets = itertools.count()
+        self._outbox = []       # data_to_send() chunks in order, for the writer thread
+        self._frame_header = b""    # start of the header of the next received frame
+        self._frame_left = 0        # bytes of the current received frame not seen yet
+        self._goaway_left = False   # the current received frame is a GOAWAY
+        self._lock = threading.Lock()
+        self._cond = threading.Condition(self._lock)        # stream slots and send windows
+        self._writable = threading.Condition(self._lock)    # output queued for the writer
+        self._h2 = H2Connection(config=H2Configuration(client_side=True, header_encoding="utf-8"))
+        with self._cond:
+            self._h2.initiate_connection()
+            self._h2.update_settings({SettingCodes.ENABLE_PUSH: 0, SettingCodes.INITIAL_WINDOW_SIZE: window})
+            if window > 65535:
+                self._h2.increment_flow_control_window(window - 65535)
+            self._flush()
+        self._writer = threading.Thread(target=self._write_loop, name="shapeshiftio-h2-writer")
+        self._writer.daemon = True
+        self._writer.start()
+        reader = threading.Thread(target=self._read_loop, name="shapeshiftio-h2-reader")
+        reader.daemon = True
+        reader.start()
+
+    def request(self, method, authority, scheme, path, headers, body, timeout, weight, urgent, trace):
+        """ Internal. Sends one request and waits for its response; returns (status, headers, body). """
+        start = _clock()
+        deadline = None if timeout is None else start + timeout
+        stream = _Stream()
+        with self._cond:
+            stream_id = self._open_stream(method, authority, scheme, path, headers, body, weight, urgent, deadline)
+            self._streams[stream_id] = stream
+        try:
+            if body:
+                with self._cond:
+                    self._send_body(stream_id, stream, body, deadline)
+            sent = _clock()
+            if not stream.done.wait(None if deadline is None else max(deadline - sent, 0.0)):
+                raise _pool.socket.timeout("timed out")
+        except BaseException:
+            # Also a stream whose body was only partly sent: reset it rather than leave it open.
+            self._cancel(stream_id)
+            raise
+        if stream.error is not None:
+            raise stream.error
+        data = b"".join(stream.data)
+        if trace is not None:
+            trace.phases["send"] = sent - start
+            trace.phases["wait"] = _clock() - sent
+            trace.status = stream.status
+            trace.bytes_sent = len(body or b"")
+        return stream.status, stream.headers, data
+
+    def close(self):
+        """ Internal. Sends GOAWAY and closes the socket; the reader thread fails what is in flight. """
+        with self._cond:
+            if self.error is None:
+                self.error = _pool.socket.error("HTTP/2 connection closed")
+                try:
+                    self._h2.close_connection()
+                    self._flush()
+                except Exception:
+                    pass
+            self._closed = True
+            self._writable.notify()
+        # Give the writer a moment to send the GOAWAY.
+        self._writer.join(1.0)
+        try:
+            self._sock.shutdown(_pool.socket.SHUT_RDWR)
+        except Exception:
+            pass
+        self._sock.close()
+
+    def _open_stream(self, method, authority, scheme, path, headers, body, weight, urgent, deadline):
+        """ Internal. Waits for a stream slot, POSTs first, and sends the headers. Caller holds the lock. """
+        ticket = (0 if urgent else 1, next(self._tickets))
+        heapq.heappush(self._queue, ticket)
+        try:
+            while self.error is None and (self._queue[0] != ticket or len(self._streams) >= self._limit()):
+                self._wait(deadline)
+        finally:
+            self._queue.remove(ticket)
+            heapq.heapify(self._queue)
+            self._cond.notify_all()
+        if self.error is not None:
+            raise self.error
+
+        request_headers = [(":method", method), (":authority", authority), (":scheme", scheme), (":path", path)]
+        request_headers.extend((name, str(value)) for name, value in headers.items()
+                               if name not in _CONNECTION_HEADERS)
+        if body:
+            request_headers.append(("content-length", str(len(body))))
+        stream_id = self._h2.get_next_available_stream_id()
+        self._h2.send_headers(stream_id, request_headers, end_stream=not body, priority_weight=weight)
+        self._flush()
+        return stream_id
+
+    def _send_body(self, stream_id, stream, body, deadline):
+        """ Internal. Sends body in chunks the peer's flow control windows allow. Caller holds the lock. """
+        if not isinstance(body, bytes):
+            body = body.encode("utf-8")
+        offset = 0
+        while offset < len(body):
+            if stream.error is not None:
+                raise stream.error
+            size = min(self._h2.local_flow_control_window(stream_id), self._h2.max_outbound_frame_size,
+                       len(body) - offset)
+            if size <= 0:
+                self._wait(deadline)
+                continue
+            self._h2.send_data(stream_id, body[offset:offset + size], end_stream=offset + size == len(body))
+            self._flush()
+            offset += size
+
+    def _wait(self, deadline):
+        """ Internal. Waits for a window update or a free stream slot. Caller holds the lock. """
+        if deadline is None:
+            self._cond.wait()
+            return
+        remaining = deadline - _clock()
+        if remaining <= 0:
+            raise _pool.socket.timeout("timed out")
+        self._cond.wait(remaining)
+
+    def _limit(self):
+        """ Internal """
+        limit = self._h2.remote_settings.max_concurrent_streams
+        return limit if self._max_streams is None else min(limit, self._max_streams)
+
+    def _cancel(self, stream_id):
+        """ Internal. Resets a stream whose caller gave up on it. """
+        with self._cond:
+            if self._streams.pop(stream_id, None) is not None and not self._closed:
+                try:
+                    self._h2.reset_stream(stream_id, ErrorCodes.CANCEL)
+                    self._flush()
+                except Exception:
+                    pass
+            self._cond.notify_all()
+
+    def _flush(self):
+        """ Internal. Queues the pending output for the writer thread. Caller holds the lock. """
+        data = self._h2.data_to_send()
+        if data:
+            self._outbox.append(data)
+            self._writable.notify()
+
+    def _write_loop(self):
+        """ Internal. Runs on the writer thread; sends the queued output until the connection ends. """
+        try:
+            while True:
+                with self._cond:
+                    # Not until error is set: after a GOAWAY the remaining streams still send
+                    # window updates and resets.
+                    while not self._outbox and not self._closed:
+                        self._writable.wait()
+                    if not self._outbox:
+                        return
+                    data = b"".join(self._outbox)
+                    del self._outbox[:]
+                self._sock.sendall(data)
+        except Exception as e:
+            with self._cond:
+                if self.error is None:
+                    self.error = e
+            # Wakes the reader, which fails the streams in flight.
+            try:
+                self._sock.shutdown(_pool.socket.SHUT_RDWR)
+            except Exception:
+                pass
+
+    def _read_loop(self):
+        """ Internal. Runs on the reader thread until the connection ends. """
+        error = None
+        try:
+            while True:
+                data = self._sock.recv(65536)
+                if not data:
+                    raise _pool.socket.error("HTTP/2 connection closed by the server")
+                with self._cond:
+                    for chunk in self._split_after_goaway(data):
+                        for event in self._h2.receive_data(chunk):
+                            self._handle(event)
+                    self._flush()
+                    if self.error is not None and not self._streams:
+                        break
+        except Exception as e:
+            error = e
+        with self._cond:
+            if self.error is None:
+                self.error = error
+            for stream in self._streams.values():
+                stream.error = self.error
+                stream.done.set()
+            self._streams.clear()
+            self._closed = True
+            self._cond.notify_all()
+            self._writable.notify()
+        self._writer.join(1.0)
+        self._sock.close()
+
+    def _split_after_goaway(self, data):
+        """
+        Internal. Splits received data right after each GOAWAY frame, so that _handle sees the GOAWAY
+        before h2 is given the frames that follow it.
+        """
+        chunks = []
+        start = offset = 0
+        while offset < len(data):
+            if self._frame_left:
+                step = min(self._frame_left, len(data) - offset)
+                self._frame_left -= step
+                offset += step
+                if self._goaway_left and not self._frame_left:
+                    self._goaway_left = False
+                    chunks.append(data[start:offset])
+                    start = offset
+                continue
+            needed = _FRAME_HEADER_SIZE - len(self._frame_header)
+            self._frame_header += data[offset:offset + needed]
+            offset += needed
+            if len(self._frame_header) < _FRAME_HEADER_SIZE:
+                break
+            header = bytearray(self._frame_header)
+            self._frame_header = b""
+            self._frame_left = struct.unpack(">I", b"\0" + bytes(header[:3]))[0]
+            if header[3] == _GOAWAY:
+                self._goaway_left = True
+                if not self._frame_left:
+                    self._goaway_left = False
+                    chunks.append(data[start:offset])
+                    start = offset
+        if start < len(data):
+            chunks.append(data[start:])
+        return chunks
+
+    def _handle(self, event):
+        """ Internal. Caller holds the lock. """
+        stream = self._streams.get(getattr(event, "stream_id", None))
+        if isinstance(event, events.ResponseReceived):
+            if stream is not None:
+                for name, value in event.headers:
+                    if name == ":status":
+                        stream.status = int(value)
+                    else:
+                        stream.headers[name] = value
+        elif isinstance(event, events.DataReceived):
+            if stream is not None:
+                stream.data.append(event.data)
+            # Also for reset streams, so their data does not use up the connection window.
+            self._h2.acknowledge_received_data(event.flow_controlled_length, event.stream_id)
+        elif isinstance(event, events.StreamEnded):
+            if stream is not None:
+                del self._streams[event.stream_id]
+                stream.done.set()
+                self._cond.notify_all()
+        elif isinstance(event, events.StreamReset):
+            if stream is not None:
+                del self._streams[event.stream_id]
+                stream.error = _pool.socket.error("HTTP/2 stream reset by the server (error code %d)"
+                                                  % event.error_code)
+                stream.done.set()
+                self._cond.notify_all()
+        elif isinstance(event, events.ConnectionTerminated):
+            # GOAWAY: streams up to last_stream_id are still answered; later ones never will be.
+            self.error = _pool.socket.error("HTTP/2 connection shut down by the server (error code %d)"
+                                            % event.error_code)
+            for stream_id in [i for i in self._streams if event.last_stream_id is None or i > event.last_stream_id]:
+                stream = self._streams.pop(stream_id)
+                stream.error = self.error
+                stream.done.set()
+            if self._streams:
+                # h2 refuses every frame after a GOAWAY; reopen its state machine so the remaining
+                # streams can finish. error keeps new streams off this connection.
+                self._h2.state_machine.state = ConnectionState.CLIENT_OPEN
+            self._cond.notify_all()
+        elif isinstance(event, (events.WindowUpdated, events.RemoteSettingsChanged)):
+            self._cond.notify_all()
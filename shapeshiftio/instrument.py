@@ -0,0 +1,248 @@
+"""
+Instrumentation hooks for the request helpers.
+
+With an Instrumentation installed (default_instrumentation, or ShapeShiftIO(instrumentation=...)),
+every request is described by a RequestTrace: endpoint, method, URL, status, bytes sent and received,
+the exception if any, and per-phase timings in seconds:
+
+    throttle  wait for the RateLimiter, if one is installed
+    dns       name resolution           (new connections only)
+    connect   TCP connect               (new connections only)
+    tls       TLS handshake             (new https connections only)
+    send      writing the request
+    wait      until the response headers arrived, i.e. server time plus one round trip
+    read      reading the body
+    decode    JSON decoding
+
+Metrics is a built-in Instrumentation keeping fixed-bucket histograms per endpoint and phase, which
+can be exported in the Prometheus text format. Without instrumentation installed, the helpers skip
+all of this and only pay one attribute lookup per request.
+"""
+
+from bisect import bisect_left
+import threading
+import weakref
+
+# Prometheus' default latency buckets, in seconds.
+default_buckets = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+class RequestTrace(object):
+    """ Everything recorded about one request; passed to Instrumentation.record(). """
+    __slots__ = ("endpoint", "method", "url", "status", "bytes_sent", "bytes_received", "error",
+                 "duration", "phases")
+
+    def __init__(self, endpoint, method, url):
+        self.endpoint = endpoint
+        self.method = method
+        self.url = url
+        self.status = None
+        self.bytes_sent = 0
+        self.bytes_received = 0
+        self.error = None
+        self.duration = 0.0
+        self.phases = {}
+
+
+class Instrumentation(object):
+    """ Base class of instrumentation hooks. Override record(), which is called after every request. """
+    def record(self, trace):
+        pass
+
+
+class CallbackInstrumentation(Instrumentation):
+    """ Passes every RequestTrace to a callable, e.g. to feed another metrics library or a log. """
+    def __init__(self, callback):
+        self.callback = callback
+
+    def record(self, trace):
+        self.callback(trace)
+
+
+class _Sharded(object):
+    """
+    Internal. Per-thread shards (lists of numbers) that are only summed when read. When a thread ends,
+    its shard is folded into a base shard, so short-lived threads do not add up.
+    """
+    def __init__(self, size):
+        self._local = threading.local()
+        self._size = size
+        self._base = [0] * size
+        self._live = {}     # id(shard) -> shard of a running thread
+        self._lock = threading.Lock()
+
+    def _new_shard(self):
+        """ Internal. Creates the calling thread's shard. """
+        shard = self._local.shard = [0] * self._size
+        # The thread-local is cleared when the thread ends, which collects owner and runs the finalizer.
+        owner = self._local.owner = _ShardOwner()
+        weakref.finalize(owner, _fold, weakref.ref(self), shard).atexit = False
+        with self._lock:
+            self._live[id(shard)] = shard
+        return shard
+
+    def _fold(self, shard):
+        """ Internal """
+        with self._lock:
+            if self._live.pop(id(shard), None) is not None:
+                for i in range(self._size):
+                    self._base[i] += shard[i]
+
+    def _totals(self):
+        """ Internal. Element-wise sum of all shards. """
+        with self._lock:
+            totals = list(self._base)
+            shards = list(self._live.values())
+        for shard in shards:
+            for i in range(self._size):
+                totals[i] += shard[i]
+        return totals
+
+
+class _ShardOwner(object):
+    """ Internal. Lives in a thread-local next to the shard, so its collection marks the thread's end. """
+    __slots__ = ("__weakref__",)
+
+
+def _fold(ref, shard):
+    """ Internal """
+    sharded = ref()
+    if sharded is not None:
+        sharded._fold(shard)
+
+
+class LatencyHistogram(_Sharded):
+    """
+    Fixed-bucket histogram with one shard per thread, so observe() never takes a lock.
+    Shards are only merged when the histogram is read.
+    """
+    def __init__(self, buckets=default_buckets):
+        self.buckets = tuple(buckets)
+        # Per bucket counts, then the +Inf count, then the sum of observed values.
+        _Sharded.__init__(self, len(self.buckets) + 2)
+
+    def observe(self, value):
+        try:
+            shard = self._local.shard
+        except AttributeError:
+            shard = self._new_shard()
+        shard[bisect_left(self.buckets, value)] += 1
+        shard[-1] += value
+
+    def snapshot(self):
+        """ Returns (cumulative counts per bucket including +Inf, sum, count) over all threads. """
+        totals = self._totals()
+        cumulative = []
+        running = 0
+        for count in totals[:-1]:
+            running += count
+            cumulative.append(running)
+        return cumulative, float(totals[-1]), running
+
+    def percentile(self, fraction):
+        """ Upper bound of the bucket holding the given fraction of observations (inf past the last bucket). """
+        cumulative, _, count = self.snapshot()
+        if not count:
+            return 0.0
+        for bound, seen in zip(self.buckets + (float("inf"),), cumulative):
+            if seen >= fraction * count:
+                return bound
+        return float("inf")
+
+
+class _Counter(_Sharded):
+    """ Internal. Per-thread sharded counter, same scheme as LatencyHistogram. """
+    def __init__(self):
+        _Sharded.__init__(self, 1)
+
+    def add(self, value=1):
+        try:
+            shard = self._local.shard
+        except AttributeError:
+            shard = self._new_shard()
+        shard[0] += value
+
+    @property
+    def value(self):
+        return self._totals()[0]
+
+
+class Metrics(Instrumentation):
+    """
+    Built-in low-overhead metrics: latency histograms per (endpoint, phase), where the phase "total"
+    covers the whole request, plus request counts per status, error counts per exception type and
+    byte counters per endpoint.
+    """
+    def __init__(self, buckets=default_buckets, prefix="shapeshiftio"):
+        self.buckets = tuple(buckets)
+        self.prefix = prefix
+        self._histograms = {}   # (endpoint, phase) -> LatencyHistogram
+        self._counters = {}     # (name, labels) -> _Counter
+        self._lock = threading.Lock()
+
+    def record(self, trace):
+        endpoint = trace.endpoint or "unknown"
+        self.histogram(endpoint, "total").observe(trace.duration)
+        for phase, seconds in trace.phases.items():
+            self.histogram(endpoint, phase).observe(seconds)
+        self._counter("requests_total", (("endpoint", endpoint), ("status", str(trace.status or "none")))).add()
+        if trace.error is not None:
+            self._counter("request_errors_total",
+                          (("endpoint", endpoint), ("exception", type(trace.error).__name__))).add()
+        if trace.bytes_sent:
+            self._counter("sent_bytes_total", (("endpoint", endpoint),)).add(trace.bytes_sent)
+        if trace.bytes_received:
+            self._counter("received_bytes_total", (("endpoint", endpoint),)).add(trace.bytes_received)
+
+    def histogram(self, endpoint, phase="total"):
+        """ The LatencyHistogram of one endpoint and phase, created on first use. """
+        key = (endpoint, phase)
+        histogram = self._histograms.get(key)
+        if histogram is None:
+            with self._lock:
+                histogram = self._histograms.get(key)
+                if histogram is None:
+                    histogram = self._histograms[key] = LatencyHistogram(self.buckets)
+        return histogram
+
+    def counter(self, name, **labels):
+        """ Current value of a counter, e.g. counter("requests_total", endpoint="rate", status="200"). """
+        counter = self._counters.get((name, tuple(sorted(labels.items()))))
+        return counter.value if counter is not None else 0
+
+    def prometheus(self):
+        """ All metrics in the Prometheus text exposition format. """
+        name = self.prefix + "_request_duration_seconds"
+        lines = ["# HELP %s Request latency by endpoint and phase." % name, "# TYPE %s histogram" % name]
+        with self._lock:
+            histograms = sorted(self._histograms.items())
+            counters = sorted(self._counters.items())
+        for (endpoint, phase), histogram in histograms:
+            labels = 'endpoint="%s",phase="%s"' % (endpoint, phase)
+            cumulative, total, count = histogram.snapshot()
+            for bound, seen in zip(histogram.buckets + (float("inf"),), cumulative):
+                le = "+Inf" if bound == float("inf") else repr(bound)
+                lines.append('%s_bucket{%s,le="%s"} %d' % (name, labels, le, seen))
+            lines.append("%s_sum{%s} %r" % (name, labels, total))
+            lines.append("%s_count{%s} %d" % (name, labels, count))
+
+        declared = set()
+        for (counter_name, labels), counter in counters:
+            full_name = self.prefix + "_" + counter_name
+            if full_name not in declared:
+                declared.add(full_name)
+                lines.append("# TYPE %s counter" % full_name)
+            label_text = ",".join('%s="%s"' % item for item in labels)
+            lines.append("%s{%s} %d" % (full_name, label_text, counter.value))
+        return "\n".join(lines) + "\n"
+
+    def _counter(self, name, labels):
+        """ Internal """
+        key = (name, tuple(sorted(labels)))
+        counter = self._counters.get(key)
+        if counter is None:
+            with self._lock:
+                counter = self._counters.get(key)
+                if counter is None:
+                    counter = self._counters[key] = _Counter()
+        return counter
@@ -0,0 +1,85 @@
+"""
+Incremental parsing of a JSON array read from a socket or any other binary file object.
+
+Only the current element and one read buffer are held in memory, so a transaction history of any
+size can be processed one record at a time.
+"""
+
+import codecs
+
+_WHITESPACE = " \t\n\r"
+# Characters that can continue a number: "12" may be followed by "34", "1" by ".5" or "e3".
+_NUMBER_TAIL = frozenset("0123456789.eE+-")
+
+
+class _Reader(object):
+    """ Internal. Decoded text buffer over a binary file object. """
+    def __init__(self, fp, chunk_size):
+        self.fp = fp
+        self.chunk_size = chunk_size
+        self.utf8 = codecs.getincrementaldecoder("utf-8")()
+        self.buf = ""
+        self.pos = 0
+        self.eof = False
+
+    def more(self):
+        """ Appends the next chunk, dropping what was consumed. Returns False at end of data. """
+        if self.eof:
+            return False
+        chunk = self.fp.read(self.chunk_size)
+        self.eof = not chunk
+        self.buf = self.buf[self.pos:] + self.utf8.decode(chunk or b"", self.eof)
+        self.pos = 0
+        return not self.eof
+
+    def next_char(self):
+        """ Skips whitespace and returns the next character without consuming it, or "" at end of data. """
+        while True:
+            while self.pos < len(self.buf) and self.buf[self.pos] in _WHITESPACE:
+                self.pos += 1
+            if self.pos < len(self.buf):
+                return self.buf[self.pos]
+            if not self.more():
+                return ""
+
+
+def iter_json_array(fp, chunk_size=65536):
+    """
+    Yields the elements of the JSON array in fp one by one.
+
+    Raises ValueError if the document is not an array. For a JSON object, such as an API error
+    response, the message carries the object's text.
+    """
+    import json    # only needed once a stream is read
+    decoder = json.JSONDecoder()
+    reader = _Reader(fp, chunk_size)
+    if reader.next_char() != "[":
+        while reader.more():
+            pass
+        raise ValueError("Expected a JSON array, got: " + reader.buf[reader.pos:reader.pos + 500])
+    reader.pos += 1
+    if reader.next_char() == "]":
+        return
+
+    while True:
+        reader.next_char()
+        while True:
+            try:
+                value, end = decoder.raw_decode(reader.buf, reader.pos)
+            except ValueError:
+                if not reader.more():
+                    raise
+                continue
+            # A number cut off by the end of the buffer continues in the next chunk.
+            if (end == len(reader.buf) or reader.buf[end] in _NUMBER_TAIL) and reader.more():
+                continue
+            break
+        reader.pos = end
+        yield value
+
+        separator = reader.next_char()
+        if separator == "]":
+            return
+        if separator != ",":
+            raise ValueError("Expected ',' or ']' in JSON array, got: " + repr(reader.buf[reader.pos:reader.pos + 50]))
+        reader.pos += 1
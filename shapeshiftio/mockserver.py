@@ -0,0 +1,347 @@
+"""
+Local stand-in for shapeshift.io, for tests and benchmarks without network access.
+
+MockShapeShiftServer implements all 14 API endpoints over HTTP/1.1 keep-alive with realistic
+payloads, and can inject latency and errors. Point a client at it with url_base:
+
+    with MockShapeShiftServer(latency=0.005) as server:
+        api = ShapeShiftIO(url_base=server.url)
+        api.rate("btc_ltc")
+"""
+
+# Default to Python 2.x structure, fall back to Python 3.x structure.
+try:
+    from BaseHTTPServer import BaseHTTPRequestHandler, HTTPServer
+    from SocketServer import ThreadingMixIn
+    from urlparse import parse_qsl
+except ImportError:
+    from http.server import BaseHTTPRequestHandler, HTTPServer
+    from socketserver import ThreadingMixIn
+    from urllib.parse import parse_qsl
+
+from collections import deque
+import json
+import random
+import threading
+import time
+
+# USD prices and miner fees (in the coin itself) the mock market is derived from.
+default_coins = {
+    "BTC": ("Bitcoin", 30000.0, 0.0005),
+    "ETH": ("Ether", 2000.0, 0.003),
+    "LTC": ("Litecoin", 80.0, 0.001),
+    "XMR": ("Monero", 150.0, 0.0005),
+    "BCH": ("Bitcoin Cash", 250.0, 0.0002),
+    "DASH": ("Dash", 30.0, 0.002),
+    "ZEC": ("Zcash", 30.0, 0.0001),
+    "ETC": ("Ethereum Classic", 18.0, 0.01),
+    "DOGE": ("Dogecoin", 0.07, 2.0),
+    "XRP": ("Ripple", 0.5, 0.25),
+}
+
+_base58 = "123456789ABCDEFGHJKLMNPQRSTUVWXYZabcdefghijkmnopqrstuvwxyz"
+
+
+class _Server(ThreadingMixIn, HTTPServer):
+    """ Internal """
+    daemon_threads = True
+    allow_reuse_address = True
+    # Clients opening many connections at once would otherwise overflow the default backlog of 5.
+    request_queue_size = 256
+
+
+class _Handler(BaseHTTPRequestHandler):
+    """ Internal. Dispatches to the MockShapeShiftServer that owns the HTTP server. """
+    protocol_version = "HTTP/1.1"
+    # Headers and body go out in separate writes; without TCP_NODELAY the body waits for a delayed ACK.
+    disable_nagle_algorithm = True
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        self._dispatch("GET", None)
+
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers.get("Content-Length") or 0)).decode("utf-8")
+        if body.startswith("{"):
+            postdata = json.loads(body)
+        else:
+            postdata = dict(parse_qsl(body))
+        self._dispatch("POST", postdata)
+
+    def _dispatch(self, method, postdata):
+        mock = self.server.mock
+        status, payload = mock.handle(method, self.path, postdata)
+        body = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+class MockShapeShiftServer(object):
+    """
+    In-process HTTP server speaking the ShapeShift API.
+
+    latency      seconds added to every response, or a callable(path) returning them.
+    error_rate   fraction of requests answered with HTTP 500.
+    coins        {symbol: (name, usd_price, miner_fee)}; every ordered pair of them is a market.
+    transactions number of transactions returned for any affiliate key.
+    trade_rate   average trades per second on the recenttx tape.
+    seed         seed for the generated payloads, so runs are repeatable.
+
+    Deposit addresses created by shift/sendamount start in "no_deposits"; move them along with
+    set_status(). Fixed-amount orders expire after order_ttl seconds.
+    """
+    def __init__(self, host="127.0.0.1", port=0, latency=0.0, error_rate=0.0, coins=None, transactions=100,
+                 order_ttl=600, seed=0, trade_rate=1.0):
+        self.latency = latency
+        self.error_rate = error_rate
+        self.coins = dict(coins or default_coins)
+        self.order_ttl = order_ttl
+        self.trade_rate = trade_rate
+        self.requests = 0
+        self.orders = {}    # deposit address -> order dict
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self._transactions = [self._transaction() for _ in range(transactions)]
+        self._tape = deque(maxlen=50)     # recent trades, oldest first
+        self._tape_time = None
+        self._server = _Server((host, port), _Handler)
+        self._server.mock = self
+        self._thread = None
+
+    @property
+    def url(self):
+        """ Base URL to pass as url_base. """
+        host, port = self._server.server_address[:2]
+        return "http://%s:%d" % (host, port)
+
+    def start(self):
+        """ Serves requests on a background thread. Returns self. """
+        self._thread = threading.Thread(target=self._server.serve_forever)
+        self._thread.daemon = True
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+    def set_status(self, address, status, **fields):
+        """ Sets the tx_status of a deposit address, e.g. set_status(addr, "complete", transaction="..."). """
+        with self._lock:
+            order = self.orders.setdefault(address, {"address": address})
+            order["status"] = status
+            order.update(fields)
+
+    def handle(self, method, path, postdata):
+        """ Returns (http_status, payload) for one request. Called on the server's handler threads. """
+        with self._lock:
+            self.requests += 1
+            fail = self.error_rate and self._random.random() < self.error_rate
+        delay = self.latency(path) if callable(self.latency) else self.latency
+        if delay:
+            time.sleep(delay)
+        if fail:
+            return 500, {"error": "Internal server error"}
+
+        parts = path.strip("/").split("/")
+        name, args = parts[0], parts[1:]
+        if method == "GET":
+            handler = self._get_handlers.get(name)
+        else:
+            handler = self._post_handlers.get(name)
+        if handler is None:
+            return 404, {"error": "Not found"}
+        if method == "POST":
+            return 200, handler(self, postdata or {})
+        # GET arguments are the path segments after the endpoint name.
+        accepted = handler.__code__.co_argcount - 1
+        if len(args) > accepted:
+            return 404, {"error": "Not found"}
+        if len(args) < accepted - len(handler.__defaults__ or ()):
+            return 200, {"error": "Missing parameters"}
+        return 200, handler(self, *args)
+
+    # Market data
+
+    def _market(self, pair):
+        """ Internal. marketinfo record of a pair, or None. """
+        try:
+            coin_in, coin_out = pair.upper().split("_")
+            _, price_in, _ = self.coins[coin_in]
+            _, price_out, fee_out = self.coins[coin_out]
+        except (KeyError, ValueError):
+            return None
+        if coin_in == coin_out:
+            return None
+        return {"pair": pair.lower(), "rate": round(price_in / price_out * 0.995, 8),
+                "limit": round(50000.0 / price_in, 8), "maxLimit": round(50000.0 / price_in, 8),
+                "min": round(max(20.0 / price_in, 2 * fee_out * price_out / price_in), 8),
+                "minerFee": fee_out}
+
+    def _rate(self, pair):
+        market = self._market(pair)
+        if market is None:
+            return {"error": "Unknown pair"}
+        return {"pair": market["pair"], "rate": "%.8f" % market["rate"]}
+
+    def _limit(self, pair):
+        market = self._market(pair)
+        if market is None:
+            return {"error": "Unknown pair"}
+        return {"pair": market["pair"], "limit": "%.8f" % market["limit"], "min": market["min"]}
+
+    def _market_info(self, pair=""):
+        if pair:
+            return self._market(pair) or {"error": "Unknown pair"}
+        return [self._market(a.lower() + "_" + b.lower()) for a in sorted(self.coins) for b in sorted(self.coins)
+                if a != b]
+
+    def _recent_tx(self, max_results="5"):
+        try:
+            count = min(max(int(max_results), 1), 50)
+        except ValueError:
+            return {"error": "Invalid number of results"}
+        now = time.time()
+        with self._lock:
+            symbols = sorted(self.coins)
+            # Trades arrive at random (Poisson) times; start with a full tape.
+            if self._tape_time is None or now - self._tape_time > 100.0 / self.trade_rate:
+                self._tape_time = now - 100.0 / self.trade_rate
+            while True:
+                at = self._tape_time + self._random.expovariate(self.trade_rate)
+                if at > now:
+                    break
+                self._tape_time = at
+                self._tape.append({"curIn": self._random.choice(symbols), "curOut": self._random.choice(symbols),
+                                   "amount": round(self._random.uniform(0.01, 20.0), 8), "timestamp": round(at, 3)})
+            return list(reversed(self._tape))[:count]
+
+    def _coin_list(self):
+        return dict((symbol, {"name": name, "symbol": symbol, "status": "available",
+                              "image": "https://shapeshift.io/images/coins/%s.png" % name.lower().replace(" ", "")})
+                    for symbol, (name, _, _) in self.coins.items())
+
+    # Transactions
+
+    def _address(self):
+        """ Internal """
+        with self._lock:
+            return "1" + "".join(self._random.choice(_base58) for _ in range(33))
+
+    def _transaction(self):
+        """ Internal """
+        symbols = sorted(self.coins)
+        coin_in, coin_out = self._random.sample(symbols, 2)
+        market = self._market(coin_in.lower() + "_" + coin_out.lower())
+        amount = round(self._random.uniform(market["min"], market["limit"] / 10), 8)
+        return {"inputTXID": "%064x" % self._random.getrandbits(256),
+                "inputAddress": "1" + "".join(self._random.choice(_base58) for _ in range(33)),
+                "inputCurrency": coin_in, "inputAmount": amount,
+                "outputTXID": "%064x" % self._random.getrandbits(256),
+                "outputAddress": "1" + "".join(self._random.choice(_base58) for _ in range(33)),
+                "outputCurrency": coin_out, "outputAmount": round(amount * market["rate"], 8),
+                "shiftRate": "%.8f" % market["rate"], "status": "complete"}
+
+    def _tx_status(self, address):
+        with self._lock:
+            order = self.orders.get(address)
+            if order is None:
+                return {"status": "no_deposits", "address": address}
+            response = dict(order)
+        response.setdefault("status", "no_deposits")
+        for key in ("expiration", "depositAmount", "pair", "withdrawalAmount"):
+            response.pop(key, None)
+        return response
+
+    def _time_remaining(self, address):
+        with self._lock:
+            order = self.orders.get(address)
+        if order is None or "expiration" not in order:
+            return {"error": "Unable to find pending transaction"}
+        remaining = max(int(order["expiration"] / 1000 - time.time()), 0)
+        return {"status": "pending" if remaining else "expired", "seconds_remaining": remaining}
+
+    def _tx_by_api_key(self, api_key):
+        return self._transactions
+
+    def _tx_by_address(self, address, api_key):
+        return [tx for tx in self._transactions if tx["outputAddress"] == address]
+
+    def _validate_address(self, address, coin):
+        if coin.upper() not in self.coins:
+            return {"isvalid": False, "error": "Unknown coin"}
+        if 26 <= len(address) <= 64 and address.isalnum():
+            return {"isvalid": True}
+        return {"isvalid": False, "error": "Invalid address"}
+
+    def _shift(self, postdata):
+        market = self._market(postdata.get("pair", ""))
+        if market is None:
+            return {"error": "Unknown pair"}
+        if not postdata.get("withdrawal"):
+            return {"error": "Invalid withdrawal address"}
+        coin_in, coin_out = market["pair"].upper().split("_")
+        deposit = self._address()
+        self.set_status(deposit, "no_deposits")
+        response = {"deposit": deposit, "depositType": coin_in, "withdrawal": postdata["withdrawal"],
+                    "withdrawalType": coin_out}
+        if postdata.get("apiKey") or postdata.get("api_key"):
+            response["apiPubKey"] = postdata.get("apiKey") or postdata.get("api_key")
+        return response
+
+    def _set_mail(self, postdata):
+        if not postdata.get("email") or not postdata.get("txid"):
+            return {"error": "Missing email or txid"}
+        return {"email": {"status": "success", "message": "Email receipt sent"}}
+
+    def _send_amount(self, postdata):
+        market = self._market(postdata.get("pair", ""))
+        if market is None:
+            return {"error": "Unknown pair"}
+        try:
+            amount = float(postdata["amount"])
+        except (KeyError, ValueError):
+            return {"error": "Invalid amount"}
+        deposit_amount = round((amount + market["minerFee"]) / market["rate"], 8)
+        if deposit_amount > market["limit"]:
+            return {"error": "Amount exceeds limit"}
+        if deposit_amount < market["min"]:
+            return {"error": "Amount below minimum"}
+        success = {"pair": market["pair"], "withdrawalAmount": "%.8f" % amount,
+                   "depositAmount": "%.8f" % deposit_amount,
+                   "expiration": int((time.time() + self.order_ttl) * 1000),
+                   "quotedRate": "%.8f" % market["rate"], "minerFee": "%.8f" % market["minerFee"]}
+        if postdata.get("withdrawal"):
+            success["withdrawal"] = postdata["withdrawal"]
+            success["deposit"] = self._address()
+            with self._lock:
+                self.orders[success["deposit"]] = {"status": "no_deposits", "address": success["deposit"],
+                                                   "expiration": success["expiration"]}
+        return {"success": success}
+
+    def _cancel_pending(self, postdata):
+        with self._lock:
+            order = self.orders.get(postdata.get("address"))
+            if order is None or order.get("status") != "no_deposits":
+                return {"error": "Unable to cancel pending transaction"}
+            order["status"] = "failed"
+            order["error"] = "Cancelled"
+        return {"success": " Pending Transaction cancelled "}
+
+    _get_handlers = {"rate": _rate, "limit": _limit, "marketinfo": _market_info, "recenttx": _recent_tx,
+                     "txStat": _tx_status, "timeremaining": _time_remaining, "getcoins": _coin_list,
+                     "txbyapi_key": _tx_by_api_key, "txbyaddress": _tx_by_address,
+                     "validateAddress": _validate_address}
+    _post_handlers = {"shift": _shift, "mail": _set_mail, "sendamount": _send_amount,
+                      "cancelpending": _cancel_pending}
@@ -0,0 +1,249 @@
+"""
+Lifecycle manager for fixed-amount (send_amount) orders.
+
+OrderManager tracks any number of pending orders on one heap scheduler and a bounded worker pool:
+
+    - An order without a deposit is polled rarely, backing off up to max_interval, and always once more
+      just after its expiration. If it still has no deposit then, it is cancelled with cancel_pending.
+    - Once a deposit is "received" the order is polled every received_interval until it is "complete"
+      or "failed".
+    - Every order's status and next poll time are kept in SQLite, so after a restart each order is
+      polled when it was due anyway instead of all at once.
+
+Status changes are yielded by events() or passed to a callback by run(), like AddressWatcher.
+"""
+
+from collections import namedtuple
+import heapq
+import itertools
+import sqlite3
+import threading
+import time
+
+from .shapeshiftio import send_amount, tx_status, time_remaining, cancel_pending
+from .watcher import _Scheduler
+
+# old_status is None for the first status of an order. response is the tx_status response that
+# carried the new status, or the cancel_pending response for "cancelled" and "expired".
+OrderEvent = namedtuple("OrderEvent", "deposit old_status status response")
+
+# "cancelled": cancelled after expiring without a deposit. "expired": expired, but cancel_pending
+# kept failing, so the order was given up.
+TERMINAL_STATUSES = frozenset(("complete", "failed", "cancelled", "expired"))
+
+
+def _seconds(expiration):
+    """ Internal. send_amount reports the expiration in milliseconds since the epoch. """
+    if expiration is None:
+        return None
+    expiration = float(expiration)
+    return expiration / 1000.0 if expiration > 1e11 else expiration
+
+
+class _Order(object):
+    """ Internal. State of one order. """
+    __slots__ = ("deposit", "pair", "expiration", "status", "interval", "due", "cancel_attempts")
+
+    def __init__(self, deposit, pair, expiration, status, interval, due, cancel_attempts=0):
+        self.deposit = deposit
+        self.pair = pair
+        self.expiration = expiration    # seconds since the epoch; None: ask time_remaining; 0: none
+        self.status = status
+        self.interval = interval
+        self.due = due
+        self.cancel_attempts = cancel_attempts
+
+
+class OrderManager(_Scheduler):
+    """
+    path                SQLite database file. ":memory:" keeps the state for the lifetime of this object only.
+    url_store           passed to the API calls, so a ShapeShiftIO's transport and settings apply.
+    workers             maximum number of polls in flight.
+    idle_interval       first delay between polls of an order without a deposit; multiplied by backoff
+                        on each unchanged poll, up to max_interval.
+    received_interval   seconds between polls once a deposit is received.
+    expiry_grace        seconds after the expiration at which an order without a deposit is checked
+                        one last time and cancelled.
+    max_cancel_attempts failed cancel_pending calls after which an expired order is given up as "expired".
+    """
+    def __init__(self, path=":memory:", url_store=None, timeout=None, workers=8, idle_interval=60.0,
+                 max_interval=300.0, backoff=1.5, received_interval=10.0, expiry_grace=5.0,
+                 max_cancel_attempts=3):
+        self.url_store = url_store
+        self.timeout = timeout
+        self.workers = workers
+        self.idle_interval = idle_interval
+        self.max_interval = max_interval
+        self.backoff = backoff
+        self.received_interval = received_interval
+        self.expiry_grace = expiry_grace
+        self.max_cancel_attempts = max_cancel_attempts
+        self.last_errors = {}   # deposit -> last exception raised while polling it
+        self._orders = {}
+        self._heap = []
+        self._seq = itertools.count()
+        self._lock = threading.Lock()
+        self._dirty = {}        # deposit -> order whose row needs writing
+        self._stopped = False
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute("CREATE TABLE IF NOT EXISTS orders (deposit TEXT PRIMARY KEY, pair TEXT, expiration REAL, "
+                         "status TEXT, interval REAL, due REAL, cancel_attempts INTEGER)")
+        self._db.commit()
+        self._load()
+
+    def place(self, postdata):
+        """
+        Calls send_amount with postdata and tracks the resulting order. Returns the send_amount response.
+        Quotes (no withdrawal address) and errors are returned without tracking anything.
+        """
+        response = send_amount(postdata, self.url_store, self.timeout)
+        success = response.get("success") if isinstance(response, dict) else None
+        if isinstance(success, dict) and success.get("deposit"):
+            self.track(success["deposit"], success.get("expiration"), success.get("pair"))
+        return response
+
+    def track(self, deposit, expiration=None, pair=None):
+        """
+        Starts tracking an existing order. expiration is the send_amount "expiration" (milliseconds or
+        seconds since the epoch); without it the first poll asks time_remaining.
+        """
+        now = time.time()
+        with self._lock:
+            if deposit in self._orders:
+                return
+            order = _Order(deposit, pair, _seconds(expiration), None, self.idle_interval, now)
+            order.due = self._next_due(order, now)
+            self._orders[deposit] = order
+            heapq.heappush(self._heap, (order.due, next(self._seq), deposit))
+            self._dirty[deposit] = order
+        self._flush()
+
+    def remove(self, deposit):
+        """ Stops tracking an order; its stored state is deleted too. """
+        with self._lock:
+            self._orders.pop(deposit, None)
+            self._dirty.pop(deposit, None)
+            self._db.execute("DELETE FROM orders WHERE deposit = ?", (deposit,))
+            self._db.commit()
+
+    def statuses(self):
+        """ Last known status of every tracked order, by deposit address (None before its first poll). """
+        with self._lock:
+            return dict((deposit, order.status) for deposit, order in self._orders.items())
+
+    def __len__(self):
+        return len(self._orders)
+
+    def close(self):
+        self._flush()
+        self._db.close()
+
+    def run(self, callback):
+        """ Calls callback(OrderEvent) for every status change until all orders are done. """
+        for event in self.events():
+            callback(event)
+
+    def events(self):
+        """ Yields OrderEvent events until every order is in a terminal status or stop() is called. """
+        try:
+            for finished in self._finished_polls(self._orders):
+                events = [self._handle(order, future) for order, future in finished]
+                self._flush()
+                for event in events:
+                    if event is not None:
+                        yield event
+        finally:
+            self._flush()
+
+    def _take(self, entry):
+        """ Internal. Caller holds the lock. Entries of removed orders, or superseded by a later track(), are skipped. """
+        due, _, deposit = entry
+        order = self._orders.get(deposit)
+        return order if order is not None and order.due == due else None
+
+    def _poll(self, order):
+        """ Internal. Runs on a worker thread; returns (status, response). """
+        now = time.time()
+        if order.expiration is None:
+            remaining = time_remaining(order.deposit, self.url_store, self.timeout)
+            if "seconds_remaining" in remaining:
+                order.expiration = now + float(remaining["seconds_remaining"])
+            else:
+                order.expiration = 0
+        response = tx_status(order.deposit, self.url_store, self.timeout)
+        status = response.get("status")
+        if status == "no_deposits" and order.expiration and now >= order.expiration:
+            cancelled = cancel_pending({"address": order.deposit}, self.url_store, self.timeout)
+            if isinstance(cancelled, dict) and "success" in cancelled:
+                return "cancelled", cancelled
+            order.cancel_attempts += 1
+            if order.cancel_attempts >= self.max_cancel_attempts:
+                return "expired", cancelled
+        return status, response
+
+    def _handle(self, order, future):
+        """ Internal. Records a finished poll, reschedules the order and returns the event, if any. """
+        event = None
+        now = time.time()
+        try:
+            status, response = future.result()
+        except Exception as e:
+            self.last_errors[order.deposit] = e
+            status, response = order.status, None
+            order.interval = min(order.interval * self.backoff, self.max_interval)
+        else:
+            self.last_errors.pop(order.deposit, None)
+            if status is None:
+                # An API error without a status says nothing about the order; try again later.
+                status = order.status
+            elif status != order.status:
+                event = OrderEvent(order.deposit, order.status, status, response)
+                order.interval = self.idle_interval
+            elif status == "no_deposits":
+                order.interval = min(order.interval * self.backoff, self.max_interval)
+        order.status = status
+
+        with self._lock:
+            if self._orders.get(order.deposit) is not order:
+                return event
+            self._dirty[order.deposit] = order
+            if status in TERMINAL_STATUSES:
+                del self._orders[order.deposit]
+            else:
+                order.due = self._next_due(order, now)
+                heapq.heappush(self._heap, (order.due, next(self._seq), order.deposit))
+        return event
+
+    def _next_due(self, order, now):
+        """ Internal. Time of the next poll of an order. """
+        if order.status == "received":
+            return now + self.received_interval
+        due = now + order.interval
+        if order.expiration:
+            deadline = order.expiration + self.expiry_grace
+            # Past the deadline the order is waiting to be cancelled, so it is retried soon.
+            due = min(due, deadline) if now < deadline else now + self.received_interval
+        return due
+
+    def _load(self):
+        """ Internal. Schedules the unfinished orders of a previous run at their stored times. """
+        rows = self._db.execute("SELECT deposit, pair, expiration, status, interval, due, cancel_attempts "
+                                "FROM orders").fetchall()
+        for deposit, pair, expiration, status, interval, due, cancel_attempts in rows:
+            if status in TERMINAL_STATUSES:
+                continue
+            order = _Order(deposit, pair, expiration, status, interval, due, cancel_attempts)
+            self._orders[deposit] = order
+            heapq.heappush(self._heap, (due, next(self._seq), deposit))
+
+    def _flush(self):
+        """ Internal. Writes the changed orders in one transaction. """
+        with self._lock:
+            if not self._dirty:
+                return
+            rows = [(order.deposit, order.pair, order.expiration, order.status, order.interval, order.due,
+                     order.cancel_attempts) for order in self._dirty.values()]
+            self._dirty.clear()
+            self._db.executemany("INSERT OR REPLACE INTO orders (deposit, pair, expiration, status, interval, "
+                                 "due, cancel_attempts) VALUES (?, ?, ?, ?, ?, ?, ?)", rows)
+            self._db.commit()
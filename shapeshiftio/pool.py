@@ -0,0 +1,320 @@
+"""
+Persistent HTTP/1.1 connection pool used by the request helpers.
+
+Connections are kept alive and reused per (scheme, host, port), so repeated calls
+to shapeshift.io skip the TCP and TLS handshakes that urlopen() pays on every call.
+"""
+
+from io import BytesIO
+import threading
+import time
+
+# Monotonic high-resolution clock for phase timings (Python 2 falls back to time.time).
+_clock = getattr(time, "perf_counter", time.time)
+
+# http.client, ssl, socket and the urllib modules take longer to import than the rest of the package,
+# so they are imported by _import_network() when the first request is sent, not with this module.
+httplib = ssl = socket = select = urlsplit = HTTPError = Request = urlopen = None
+
+# Errors seen when the server has closed a kept-alive connection while it sat idle.
+_STALE_ERRORS = ()
+
+# Methods that may be resent after a stale connection failed. A POST may already have been acted on
+# (a shift or send_amount order placed twice), so it is never resent.
+_IDEMPOTENT_METHODS = frozenset(("GET", "HEAD"))
+
+
+def _import_network():
+    """ Internal. httplib is assigned last, so a thread seeing it set finds the other names set too. """
+    global httplib, ssl, socket, select, urlsplit, HTTPError, Request, urlopen, _STALE_ERRORS
+    # Default to Python 2.x structure, fall back to Python 3.x structure.
+    try:
+        import httplib as _httplib
+    except ImportError:
+        import http.client as _httplib
+
+    try:
+        from urlparse import urlsplit
+    except ImportError:
+        from urllib.parse import urlsplit
+
+    try:
+        from urllib2 import HTTPError, Request, urlopen
+    except ImportError:
+        from urllib.error import HTTPError
+        from urllib.request import Request, urlopen
+
+    import select
+    import socket
+    import ssl
+
+    try:
+        _STALE_ERRORS = (_httplib.BadStatusLine, ConnectionError)
+    except NameError:
+        _STALE_ERRORS = (_httplib.BadStatusLine,)
+    httplib = _httplib
+
+
+def _dropped(sock):
+    """ Internal. True when an idle connection is readable, i.e. the server closed it (or sent junk). """
+    try:
+        return bool(select.select([sock], [], [], 0)[0])
+    except (ValueError, select.error):
+        return True
+
+
+class ConnectionPool(object):
+    """
+    Thread-safe pool of keep-alive HTTP(S) connections.
+
+    maxsize       maximum number of open connections per host. Callers block until one is released, or
+                  raise socket.timeout once their request's timeout has passed.
+    idle_timeout  seconds an unused connection may sit in the pool before it is closed instead of reused.
+    """
+    def __init__(self, maxsize=10, idle_timeout=30.0, headers=None, ssl_context=None):
+        self.maxsize = maxsize
+        self.idle_timeout = idle_timeout
+        self.headers = {"User-Agent": "shapeshiftio"}
+        if headers:
+            self.headers.update(headers)
+        self.ssl_context = ssl_context
+        self._cond = threading.Condition()
+        self._idle = {}     # key -> [(connection, released_at), ...], oldest first
+        self._open = {}     # key -> number of open connections, idle or in use
+
+    def request(self, method, url, body=None, headers=None, timeout=None, trace=None):
+        """
+        Sends one request and returns the response body as bytes.
+        Raises HTTPError for 4xx/5xx statuses, like urlopen().
+
+        trace is an optional RequestTrace (see instrument.py) that receives the phase timings,
+        status and byte counts of this request.
+        """
+        response = self.open(method, url, body, headers, timeout, trace)
+        try:
+            if trace is None:
+                return response.read()
+            start = _clock()
+            data = response.read()
+            trace.phases["read"] = _clock() - start
+            trace.bytes_received = len(data)
+            return data
+        finally:
+            response.close()
+
+    def open(self, method, url, body=None, headers=None, timeout=None, trace=None):
+        """
+        Sends one request and returns the response as a file-like object, so a large body can be read
+        incrementally. close() it, or use it in a with block, to hand the connection back to the pool.
+        Raises HTTPError for 4xx/5xx statuses, like urlopen().
+        """
+        if httplib is None:
+            _import_network()
+        parts = urlsplit(url)
+        key = (parts.scheme, parts.hostname, parts.port)
+        path = parts.path or "/"
+        if parts.query:
+            path += "?" + parts.query
+        all_headers = dict(self.headers)
+        if headers:
+            all_headers.update(headers)
+
+        conn, reused = self._acquire(key, timeout)
+        if reused and method not in _IDEMPOTENT_METHODS and _dropped(conn.sock):
+            # A POST cannot be resent, so it is not sent over a connection the server already closed.
+            conn.close()
+            reused = False
+        try:
+            try:
+                response = self._send(conn, key, method, path, body, all_headers, timeout, trace)
+            except _STALE_ERRORS:
+                # Only a reused connection may have gone stale; a fresh one failing is a real error.
+                if not reused or method not in _IDEMPOTENT_METHODS:
+                    raise
+                conn.close()
+                response = self._send(conn, key, method, path, body, all_headers, timeout, trace)
+        except Exception:
+            conn.close()
+            self._release(key, None)
+            raise
+
+        pooled = _PooledResponse(self, key, conn, response)
+        if response.status >= 400:
+            try:
+                data = pooled.read()
+            finally:
+                pooled.close()
+            raise HTTPError(url, response.status, response.reason, response.msg, BytesIO(data))
+        return pooled
+
+    def close(self):
+        """ Closes every idle connection. Connections in use are closed when released. """
+        with self._cond:
+            for key, idle in self._idle.items():
+                for conn, _ in idle:
+                    conn.close()
+                self._open[key] -= len(idle)
+            self._idle.clear()
+            self._cond.notify_all()
+
+    def _send(self, conn, key, method, path, body, headers, timeout, trace):
+        """ Internal """
+        conn.timeout = timeout
+        if conn.sock is None:
+            self._connect(conn, key, timeout, trace)
+        else:
+            conn.sock.settimeout(timeout)
+        if trace is None:
+            conn.request(method, path, body, headers)
+            return conn.getresponse()
+
+        start = _clock()
+        conn.request(method, path, body, headers)
+        sent = _clock()
+        response = conn.getresponse()
+        trace.phases["send"] = sent - start
+        trace.phases["wait"] = _clock() - sent
+        trace.status = response.status
+        trace.bytes_sent = len(body or b"")
+        return response
+
+    def _connect(self, conn, key, timeout, trace):
+        """ Internal. Resolves, connects and wraps TLS in separate steps so each can be timed. """
+        scheme, host, port = key
+        start = _clock()
+        addresses = socket.getaddrinfo(host, port or conn.default_port, 0, socket.SOCK_STREAM)
+        resolved = _clock()
+        sock = None
+        error = socket.error("getaddrinfo returned no addresses for " + host)
+        for family, socktype, proto, _, address in addresses:
+            try:
+                sock = socket.socket(family, socktype, proto)
+                sock.settimeout(timeout)
+                sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+                sock.connect(address)
+                break
+            except socket.error as e:
+                error = e
+                if sock is not None:
+                    sock.close()
+                    sock = None
+        if sock is None:
+            raise error
+        connected = _clock()
+        if scheme == "https":
+            if self.ssl_context is None:
+                self.ssl_context = ssl.create_default_context()
+            try:
+                sock = self.ssl_context.wrap_socket(sock, server_hostname=host)
+            except Exception:
+                sock.close()
+                raise
+        conn.sock = sock
+        if trace is not None:
+            trace.phases["dns"] = resolved - start
+            trace.phases["connect"] = connected - resolved
+            if scheme == "https":
+                trace.phases["tls"] = _clock() - connected
+
+    def _acquire(self, key, timeout=None):
+        """ Internal. Returns (connection, reused). """
+        deadline = None if timeout is None else _clock() + timeout
+        with self._cond:
+            while True:
+                idle = self._idle.get(key)
+                if idle:
+                    self._evict(key, idle, time.time())
+                    if idle:
+                        return idle.pop()[0], True
+                if self._open.get(key, 0) < self.maxsize:
+                    self._open[key] = self._open.get(key, 0) + 1
+                    break
+                if deadline is None:
+                    self._cond.wait()
+                    continue
+                remaining = deadline - _clock()
+                if remaining <= 0:
+                    raise socket.timeout("timed out waiting for a connection to " + str(key[1]))
+                self._cond.wait(remaining)
+        scheme, host, port = key
+        if scheme == "https":
+            return httplib.HTTPSConnection(host, port), False
+        return httplib.HTTPConnection(host, port), False
+
+    def _release(self, key, conn):
+        """ Internal. Pass conn=None when the connection was closed. """
+        with self._cond:
+            if conn is None:
+                self._open[key] -= 1
+            else:
+                self._idle.setdefault(key, []).append((conn, time.time()))
+            self._cond.notify()
+
+    def _evict(self, key, idle, now):
+        """ Internal. Closes connections idle for longer than idle_timeout. Caller holds the lock. """
+        while idle and now - idle[0][1] >= self.idle_timeout:
+            idle.pop(0)[0].close()
+            self._open[key] -= 1
+
+
+class _PooledResponse(object):
+    """ Internal. Response that returns its connection to the pool when closed after being read to the end. """
+    def __init__(self, pool, key, conn, response):
+        self._pool = pool
+        self._key = key
+        self._conn = conn
+        self._response = response
+        self.status = response.status
+        self.reason = response.reason
+        self.headers = response.msg
+
+    def read(self, amt=None):
+        return self._response.read(amt)
+
+    def close(self):
+        """ A connection whose body was not fully read cannot be reused, so it is closed instead. """
+        if self._conn is None:
+            return
+        conn, self._conn = self._conn, None
+        if self._response.isclosed() and not self._response.will_close:
+            self._pool._release(self._key, conn)
+        else:
+            self._response.close()
+            conn.close()
+            self._pool._release(self._key, None)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+class UrlopenTransport(object):
+    """
+    Transport that opens a new connection per request through urlopen(), as the module did before
+    ConnectionPool. Slower, but honours urllib's proxy settings and installed openers.
+    """
+    def request(self, method, url, body=None, headers=None, timeout=None, trace=None):
+        """ Sends one request and returns the response body as bytes. Only status and bytes are traced. """
+        response = self.open(method, url, body, headers, timeout, trace)
+        try:
+            data = response.read()
+        finally:
+            response.close()
+        if trace is not None:
+            trace.bytes_received = len(data)
+        return data
+
+    def open(self, method, url, body=None, headers=None, timeout=None, trace=None):
+        """ Sends one request and returns the urlopen() response. """
+        if httplib is None:
+            _import_network()
+        response = urlopen(Request(url, body, headers or {}), timeout=timeout)
+        if trace is not None:
+            trace.status = response.getcode()
+            trace.bytes_sent = len(body or b"")
+        return response
+
+    def close(self):
+        pass
@@ -0,0 +1,156 @@
+"""
+Vectorized bulk quoting over a market snapshot.
+
+quote_batch() takes parallel sequences of pairs and input amounts and computes, in one pass over the
+MarketSnapshot table, the estimated output (amount * rate - minerFee) and whether each amount is
+below min, above limit, or for an unknown pair. NumPy is used when it is installed; otherwise the
+same columns are built as array.array. Only the quotes that need a binding rate are then sent to
+send_amount, through QuoteBatch.bind().
+"""
+
+from array import array
+
+from .shapeshiftio import send_amount
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+# Values of the QuoteBatch.status column.
+OK = 0
+BELOW_MIN = 1       # below the pair's min, or the miner fee eats the whole amount
+ABOVE_LIMIT = 2
+UNKNOWN_PAIR = 3
+
+
+class QuoteBatch(object):
+    """
+    Columnar quote results, one row per input (pair, amount).
+
+    pairs          list of the pairs, as given.
+    amount, rate, output, miner_fee, min, limit
+                   float columns; NaN where the pair is unknown.
+    status         OK, BELOW_MIN, ABOVE_LIMIT or UNKNOWN_PAIR per row.
+    needs_binding  1 for rows that should get a binding send_amount quote.
+
+    Columns are NumPy arrays when NumPy is available, array.array otherwise.
+    """
+    def __init__(self, pairs, amount, rate, output, miner_fee, minimum, limit, status, needs_binding):
+        self.pairs = pairs
+        self.amount = amount
+        self.rate = rate
+        self.output = output
+        self.miner_fee = miner_fee
+        self.min = minimum
+        self.limit = limit
+        self.status = status
+        self.needs_binding = needs_binding
+
+    def __len__(self):
+        return len(self.pairs)
+
+    def row(self, i):
+        """ One quote as a dict. """
+        return {"pair": self.pairs[i], "amount": float(self.amount[i]), "rate": float(self.rate[i]),
+                "output": float(self.output[i]), "minerFee": float(self.miner_fee[i]), "min": float(self.min[i]),
+                "limit": float(self.limit[i]), "status": int(self.status[i])}
+
+    def ok(self):
+        """ Indexes of the rows whose status is OK. """
+        return [i for i in range(len(self.pairs)) if self.status[i] == OK]
+
+    def bind(self, indices=None, url_store=None, timeout=None):
+        """
+        Requests a binding send_amount quote (amount = estimated output) for the given rows, by default
+        those flagged in needs_binding. Returns {row index: send_amount response}.
+        """
+        if indices is None:
+            indices = [i for i in range(len(self.pairs)) if self.needs_binding[i]]
+        results = {}
+        for i in indices:
+            postdata = {"amount": "%.8f" % float(self.output[i]), "pair": self.pairs[i]}
+            results[i] = send_amount(postdata, url_store, timeout)
+        return results
+
+
+def quote_batch(snapshot, pairs, amounts, bind_above=None, url_store=None, timeout=None):
+    """
+    Quotes every (pairs[i], amounts[i]) against snapshot, refreshing it first if it has expired.
+
+    bind_above  rows with status OK and an amount at or above this are flagged in needs_binding.
+    """
+    snapshot.ensure_fresh(url_store, timeout)
+    table = snapshot.table
+    pairs = list(pairs)
+    if len(pairs) != len(amounts):
+        raise ValueError("pairs and amounts differ in length")
+    if numpy is not None:
+        return _quote_numpy(table, pairs, amounts, bind_above)
+    return _quote_array(table, pairs, amounts, bind_above)
+
+
+def _quote_numpy(table, pairs, amounts, bind_above):
+    """ Internal """
+    index = table.index
+    count = len(pairs)
+    rows = numpy.fromiter((index.get(pair, -1) for pair in pairs), dtype=numpy.intp, count=count)
+    amount = numpy.asarray(amounts, dtype=numpy.float64)
+    known = rows >= 0
+    safe_rows = numpy.where(known, rows, 0)
+
+    def column(values):
+        if not len(values):
+            return numpy.full(count, numpy.nan)
+        return numpy.where(known, numpy.frombuffer(values, dtype=numpy.float64)[safe_rows], numpy.nan)
+
+    rate = column(table.rate)
+    miner_fee = column(table.miner_fee)
+    minimum = column(table.min)
+    limit = column(table.limit)
+    output = amount * rate - miner_fee
+
+    status = numpy.zeros(count, dtype=numpy.int8)
+    with numpy.errstate(invalid="ignore"):
+        status[(amount < minimum) | (output <= 0)] = BELOW_MIN
+        status[(limit > 0) & (amount > limit)] = ABOVE_LIMIT
+    status[~known] = UNKNOWN_PAIR
+    if bind_above is None:
+        needs_binding = numpy.zeros(count, dtype=numpy.int8)
+    else:
+        needs_binding = ((status == OK) & (amount >= bind_above)).astype(numpy.int8)
+    return QuoteBatch(pairs, amount, rate, output, miner_fee, minimum, limit, status, needs_binding)
+
+
+def _quote_array(table, pairs, amounts, bind_above):
+    """ Internal """
+    index = table.index
+    nan = float("nan")
+    rate_column, fee_column, min_column, limit_column = table.rate, table.miner_fee, table.min, table.limit
+    amount = array("d", amounts)
+    rate, output, miner_fee, minimum, limit = array("d"), array("d"), array("d"), array("d"), array("d")
+    status, needs_binding = array("b"), array("b")
+    for pair, value in zip(pairs, amount):
+        row = index.get(pair)
+        if row is None:
+            for column in (rate, output, miner_fee, minimum, limit):
+                column.append(nan)
+            status.append(UNKNOWN_PAIR)
+            needs_binding.append(0)
+            continue
+        pair_rate, fee, pair_min, pair_limit = rate_column[row], fee_column[row], min_column[row], limit_column[row]
+        out = value * pair_rate - fee
+        rate.append(pair_rate)
+        output.append(out)
+        miner_fee.append(fee)
+        minimum.append(pair_min)
+        limit.append(pair_limit)
+        if pair_limit > 0 and value > pair_limit:
+            code = ABOVE_LIMIT
+        elif value < pair_min or out <= 0:
+            code = BELOW_MIN
+        else:
+            code = OK
+        status.append(code)
+        needs_binding.append(1 if code == OK and bind_above is not None and value >= bind_above else 0)
+    return QuoteBatch(pairs, amount, rate, output, miner_fee, minimum, limit, status, needs_binding)
@@ -0,0 +1,112 @@
+"""
+Client-side token-bucket rate limiting with priority lanes.
+
+ShapeShift throttles per IP, so a burst of cheap rate lookups can get the order-creating calls
+rejected too. With a RateLimiter installed (default_limiter, or ShapeShiftIO(limiter=...)) every
+request waits for a token, and waiting order POSTs (shift, send_amount, cancel_pending) are always
+served before other POSTs, which go before informational GETs. Requests queue; they never fail here.
+"""
+
+import heapq
+import itertools
+import threading
+import time
+
+# Priority lanes; a lower number is served first.
+PRIORITY_ORDER = 0
+PRIORITY_POST = 1
+PRIORITY_INFO = 2
+
+ORDER_ENDPOINTS = frozenset(("shift", "send_amount", "cancel_pending"))
+
+
+class _LaneStats(object):
+    """ Internal """
+    __slots__ = ("acquired", "total_wait", "max_wait")
+
+    def __init__(self):
+        self.acquired = 0
+        self.total_wait = 0.0
+        self.max_wait = 0.0
+
+
+class RateLimiter(object):
+    """
+    Thread-safe token bucket with strict-priority waiting.
+
+    rate   tokens added per second, i.e. the sustained request rate. Must be positive.
+    burst  bucket size, i.e. how many requests may go out back to back after an idle period. At least 1.
+    """
+    def __init__(self, rate=2.0, burst=5):
+        if not rate > 0:
+            raise ValueError("rate must be positive, not %r" % (rate,))
+        if not burst >= 1:
+            raise ValueError("burst must be at least 1, not %r" % (burst,))
+        self.rate = float(rate)
+        self.burst = float(burst)
+        self._tokens = float(burst)
+        self._updated = time.time()
+        self._waiters = []      # heap of (priority, seq)
+        self._seq = itertools.count()
+        self._cond = threading.Condition()
+        self._lanes = {}
+
+    def priority(self, method, endpoint):
+        """ Lane of a request: order POSTs first, then other POSTs, then GETs. """
+        if endpoint in ORDER_ENDPOINTS:
+            return PRIORITY_ORDER
+        return PRIORITY_POST if method == "POST" else PRIORITY_INFO
+
+    def acquire(self, priority=PRIORITY_INFO):
+        """ Blocks until a token is available and no higher-priority request is waiting. Returns the wait in seconds. """
+        start = time.time()
+        with self._cond:
+            ticket = (priority, next(self._seq))
+            heapq.heappush(self._waiters, ticket)
+            try:
+                while True:
+                    self._refill()
+                    if self._waiters[0] == ticket:
+                        if self._tokens >= 1.0:
+                            break
+                        self._cond.wait((1.0 - self._tokens) / self.rate)
+                    else:
+                        self._cond.wait()
+            except BaseException:
+                # Interrupted (KeyboardInterrupt, say): a ticket left behind would block every later acquire.
+                self._waiters.remove(ticket)
+                heapq.heapify(self._waiters)
+                self._cond.notify_all()
+                raise
+            self._tokens -= 1.0
+            heapq.heappop(self._waiters)
+            self._cond.notify_all()
+
+            waited = time.time() - start
+            lane = self._lanes.get(priority)
+            if lane is None:
+                lane = self._lanes[priority] = _LaneStats()
+            lane.acquired += 1
+            lane.total_wait += waited
+            lane.max_wait = max(lane.max_wait, waited)
+        return waited
+
+    @property
+    def queue_depth(self):
+        """ Number of requests currently waiting for a token. """
+        return len(self._waiters)
+
+    def stats(self):
+        """ Returns the queue depth and, per priority lane, the number of requests and their wait times. """
+        with self._cond:
+            lanes = {}
+            for priority, lane in self._lanes.items():
+                lanes[priority] = {"acquired": lane.acquired, "total_wait": lane.total_wait,
+                                   "mean_wait": lane.total_wait / lane.acquired, "max_wait": lane.max_wait}
+            return {"queue_depth": len(self._waiters), "tokens": self._tokens, "lanes": lanes}
+
+    def _refill(self):
+        """ Internal. Caller holds the lock. """
+        now = time.time()
+        self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
@@ -0,0 +1,171 @@
+"""
+Typed, slotted response records.
+
+The API sends numbers as strings or floats (e.g. "rate": "70.1234"). These records convert them once,
+to Decimal for rates and amounts, and keep the fields in __slots__ instead of a dict per response.
+Fields that are rarely read (fees, secondary amounts) are converted on first access only.
+
+Use decode(endpoint, response) on any response, or TypedShapeShiftIO, whose rate, limit,
+market_info, tx_status, shift and send_amount return records instead of dicts.
+A response carrying an "error" is still decoded; check record.error.
+"""
+
+from decimal import Decimal
+
+from .shapeshiftio import ShapeShiftIO
+
+
+def _decimal(value):
+    """ Internal. Floats go through their shortest repr, so 0.1 becomes Decimal("0.1"). """
+    if value is None or value == "":
+        return None
+    if isinstance(value, float):
+        value = repr(value)
+    return Decimal(value)
+
+
+def _int(value):
+    """ Internal """
+    return None if value is None or value == "" else int(value)
+
+
+class _Lazy(object):
+    """ Internal. Field stored raw in slot and converted to Decimal on first access. """
+    def __init__(self, slot):
+        self.slot = slot
+
+    def __get__(self, record, owner):
+        if record is None:
+            return self
+        value = self.slot.__get__(record, owner)
+        if value is not None and type(value) is not Decimal:
+            value = _decimal(value)
+            self.slot.__set__(record, value)
+        return value
+
+
+class _RecordMeta(type):
+    """ Internal. Turns the fields/lazy_fields declarations into slots and lazy properties. """
+    def __new__(mcs, name, bases, namespace):
+        fields = namespace.get("fields", ())
+        lazy = namespace.get("lazy_fields", ())
+        namespace["__slots__"] = tuple(f[0] for f in fields) + tuple("_" + f[0] for f in lazy)
+        cls = type.__new__(mcs, name, bases, namespace)
+        for field in lazy:
+            setattr(cls, field[0], _Lazy(getattr(cls, "_" + field[0])))
+        # Flattened over the class hierarchy once, so building a record does not walk the MRO.
+        cls._field_list = tuple(getattr(bases[0], "_field_list", ())) + tuple(fields)
+        cls._lazy_list = tuple(getattr(bases[0], "_lazy_list", ())) + tuple(lazy)
+        return cls
+
+
+# Python 2 and 3 compatible way of applying the metaclass.
+_Base = _RecordMeta("_Base", (object,), {"__slots__": ()})
+
+
+class Record(_Base):
+    """
+    Base of the typed records.
+
+    fields       (attribute, json key, converter) converted when the record is built.
+    lazy_fields  (attribute, json key) kept raw until first read, then converted to Decimal.
+    """
+    fields = (("error", "error", None),)
+    lazy_fields = ()
+
+    def __init__(self, response):
+        for attribute, key, convert in self._field_list:
+            value = response.get(key)
+            if convert is not None and value is not None:
+                value = convert(value)
+            setattr(self, attribute, value)
+        for attribute, key in self._lazy_list:
+            setattr(self, "_" + attribute, response.get(key))
+
+    def as_dict(self):
+        """ Fields by attribute name, converted. """
+        names = [f[0] for f in self._field_list] + [f[0] for f in self._lazy_list]
+        return dict((name, getattr(self, name)) for name in names)
+
+    def __repr__(self):
+        return "%s(%r)" % (type(self).__name__, self.as_dict())
+
+    def __eq__(self, other):
+        return type(self) is type(other) and self.as_dict() == other.as_dict()
+
+    def __ne__(self, other):
+        return not self == other
+
+    # Records are mutable (lazy fields are converted in place), so they compare by value but are not hashable.
+    __hash__ = None
+
+
+class Rate(Record):
+    fields = (("pair", "pair", None), ("rate", "rate", _decimal))
+
+
+class Limit(Record):
+    fields = (("pair", "pair", None), ("limit", "limit", _decimal))
+    lazy_fields = (("min", "min"),)
+
+
+class MarketInfo(Record):
+    fields = (("pair", "pair", None), ("rate", "rate", _decimal), ("limit", "limit", _decimal),
+              ("min", "min", _decimal))
+    lazy_fields = (("miner_fee", "minerFee"), ("max_limit", "maxLimit"))
+
+
+class TxStatus(Record):
+    fields = (("status", "status", None), ("address", "address", None), ("withdraw", "withdraw", None),
+              ("incoming_type", "incomingType", None), ("outgoing_type", "outgoingType", None),
+              ("transaction", "transaction", None))
+    lazy_fields = (("incoming_coin", "incomingCoin"), ("outgoing_coin", "outgoingCoin"))
+
+
+class ShiftResult(Record):
+    """ Response of shift and send_amount; send_amount's "success" wrapper is removed. """
+    fields = (("pair", "pair", None), ("deposit", "deposit", None), ("deposit_type", "depositType", None),
+              ("withdrawal", "withdrawal", None), ("withdrawal_type", "withdrawalType", None),
+              ("expiration", "expiration", _int), ("api_pub_key", "apiPubKey", None),
+              ("public", "public", None), ("xrp_dest_tag", "xrpDestTag", None))
+    lazy_fields = (("deposit_amount", "depositAmount"), ("withdrawal_amount", "withdrawalAmount"),
+                   ("quoted_rate", "quotedRate"), ("miner_fee", "minerFee"))
+
+    def __init__(self, response):
+        success = response.get("success")
+        if isinstance(success, dict):
+            response = success
+        Record.__init__(self, response)
+
+
+record_types = {"rate": Rate, "limit": Limit, "market_info": MarketInfo, "tx_status": TxStatus,
+                "shift": ShiftResult, "send_amount": ShiftResult}
+
+
+def decode(endpoint, response):
+    """ Converts a response of the named endpoint to its record; a list becomes a list of records. """
+    record_type = record_types[endpoint]
+    if isinstance(response, list):
+        return [record_type(item) for item in response]
+    return record_type(response)
+
+
+class TypedShapeShiftIO(ShapeShiftIO):
+    """ ShapeShiftIO whose rate, limit, market_info, tx_status, shift and send_amount return records. """
+    def rate(self, pair):
+        return Rate(ShapeShiftIO.rate(self, pair))
+
+    def limit(self, pair):
+        return Limit(ShapeShiftIO.limit(self, pair))
+
+    def market_info(self, pair=None):
+        return decode("market_info", ShapeShiftIO.market_info(self, pair))
+
+    def tx_status(self, address):
+        return TxStatus(ShapeShiftIO.tx_status(self, address))
+
+    def shift(self, postdata):
+        return ShiftResult(ShapeShiftIO.shift(self, postdata))
+
+    def send_amount(self, postdata):
+        return ShiftResult(ShapeShiftIO.send_amount(self, postdata))
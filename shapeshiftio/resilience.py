@@ -0,0 +1,365 @@
+"""
+Retries, hedged requests and circuit breaking for the request helpers.
+
+Install one for the module functions with shapeshiftio.shapeshiftio.default_resilience = Resilience(),
+or per client with ShapeShiftIO(resilience=Resilience()). Then:
+
+    - GETs failing with a transient error (connection errors, timeouts, 408/429/5xx) are retried with
+      exponential backoff and full jitter. POSTs are never retried: shift or send_amount may have gone
+      through even though the response was lost.
+    - Once an endpoint has enough latency samples, a GET still running after that endpoint's p95
+      latency is hedged: one duplicate is sent from a worker thread and the caller gets whichever answer
+      comes first. If one of them fails (a stalled connection timing out, say), the other's answer is
+      used instead of a retry. Hedges are capped at a fraction of all GETs so a slow spell does not
+      double the load.
+    - Each endpoint has a CircuitBreaker. After failure_threshold transient failures in a row it opens
+      and calls fail fast with CircuitOpenError, or GETs get the last good response for their URL,
+      until reset_timeout has passed and one trial request succeeds.
+"""
+
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+import heapq
+import itertools
+import random
+import socket
+import threading
+import time
+
+try:
+    import httplib
+except ImportError:
+    import http.client as httplib
+
+from .instrument import LatencyHistogram
+from .pool import _clock
+
+# Statuses worth retrying: the request did not take effect, or may succeed a moment later.
+retry_statuses = frozenset((408, 429, 500, 502, 503, 504))
+
+# Finer than instrument.default_buckets around typical API latencies, as the p95 becomes the hedge delay.
+hedge_buckets = (0.01, 0.02, 0.035, 0.05, 0.075, 0.1, 0.15, 0.2, 0.3, 0.4, 0.5, 0.75, 1.0, 1.5, 2.0, 3.0, 5.0)
+
+
+class CircuitOpenError(Exception):
+    """ Raised instead of sending a request while the endpoint's circuit is open. """
+    def __init__(self, endpoint):
+        Exception.__init__(self, "Circuit open for endpoint " + str(endpoint))
+        self.endpoint = endpoint
+
+
+def is_transient(error):
+    """ True if error says nothing about the request itself, so sending it again may succeed. """
+    status = getattr(error, "code", None)
+    if isinstance(status, int):
+        return status in retry_statuses
+    return isinstance(error, (socket.error, EnvironmentError, httplib.HTTPException))
+
+
+class CircuitBreaker(object):
+    """
+    Closed: requests flow. Open: requests are refused for reset_timeout seconds.
+    Half-open: one trial request is let through; its success closes the circuit, its failure reopens it.
+    """
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, failure_threshold=5, reset_timeout=30.0):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = self.CLOSED
+        self.failures = 0
+        self.opened_at = None
+        self._lock = threading.Lock()
+
+    def allow(self):
+        """ True if a request may be sent now. """
+        with self._lock:
+            if self.state == self.CLOSED:
+                return True
+            if self.state == self.OPEN and _clock() - self.opened_at >= self.reset_timeout:
+                self.state = self.HALF_OPEN
+                return True
+            return False
+
+    def success(self):
+        with self._lock:
+            self.state = self.CLOSED
+            self.failures = 0
+
+    def failure(self):
+        with self._lock:
+            self.failures += 1
+            if self.state == self.HALF_OPEN or self.failures >= self.failure_threshold:
+                self.state = self.OPEN
+                self.opened_at = _clock()
+
+
+class Resilience(object):
+    """
+    retries            extra attempts for a GET after a transient error.
+    backoff            base of the backoff; attempt n sleeps a random time up to min(max_backoff, backoff * 2 ** n).
+    hedge              whether to hedge slow GETs.
+    hedge_percentile   latency percentile after which a GET is hedged.
+    hedge_min_samples  successful GETs an endpoint needs before it is hedged.
+    hedge_budget       maximum fraction of GETs that may be hedged.
+    failure_threshold, reset_timeout
+                       see CircuitBreaker; one breaker per endpoint.
+    fallback           serve the last good response of a URL while its endpoint's circuit is open.
+    maxsize            number of URLs whose last good response is kept.
+    max_workers        threads running hedges. The original of a hedged GET runs on a thread of its own, so
+                       the worker threads are never taken by requests that are not hedged.
+
+    Fallback values are shared between callers and must not be mutated.
+    """
+    def __init__(self, retries=2, backoff=0.1, max_backoff=2.0, hedge=True, hedge_percentile=0.95,
+                 hedge_min_samples=20, hedge_budget=0.1, failure_threshold=5, reset_timeout=30.0, fallback=True,
+                 maxsize=1024, max_workers=32):
+        self.retries = retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.hedge = hedge
+        self.hedge_percentile = hedge_percentile
+        self.hedge_min_samples = hedge_min_samples
+        self.hedge_budget = hedge_budget
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.fallback = fallback
+        self.maxsize = maxsize
+        self.max_workers = max_workers
+        self._breakers = {}
+        self._histograms = {}
+        self._last_good = OrderedDict()     # url -> last successful response
+        self._executor = None
+        self._timers = _Timers()
+        self._random = random.Random()
+        self._lock = threading.Lock()
+        self.requests = 0
+        self.retried = 0
+        self.hedged = 0
+        self.hedge_wins = 0
+        self.rejected = 0
+        self.fallbacks = 0
+
+    def breaker(self, endpoint):
+        """ The CircuitBreaker of an endpoint, created on first use. """
+        breaker = self._breakers.get(endpoint)
+        if breaker is None:
+            with self._lock:
+                breaker = self._breakers.setdefault(endpoint,
+                                                    CircuitBreaker(self.failure_threshold, self.reset_timeout))
+        return breaker
+
+    def get(self, endpoint, url, fetch):
+        """ Runs fetch() for an idempotent GET of url, with retries, hedging and the circuit breaker. """
+        breaker = self.breaker(endpoint)
+        with self._lock:
+            self.requests += 1
+        error = None
+        for attempt in range(self.retries + 1):
+            if attempt:
+                with self._lock:
+                    self.retried += 1
+                time.sleep(self._random.uniform(0, min(self.max_backoff, self.backoff * 2 ** attempt)))
+            if not breaker.allow():
+                return self._fallback(endpoint, url)
+            try:
+                result = self._attempt(endpoint, fetch)
+            except Exception as e:
+                if not is_transient(e):
+                    # The server answered, so the endpoint is healthy; the request itself is at fault.
+                    breaker.success()
+                    raise
+                breaker.failure()
+                error = e
+                continue
+            breaker.success()
+            if self.fallback:
+                with self._lock:
+                    self._last_good.pop(url, None)
+                    self._last_good[url] = result
+                    while len(self._last_good) > self.maxsize:
+                        self._last_good.popitem(last=False)
+            return result
+        if breaker.state == breaker.OPEN and self.fallback:
+            # The failures of this very call opened the circuit.
+            try:
+                return self._fallback(endpoint, url)
+            except CircuitOpenError:
+                pass
+        raise error
+
+    def call(self, endpoint, send):
+        """ Runs send() for a request that must not be repeated (a POST): circuit breaker only. """
+        breaker = self.breaker(endpoint)
+        if not breaker.allow():
+            with self._lock:
+                self.rejected += 1
+            raise CircuitOpenError(endpoint)
+        try:
+            result = send()
+        except Exception as e:
+            if is_transient(e):
+                breaker.failure()
+            else:
+                breaker.success()
+            raise
+        breaker.success()
+        return result
+
+    def hedge_delay(self, endpoint):
+        """ Seconds after which a GET of endpoint is hedged, or None if it is not hedged (yet). """
+        histogram = self._histograms.get(endpoint)
+        if not self.hedge or histogram is None:
+            return None
+        _, _, count = histogram.snapshot()
+        if count < self.hedge_min_samples:
+            return None
+        delay = histogram.percentile(self.hedge_percentile)
+        return None if delay == float("inf") else delay
+
+    def stats(self):
+        """ Returns the counters and the state of every breaker as a dict. """
+        with self._lock:
+            stats = {"requests": self.requests, "retried": self.retried, "hedged": self.hedged,
+                     "hedge_wins": self.hedge_wins, "rejected": self.rejected, "fallbacks": self.fallbacks}
+            breakers = list(self._breakers.items())
+        stats["breakers"] = dict((endpoint, breaker.state) for endpoint, breaker in breakers)
+        return stats
+
+    def close(self):
+        """ Stops the hedging threads once running requests are done. """
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=False)
+
+    def _fallback(self, endpoint, url):
+        """ Internal """
+        with self._lock:
+            self.rejected += 1
+            if self.fallback and url in self._last_good:
+                self.fallbacks += 1
+                return self._last_good[url]
+        raise CircuitOpenError(endpoint)
+
+    def _attempt(self, endpoint, fetch):
+        """ Internal. One attempt, hedged if the endpoint has a hedge delay. """
+        histogram = self._histograms.get(endpoint)
+        if histogram is None:
+            with self._lock:
+                histogram = self._histograms.setdefault(endpoint, LatencyHistogram(hedge_buckets))
+
+        def timed():
+            start = _clock()
+            result = fetch()
+            histogram.observe(_clock() - start)
+            return result
+
+        delay = self.hedge_delay(endpoint)
+        if delay is None:
+            return timed()
+
+        race = _Race()
+
+        def run(hedge):
+            try:
+                result = timed()
+            except Exception as e:
+                self._settle(race, hedge, error=e)
+            else:
+                self._settle(race, hedge, result)
+
+        def launch():
+            executor = self._get_executor()
+            with self._lock:
+                if race.done.is_set() or self.hedged >= self.hedge_budget * self.requests:
+                    return
+                self.hedged += 1
+                race.running += 1
+            executor.submit(run, True)
+
+        timer = self._timers.schedule(delay, launch)
+        original = threading.Thread(target=run, args=(False,), name="shapeshiftio-hedged-get")
+        original.daemon = True
+        original.start()
+        race.done.wait()
+        timer[2] = None
+        if race.error is not None:
+            raise race.error
+        return race.result
+
+    def _settle(self, race, hedge, result=None, error=None):
+        """ Internal. Records the outcome of the original (hedge=False) or the hedge of a race. """
+        with self._lock:
+            race.running -= 1
+            if race.done.is_set():
+                return
+            if error is None:
+                race.result = result
+                race.error = None
+                if hedge:
+                    self.hedge_wins += 1
+            else:
+                if not hedge or race.error is None:
+                    race.error = error
+                if race.running:
+                    # The other request may still answer.
+                    return
+            race.done.set()
+
+    def _get_executor(self):
+        """ Internal """
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=self.max_workers)
+            return self._executor
+
+
+class _Race(object):
+    """ Internal. The original GET and its hedge, if launched; the first success wins. """
+    def __init__(self):
+        self.done = threading.Event()
+        self.running = 1
+        self.result = None
+        self.error = None
+
+
+class _Timers(object):
+    """ Internal. One daemon thread running callbacks at given times. Set entry[2] = None to cancel. """
+    def __init__(self):
+        self._heap = []     # [due, seq, callback]
+        self._seq = itertools.count()
+        self._cond = threading.Condition()
+        self._thread = None
+
+    def schedule(self, delay, callback):
+        """ Internal. Returns the entry. """
+        entry = [_clock() + delay, next(self._seq), callback]
+        with self._cond:
+            heapq.heappush(self._heap, entry)
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="shapeshiftio-hedge-timer")
+                self._thread.daemon = True
+                self._thread.start()
+            self._cond.notify()
+        return entry
+
+    def _run(self):
+        """ Internal """
+        while True:
+            with self._cond:
+                while True:
+                    while self._heap and self._heap[0][2] is None:
+                        heapq.heappop(self._heap)
+                    now = _clock()
+                    if self._heap and self._heap[0][0] <= now:
+                        callback = heapq.heappop(self._heap)[2]
+                        break
+                    self._cond.wait(self._heap[0][0] - now if self._heap else None)
+            if callback is not None:
+                try:
+                    callback()
+                except Exception:
+                    pass
@@ -0,0 +1,227 @@
+"""
+Multi-hop route finder over the market graph.
+
+RouteGraph turns a MarketSnapshot table into an adjacency-indexed graph with one edge per pair,
+weighted by -log(rate) so the best product of rates is a shortest path. Routes are searched locally,
+hop by hop up to max_hops, and best_route() accounts for each hop's minerFee and min/limit, so
+btc -> eth -> xmr can be compared with a direct btc_xmr shift without any network call.
+
+Rebuilding after a snapshot refresh is incremental: only edges whose numbers changed are touched,
+and coins or pairs are only added when new ones are listed.
+"""
+
+from array import array
+from collections import namedtuple
+import math
+
+# coins: path of coin symbols; pairs: the pair of each hop. amount_in/amount_out are None for
+# amount-independent routes, whose rate is then the plain product of the hop rates.
+Route = namedtuple("Route", "coins pairs amount_in amount_out rate")
+
+
+class RouteGraph(object):
+    """
+    Graph of coins (nodes) and pairs (edges) built from a MarketTable (see snapshot.py).
+    Coins and pairs are lower-cased.
+    Not thread-safe while update() runs; give each thread its own graph, or guard updates.
+    """
+    def __init__(self, table=None):
+        self.coins = []             # coin id -> symbol
+        self.pairs = []             # edge id -> pair
+        self.version = 0            # incremented by every update that changed something
+        self._coin_ids = {}
+        self._edge_ids = {}
+        self._adjacency = []        # coin id -> [edge id, ...] leaving that coin
+        self._src = array("i")
+        self._dst = array("i")
+        self._rate = array("d")
+        self._weight = array("d")
+        self._limit = array("d")
+        self._min = array("d")
+        self._fee = array("d")
+        self._active = bytearray()
+        self._table = None
+        if table is not None:
+            self.update(table)
+
+    @classmethod
+    def from_snapshot(cls, snapshot, url_store=None, timeout=None):
+        """ Builds a graph from a MarketSnapshot, refreshing it first if it has expired. """
+        snapshot.ensure_fresh(url_store, timeout)
+        return cls(snapshot.table)
+
+    def sync(self, snapshot, url_store=None, timeout=None):
+        """ Refreshes snapshot if expired and applies its table if it is a new one. Returns the changed edge count. """
+        snapshot.ensure_fresh(url_store, timeout)
+        table = snapshot.table
+        if table is self._table:
+            return 0
+        return self.update(table)
+
+    def update(self, table):
+        """ Applies a MarketTable, touching only new or changed pairs. Returns the number of edges changed. """
+        changed = 0
+        listed = set()
+        for row, pair in enumerate(table.pairs):
+            pair = pair.lower()
+            listed.add(pair)
+            rate = table.rate[row]
+            limit = table.limit[row]
+            minimum = table.min[row]
+            fee = table.miner_fee[row]
+            edge = self._edge_ids.get(pair)
+            if edge is None:
+                edge = self._add_edge(pair)
+                if edge is None:
+                    continue
+            elif (self._active[edge] and self._rate[edge] == rate and self._limit[edge] == limit
+                  and self._min[edge] == minimum and self._fee[edge] == fee):
+                continue
+            self._rate[edge] = rate
+            self._weight[edge] = -math.log(rate) if rate > 0 else float("inf")
+            self._limit[edge] = limit
+            self._min[edge] = minimum
+            self._fee[edge] = fee
+            self._active[edge] = 1 if rate > 0 else 0
+            changed += 1
+
+        if len(listed) < len(self._edge_ids):
+            for pair, edge in self._edge_ids.items():
+                if self._active[edge] and pair not in listed:
+                    self._active[edge] = 0
+                    changed += 1
+        self._table = table
+        if changed:
+            self.version += 1
+        return changed
+
+    def best_rate(self, coin_from, coin_to, max_hops=3):
+        """ Route with the best product of rates, ignoring fees and limits, or None. """
+        source, target = self._coin_ids.get(coin_from.lower()), self._coin_ids.get(coin_to.lower())
+        if source is None or target is None or source == target:
+            return None
+        weight = self._weight
+        layers = self._search(source, target, max_hops, 0.0,
+                              lambda value, edge: value + weight[edge], lambda new, old: new < old)
+        best = None
+        for hops, layer in enumerate(layers):
+            if target in layer and (best is None or layer[target][0] < best[1][target][0]):
+                best = (hops, layer)
+        if best is None:
+            return None
+        coins, pairs = self._path(layers, best[0], target)
+        return Route(coins, pairs, None, None, math.exp(-best[1][target][0]))
+
+    def best_route(self, coin_from, coin_to, amount, max_hops=3):
+        """
+        Route that delivers the most coin_to for amount of coin_from, or None if no route is feasible.
+        Each hop converts amount * rate - minerFee, and is only taken if min <= amount <= limit.
+        The best amount per coin and hop count is kept, which is exact unless a smaller intermediate
+        amount would have fit a later hop's limit where the larger one did not.
+        """
+        source, target = self._coin_ids.get(coin_from.lower()), self._coin_ids.get(coin_to.lower())
+        if source is None or target is None or source == target:
+            return None
+        rate, limit, minimum, fee = self._rate, self._limit, self._min, self._fee
+
+        def convert(value, edge):
+            if value < minimum[edge] or (limit[edge] and value > limit[edge]):
+                return None
+            out = value * rate[edge] - fee[edge]
+            return out if out > 0 else None
+
+        layers = self._search(source, target, max_hops, float(amount), convert, lambda new, old: new > old)
+        best = None
+        for hops, layer in enumerate(layers):
+            if target in layer and (best is None or layer[target][0] > layers[best][target][0]):
+                best = hops
+        if best is None:
+            return None
+        coins, pairs = self._path(layers, best, target)
+        amount_out = layers[best][target][0]
+        return Route(coins, pairs, amount, amount_out, amount_out / float(amount))
+
+    def quote_path(self, coins, amount):
+        """ Evaluates a given path, e.g. ["btc", "xmr"] for the direct pair. Returns a Route, or None if infeasible. """
+        value = float(amount)
+        pairs = []
+        for coin_from, coin_to in zip(coins, coins[1:]):
+            pair = coin_from.lower() + "_" + coin_to.lower()
+            edge = self._edge_ids.get(pair)
+            if edge is None or not self._active[edge]:
+                return None
+            if value < self._min[edge] or (self._limit[edge] and value > self._limit[edge]):
+                return None
+            value = value * self._rate[edge] - self._fee[edge]
+            if value <= 0:
+                return None
+            pairs.append(pair)
+        return Route([coin.lower() for coin in coins], pairs, amount, value, value / float(amount))
+
+    def _search(self, source, target, max_hops, start, relax, better):
+        """
+        Internal. Hop-limited label-correcting search. Returns one dict per hop count mapping
+        coin id -> (value, edge used to get there). Paths never pass through the source or the target.
+        """
+        adjacency, dst, active = self._adjacency, self._dst, self._active
+        layers = []
+        frontier = {source: start}
+        for _ in range(max_hops):
+            layer = {}
+            for node, value in frontier.items():
+                for edge in adjacency[node]:
+                    if not active[edge]:
+                        continue
+                    nxt = dst[edge]
+                    if nxt == source:
+                        continue
+                    new = relax(value, edge)
+                    if new is None:
+                        continue
+                    current = layer.get(nxt)
+                    if current is None or better(new, current[0]):
+                        layer[nxt] = (new, edge)
+            layers.append(layer)
+            frontier = dict((node, entry[0]) for node, entry in layer.items() if node != target)
+            if not frontier:
+                break
+        return layers
+
+    def _path(self, layers, hops, target):
+        """ Internal. Walks the predecessor edges back from target at the given hop count. """
+        edges = []
+        node = target
+        for layer in reversed(layers[:hops + 1]):
+            edge = layer[node][1]
+            edges.append(edge)
+            node = self._src[edge]
+        edges.reverse()
+        coins = [self.coins[node]] + [self.coins[self._dst[edge]] for edge in edges]
+        return coins, [self.pairs[edge] for edge in edges]
+
+    def _coin(self, symbol):
+        """ Internal """
+        coin = self._coin_ids.get(symbol)
+        if coin is None:
+            coin = self._coin_ids[symbol] = len(self.coins)
+            self.coins.append(symbol)
+            self._adjacency.append([])
+        return coin
+
+    def _add_edge(self, pair):
+        """ Internal. Returns the new edge id, or None for a malformed pair. """
+        try:
+            coin_from, coin_to = pair.split("_")
+        except ValueError:
+            return None
+        edge = len(self.pairs)
+        self._edge_ids[pair] = edge
+        self.pairs.append(pair)
+        source, target = self._coin(coin_from), self._coin(coin_to)
+        self._adjacency[source].append(edge)
+        for column in (self._rate, self._weight, self._limit, self._min, self._fee):
+            column.append(0.0)
+        self._src.append(source)
+        self._dst.append(target)
+        self._active.append(0)
+        return edge
@@ -6,31 +6,142 @@ https://shapeshift.io/api
 Other comments found in docstrings are directly from there, but might be out of date.
 """
 
-# Default to Python 2.x structure, fall back to Python 3.x structure.
-try:
-    from urllib import urlencode
-except ImportError:
-    from urllib.parse import urlencode
+from .fastjson import loads
+from .jsonstream import iter_json_array
+from .fanout import FanOut
+from .instrument import RequestTrace
+from .pool import ConnectionPool, _clock
+from .singleflight import SingleFlight
 
-try:
-    from urllib2 import urlopen, Request
-except ImportError:
-    from urllib.request import urlopen, Request
+shapeshift_url_base = "https://shapeshift.io"
 
-import json
+# Keep-alive connection pool shared by the module functions and by any ShapeShiftIO without its own.
+default_transport = ConnectionPool()
 
-shapeshift_url_base = "https://shapeshift.io"
+# Optional TTLCache (see cache.py) used by the module functions and by any ShapeShiftIO without its own.
+default_cache = None
+
+# Optional MarketSnapshot (see snapshot.py) that answers rate, limit and market_info for listed pairs.
+default_snapshot = None
+
+# Optional RateLimiter (see ratelimit.py) every request waits on, unless a ShapeShiftIO has its own.
+default_limiter = None
+
+# Optional Instrumentation (see instrument.py) that receives a RequestTrace for every request.
+default_instrumentation = None
+
+# Optional Resilience (see resilience.py): GET retries, hedging and per-endpoint circuit breakers.
+default_resilience = None
 
-# Helper functions to wrap all the urllib calls.
-def _get_request(url, timeout):
+# Thread pool running the batch helpers of ShapeShiftIO (rates, tx_statuses, ...) without their own.
+default_fan_out = FanOut()
+
+# Concurrent identical GETs share one request (see singleflight.py). Set to None to turn this off.
+default_flight = SingleFlight()
+
+_form_headers = {"Content-Type": "application/x-www-form-urlencoded"}
+
+# Helper functions to wrap all the HTTP calls.
+# client is the url_store passed to the API functions; a ShapeShiftIO instance may carry its own settings.
+def _option(client, name, default):
+    """ Internal """
+    value = getattr(client, name, None)
+    return value if value is not None else default
+
+def _url_base(client):
     """ Internal """
-    response = urlopen(Request(url), timeout=timeout).read()
-    return json.loads(response)
+    return _option(client, "url_base", shapeshift_url_base)
 
-def _post_request(url, postdata, timeout):
+def _get_request(url, timeout, client=None, endpoint=None):
+    """ Internal """
+    cache = _option(client, "cache", default_cache)
+    if cache is not None:
+        return cache.get(endpoint, url, lambda: _fetch(url, timeout, client, endpoint))
+    return _fetch(url, timeout, client, endpoint)
+
+def _throttle(client, method, endpoint):
+    """ Internal. Returns the seconds waited, or None without a limiter. """
+    limiter = _option(client, "limiter", default_limiter)
+    if limiter is not None:
+        return limiter.acquire(limiter.priority(method, endpoint))
+    return None
+
+def _from_snapshot(client, timeout, endpoint, pair):
+    """ Internal. Returns None when there is no snapshot or it does not list the pair. """
+    snapshot = _option(client, "snapshot", default_snapshot)
+    if snapshot is None or not pair:
+        return None
+    # A refresh calls market_info with client for its settings; keep the URL of the call being answered.
+    url = getattr(client, "url", None)
+    try:
+        snapshot.ensure_fresh(client, timeout)
+    finally:
+        if (client):
+            client.url = url
+    return getattr(snapshot, endpoint)(pair)
+
+def _fetch(url, timeout, client, endpoint):
+    """ Internal. Only callers sending through the same transport, limiter and resilience share a request. """
+    if default_flight is not None:
+        key = (url, _option(client, "transport", default_transport), _option(client, "limiter", default_limiter),
+               _option(client, "resilience", default_resilience))
+        return default_flight.do(key, lambda: _download(url, timeout, client, endpoint), timeout)
+    return _download(url, timeout, client, endpoint)
+
+def _download(url, timeout, client, endpoint):
     """ Internal """
-    response = urlopen(Request(url, urlencode(postdata)), timeout=timeout).read()
-    return json.loads(response)
+    resilience = _option(client, "resilience", default_resilience)
+    if resilience is not None:
+        return resilience.get(endpoint, url, lambda: _send("GET", url, None, None, timeout, client, endpoint))
+    return _send("GET", url, None, None, timeout, client, endpoint)
+
+def _send(method, url, body, headers, timeout, client, endpoint):
+    """ Internal. Throttles, sends and decodes one request, tracing it if instrumentation is installed. """
+    transport = _option(client, "transport", default_transport)
+    instrumentation = _option(client, "instrumentation", default_instrumentation)
+    if instrumentation is None:
+        _throttle(client, method, endpoint)
+        return loads(transport.request(method, url, body, headers, timeout))
+
+    trace = RequestTrace(endpoint, method, url)
+    start = _clock()
+    try:
+        waited = _throttle(client, method, endpoint)
+        if waited is not None:
+            trace.phases["throttle"] = waited
+        response = transport.request(method, url, body, headers, timeout, trace)
+        decode_start = _clock()
+        result = loads(response)
+        trace.phases["decode"] = _clock() - decode_start
+        return result
+    except Exception as e:
+        trace.error = e
+        trace.status = getattr(e, "code", trace.status)
+        raise
+    finally:
+        trace.duration = _clock() - start
+        instrumentation.record(trace)
+
+def _stream_request(url, timeout, client=None, endpoint=None):
+    """ Internal. Yields the elements of a JSON array response as they are read from the socket. """
+    _throttle(client, "GET", endpoint)
+    with _option(client, "transport", default_transport).open("GET", url, timeout=timeout) as response:
+        for record in iter_json_array(response):
+            yield record
+
+def _post_request(url, postdata, timeout, client=None, endpoint=None):
+    """ Internal """
+    # Imported here so that importing the package does not pull in urllib.
+    # Default to Python 2.x structure, fall back to Python 3.x structure.
+    try:
+        from urllib import urlencode
+    except ImportError:
+        from urllib.parse import urlencode
+    body = urlencode(postdata).encode("ascii")
+    resilience = _option(client, "resilience", default_resilience)
+    if resilience is not None:
+        return resilience.call(endpoint, lambda: _send("POST", url, body, _form_headers, timeout, client, endpoint))
+    return _send("POST", url, body, _form_headers, timeout, client, endpoint)
 
 def rate(pair, url_store=None, timeout=None):
     """
@@ -48,10 +159,13 @@ def rate(pair, url_store=None, timeout=None):
             "rate" : "70.1234"
         }
     """
-    url = shapeshift_url_base + "/rate/" + pair
+    url = _url_base(url_store) + "/rate/" + pair
     if (url_store):
         url_store.url = url
-    return _get_request(url, timeout)
+    answer = _from_snapshot(url_store, timeout, "rate", pair)
+    if answer is not None:
+        return answer
+    return _get_request(url, timeout, url_store, "rate")
 
 
 def limit(pair, url_store=None, timeout=None):
@@ -69,13 +183,16 @@ def limit(pair, url_store=None, timeout=None):
             "limit" : "1.2345"
         }
     """
-    url = shapeshift_url_base + "/limit/" + pair
+    url = _url_base(url_store) + "/limit/" + pair
     if (url_store):
         url_store.url = url
-    return _get_request(url, timeout)
+    answer = _from_snapshot(url_store, timeout, "limit", pair)
+    if answer is not None:
+        return answer
+    return _get_request(url, timeout, url_store, "limit")
 
 
-def market_info(pair, url_store=None, timeout=None):
+def market_info(pair=None, url_store=None, timeout=None):
     """
     This gets the market info (pair, rate, limit, minimum limit, miner fee)
     
@@ -94,10 +211,13 @@ def market_info(pair, url_store=None, timeout=None):
         "minerFee" : 0.0001
     }
     """
-    url = shapeshift_url_base + "/marketinfo/" + pair
+    url = _url_base(url_store) + "/marketinfo/" + (pair or "")
     if (url_store):
         url_store.url = url
-    return _get_request(url, timeout)
+    answer = _from_snapshot(url_store, timeout, "market_info", pair)
+    if answer is not None:
+        return answer
+    return _get_request(url, timeout, url_store, "market_info")
 
 
 def recent_tx(max_results=5, url_store=None, timeout=None):
@@ -122,10 +242,10 @@ def recent_tx(max_results=5, url_store=None, timeout=None):
         ...
     ]
     """
-    url = shapeshift_url_base + "/recenttx/" + str(max_results)
+    url = _url_base(url_store) + "/recenttx/" + str(max_results)
     if (url_store):
         url_store.url = url
-    return _get_request(url, timeout)
+    return _get_request(url, timeout, url_store, "recent_tx")
 
 
 def tx_status(address, url_store=None, timeout=None):
@@ -171,10 +291,10 @@ def tx_status(address, url_store=None, timeout=None):
      
     //Note: this can still get the normal style error returned. For example if request is made without an address.
     """
-    url = shapeshift_url_base + "/txStat/" + address
+    url = _url_base(url_store) + "/txStat/" + address
     if (url_store):
         url_store.url = url
-    return _get_request(url, timeout)
+    return _get_request(url, timeout, url_store, "tx_status")
 
 def time_remaining(address, url_store=None, timeout=None):
     """
@@ -195,10 +315,10 @@ def time_remaining(address, url_store=None, timeout=None):
     The status can be either "pending" or "expired".
     If the status is expired then seconds_remaining will show 0.
     """
-    url = shapeshift_url_base + "/timeremaining/" + address
+    url = _url_base(url_store) + "/timeremaining/" + address
     if (url_store):
         url_store.url = url
-    return _get_request(url, timeout)
+    return _get_request(url, timeout, url_store, "time_remaining")
 
 def coin_list(url_store=None, timeout=None):
     """
@@ -223,10 +343,10 @@ def coin_list(url_store=None, timeout=None):
     The status can be either "available" or "unavailable". Sometimes coins become temporarily unavailable during updates or
     unexpected service issues.
     """
-    url = shapeshift_url_base + "/getcoins"
+    url = _url_base(url_store) + "/getcoins"
     if (url_store):
         url_store.url = url
-    return _get_request(url, timeout)
+    return _get_request(url, timeout, url_store, "coin_list")
 
 def tx_by_api_key(api_key, url_store=None, timeout=None):
     """
@@ -255,10 +375,10 @@ def tx_by_api_key(api_key, url_store=None, timeout=None):
 
     The status can be  "received", "complete", "returned", "failed".
     """
-    url = shapeshift_url_base + "/txbyapi_key/" + api_key
+    url = _url_base(url_store) + "/txbyapi_key/" + api_key
     if (url_store):
         url_store.url = url
-    return _get_request(url, timeout)
+    return _get_request(url, timeout, url_store, "tx_by_api_key")
 
 def tx_by_address(api_key, address, url_store=None, timeout=None):
     """
@@ -290,10 +410,32 @@ def tx_by_address(api_key, address, url_store=None, timeout=None):
      
     The status can be  "received", "complete", "returned", "failed".
     """
-    url = shapeshift_url_base + "/txbyaddress/" + address + "/" + api_key
+    url = _url_base(url_store) + "/txbyaddress/" + address + "/" + api_key
+    if (url_store):
+        url_store.url = url
+    return _get_request(url, timeout, url_store, "tx_by_address")
+
+def iter_tx_by_api_key(api_key, url_store=None, timeout=None):
+    """
+    Streaming variant of tx_by_api_key. Yields one transaction record at a time while the response
+    is read, instead of building the whole list in memory.
+    Raises ValueError if the response is not an array, e.g. an error object.
+    """
+    url = _url_base(url_store) + "/txbyapi_key/" + api_key
+    if (url_store):
+        url_store.url = url
+    return _stream_request(url, timeout, url_store, "tx_by_api_key")
+
+def iter_tx_by_address(api_key, address, url_store=None, timeout=None):
+    """
+    Streaming variant of tx_by_address. Yields one transaction record at a time while the response
+    is read, instead of building the whole list in memory.
+    Raises ValueError if the response is not an array, e.g. an error object.
+    """
+    url = _url_base(url_store) + "/txbyaddress/" + address + "/" + api_key
     if (url_store):
         url_store.url = url
-    return _get_request(url, timeout)
+    return _stream_request(url, timeout, url_store, "tx_by_address")
 
 def validate_address(address, coin, url_store=None, timeout=None):
     """
@@ -316,10 +458,10 @@ def validate_address(address, coin, url_store=None, timeout=None):
      
     isValid will either be true or false. If isvalid returns false, an error parameter will be present and will contain a descriptive error message.
     """
-    url = shapeshift_url_base + "/validateAddress/" + address + "/" + coin
+    url = _url_base(url_store) + "/validateAddress/" + address + "/" + coin
     if (url_store):
         url_store.url = url
-    return _get_request(url, timeout)
+    return _get_request(url, timeout, url_store, "validate_address")
     
 def shift(postdata, url_store=None, timeout=None):
     """
@@ -349,10 +491,10 @@ def shift(postdata, url_store=None, timeout=None):
             apiPubKey: [public API attached to this shift, if one was given]
         } 
     """
-    url = shapeshift_url_base + "/shift"
+    url = _url_base(url_store) + "/shift"
     if (url_store):
         url_store.url = url
-    return _post_request(url, postdata, timeout)
+    return _post_request(url, postdata, timeout, url_store, "shift")
 
 def set_mail(postdata, url_store=None, timeout=None):
     """
@@ -374,10 +516,10 @@ def set_mail(postdata, url_store=None, timeout=None):
         }
     }
     """
-    url = shapeshift_url_base + "/mail"
+    url = _url_base(url_store) + "/mail"
     if (url_store):
         url_store.url = url
-    return _post_request(url, postdata, timeout)
+    return _post_request(url, postdata, timeout, url_store, "set_mail")
 
 def send_amount(postdata, url_store=None, timeout=None):
     """
@@ -454,10 +596,10 @@ def send_amount(postdata, url_store=None, timeout=None):
           }
     }
     """
-    url = shapeshift_url_base + "/sendamount"
+    url = _url_base(url_store) + "/sendamount"
     if (url_store):
         url_store.url = url
-    return _post_request(url, postdata, timeout)
+    return _post_request(url, postdata, timeout, url_store, "send_amount")
 
 def cancel_pending(postdata, url_store=None, timeout=None):
     """
@@ -478,19 +620,43 @@ def cancel_pending(postdata, url_store=None, timeout=None):
      
      {  error  : {errorMessage}  }
     """
-    url = shapeshift_url_base + "/cancelpending"
+    url = _url_base(url_store) + "/cancelpending"
     if (url_store):
         url_store.url = url
-    return _post_request(url, postdata, timeout)
+    return _post_request(url, postdata, timeout, url_store, "cancel_pending")
 
 
 # Legacy class here for backwards compatiblity with old shapeshiftio 0.1.1.
 # No need for a class - there's no state to preserve when hitting a REST API.
 class ShapeShiftIO:
-    def __init__(self, timeout=None):
-        """ ShapeShiftIO API class. Stores the last called API in self.url """
+    def __init__(self, timeout=None, transport=None, cache=None, snapshot=None, limiter=None, url_base=None,
+                 instrumentation=None, resilience=None, fan_out=None):
+        """
+        ShapeShiftIO API class. Stores the last called API in self.url
+
+        url_base overrides shapeshift_url_base for this instance, e.g. to point it at a MockShapeShiftServer.
+
+        transport is an optional ConnectionPool (or HTTP2Transport, UrlopenTransport); by default the module-wide pool is shared.
+        cache is an optional TTLCache for the market data endpoints; by default default_cache is used.
+        snapshot is an optional MarketSnapshot answering rate, limit and market_info; by default default_snapshot is used.
+        limiter is an optional RateLimiter; by default default_limiter is used.
+        instrumentation is an optional Instrumentation; by default default_instrumentation is used.
+        resilience is an optional Resilience (retries, hedging, circuit breakers); by default default_resilience is used.
+        fan_out is an optional FanOut running the batch helpers; by default default_fan_out is shared.
+
+        The batch helpers (rates, limits, market_infos, tx_statuses) yield fanout.Result(item, value, error)
+        tuples in completion order; an exception is reported in its item's Result and does not stop the batch.
+        """
         self.url = None
         self.timeout = timeout
+        self.transport = transport
+        self.cache = cache
+        self.snapshot = snapshot
+        self.limiter = limiter
+        self.url_base = url_base
+        self.instrumentation = instrumentation
+        self.resilience = resilience
+        self.fan_out = fan_out
         
     def rate(self, pair):
         return rate(pair, self, self.timeout)
@@ -498,7 +664,7 @@ class ShapeShiftIO:
     def limit(self, pair):
         return limit(pair, self, self.timeout)
 
-    def market_info(self, pair):
+    def market_info(self, pair=None):
         return market_info(pair, self, self.timeout)
 
     def recent_tx(self, max_results=5):
@@ -507,7 +673,7 @@ class ShapeShiftIO:
     def tx_status(self, address):
         return tx_status(address, self, self.timeout)
 
-    def time_remaining(address, url_store=None):
+    def time_remaining(self, address):
         return time_remaining(address, self, self.timeout)
 
     def coin_list(self):
@@ -519,6 +685,12 @@ class ShapeShiftIO:
     def tx_by_address(self, api_key, address):
         return tx_by_address(api_key, address, self, self.timeout)
 
+    def iter_tx_by_api_key(self, api_key):
+        return iter_tx_by_api_key(api_key, self, self.timeout)
+
+    def iter_tx_by_address(self, api_key, address):
+        return iter_tx_by_address(api_key, address, self, self.timeout)
+
     def validate_address(self, address, coin):
         return validate_address(address, coin, self, self.timeout)
         
@@ -533,6 +705,22 @@ class ShapeShiftIO:
 
     def cancel_pending(self, postdata):
         return cancel_pending(postdata, self, self.timeout)
+
+    def rates(self, pairs):
+        return self._map(self.rate, pairs)
+
+    def limits(self, pairs):
+        return self._map(self.limit, pairs)
+
+    def market_infos(self, pairs):
+        return self._map(self.market_info, pairs)
+
+    def tx_statuses(self, addresses):
+        return self._map(self.tx_status, addresses)
+
+    def _map(self, function, items):
+        """ Internal """
+        return _option(self, "fan_out", default_fan_out).map(function, items)
         
 # Transfer all the function docstrings to the class methods as well.
 try:
@@ -545,6 +733,8 @@ try:
     ShapeShiftIO.coin_list.__func__.__doc__ = coin_list.__doc__
     ShapeShiftIO.tx_by_api_key.__func__.__doc__ = tx_by_api_key.__doc__
     ShapeShiftIO.tx_by_address.__func__.__doc__ = tx_by_address.__doc__
+    ShapeShiftIO.iter_tx_by_api_key.__func__.__doc__ = iter_tx_by_api_key.__doc__
+    ShapeShiftIO.iter_tx_by_address.__func__.__doc__ = iter_tx_by_address.__doc__
     ShapeShiftIO.validate_address.__func__.__doc__ = validate_address.__doc__
     ShapeShiftIO.shift.__func__.__doc__ = shift.__doc__
     ShapeShiftIO.set_mail.__func__.__doc__ = set_mail.__doc__
@@ -0,0 +1,308 @@
+"""
+Market snapshot shared between processes through one multiprocessing.shared_memory segment.
+
+One refresher process creates the segment and publishes every /marketinfo/ refresh into it; any
+number of worker processes attach to it by name and answer rate, limit and market_info from it
+without copying the table and without making HTTP calls of their own. Install it like a
+MarketSnapshot (default_snapshot, or ShapeShiftIO(snapshot=...)) in every process.
+
+Segment layout (little-endian, fixed for a given capacity):
+
+    offset 0                   header, HEADER_SIZE bytes:
+                               magic "SSMS", layout version (uint32), sequence (uint64),
+                               published_at (float64, seconds since the epoch), count (uint32),
+                               capacity (uint32)
+    HEADER_SIZE                capacity pair names, PAIR_SIZE bytes each, ASCII, NUL padded
+    + capacity * PAIR_SIZE     rate, limit, min, miner_fee: capacity float64s each
+
+The sequence is a seqlock: the publisher makes it odd before writing and even again after, and a
+reader retries whenever it saw an odd sequence or the sequence changed while it was reading. There
+is one publisher per segment; readers never block it.
+"""
+
+from array import array
+import os
+import struct
+import time
+
+from .shapeshiftio import market_info
+from .snapshot import MarketTable, build_table
+
+MAGIC = b"SSMS"
+LAYOUT_VERSION = 1
+HEADER = struct.Struct("<4sIQdII")
+HEADER_SIZE = 64
+PAIR_SIZE = 24
+_SEQUENCE = struct.Struct("<Q")
+_SEQUENCE_OFFSET = 8
+_FIELDS = ("rate", "limit", "min", "minerFee")
+
+
+def segment_size(capacity):
+    """ Bytes needed by a segment holding up to capacity pairs. """
+    return HEADER_SIZE + capacity * (PAIR_SIZE + 8 * len(_FIELDS))
+
+
+class _Mapping(object):
+    """ Internal. A POSIX segment mapped without SharedMemory, so no resource tracker hears of it. """
+    def __init__(self, name):
+        import mmap
+        import _posixshmem
+        fd = _posixshmem.shm_open("/" + name, os.O_RDWR, mode=0o600)
+        try:
+            self._mmap = mmap.mmap(fd, os.fstat(fd).st_size)
+        finally:
+            os.close(fd)
+        self.buf = memoryview(self._mmap)
+
+    def close(self):
+        self.buf.release()
+        self._mmap.close()
+
+
+def _attach(name):
+    """ Internal. Attaches to an existing segment without letting this process's exit unlink it. """
+    from multiprocessing import shared_memory
+    try:
+        return shared_memory.SharedMemory(name, track=False)
+    except TypeError:
+        pass
+    # Before Python 3.13 every SharedMemory attach registers the segment with the resource tracker,
+    # which unlinks it from under the other processes when this one exits. Windows has no tracker.
+    if os.name == "nt":
+        return shared_memory.SharedMemory(name)
+    return _Mapping(name)
+
+
+class SharedMarketSnapshot(object):
+    """
+    name         segment name, the same in every process.
+    create       True in the refresher process: creates (or replaces) the segment and fetches the
+                 markets when they expire. False in workers: attaches to the existing segment and
+                 never fetches.
+    capacity     maximum number of pairs (create only; workers read it from the header).
+    ttl          seconds a publish stays valid; the refresher refetches after that.
+    stale_after  seconds after which workers stop answering from an unrefreshed segment, so the
+                 calls fall through to HTTP when the refresher has died. None never gives up.
+    timeout      timeout used for the /marketinfo/ call when the caller gives none.
+    """
+    def __init__(self, name="shapeshiftio-markets", create=False, capacity=4096, ttl=30.0, stale_after=120.0,
+                 timeout=None):
+        self.name = name
+        self.owner = create
+        self.ttl = ttl
+        self.stale_after = stale_after
+        self.timeout = timeout
+        if create:
+            from multiprocessing import shared_memory
+            try:
+                # A segment left behind by a refresher that did not close it.
+                stale = shared_memory.SharedMemory(name)
+                stale.close()
+                stale.unlink()
+            except FileNotFoundError:
+                pass
+            self._memory = shared_memory.SharedMemory(name, create=True, size=segment_size(capacity))
+            HEADER.pack_into(self._memory.buf, 0, MAGIC, LAYOUT_VERSION, 0, 0.0, 0, capacity)
+        else:
+            self._memory = _attach(name)
+            magic, version = HEADER.unpack_from(self._memory.buf, 0)[:2]
+            if magic != MAGIC or version != LAYOUT_VERSION:
+                self._memory.close()
+                raise ValueError("%s is not a version %d market segment" % (name, LAYOUT_VERSION))
+            capacity = HEADER.unpack_from(self._memory.buf, 0)[5]
+        self.capacity = capacity
+        buf = self._memory.buf
+        start = HEADER_SIZE + capacity * PAIR_SIZE
+        self._names = buf[HEADER_SIZE:start]
+        self._columns = [buf[start + i * 8 * capacity:start + (i + 1) * 8 * capacity].cast("d")
+                         for i in range(len(_FIELDS))]
+        self._decoded = (None, [], {})    # (sequence, pairs, pair -> row) of the last publish decoded
+        self._table = None
+        self._table_sequence = None
+
+    # -- publisher --
+
+    def publish(self, records):
+        """ Writes a /marketinfo/ response array into the segment. Only the creating process may publish. """
+        if not self.owner:
+            raise ValueError("only the process that created %s publishes to it" % self.name)
+        table = build_table(records)
+        count = len(table.pairs)
+        if count > self.capacity:
+            raise ValueError("%d pairs do not fit a segment of capacity %d" % (count, self.capacity))
+        encoded = [pair.encode("ascii") for pair in table.pairs]
+        for pair in encoded:
+            if len(pair) > PAIR_SIZE:
+                raise ValueError("pair %r is longer than %d bytes" % (pair.decode("ascii"), PAIR_SIZE))
+        names = b"".join(pair.ljust(PAIR_SIZE, b"\0") for pair in encoded)
+        buf = self._memory.buf
+        sequence = _SEQUENCE.unpack_from(buf, _SEQUENCE_OFFSET)[0]
+        _SEQUENCE.pack_into(buf, _SEQUENCE_OFFSET, sequence + 1)
+        self._names[:len(names)] = names
+        for column, values in zip(self._columns, (table.rate, table.limit, table.min, table.miner_fee)):
+            column[:count] = values
+        HEADER.pack_into(buf, 0, MAGIC, LAYOUT_VERSION, sequence + 1, time.time(), count, self.capacity)
+        _SEQUENCE.pack_into(buf, _SEQUENCE_OFFSET, sequence + 2)
+
+    def refresh(self, url_store=None, timeout=None, force=False):
+        """
+        Fetches all markets in one call and publishes them. Does nothing in a worker. An API error
+        ({"error": ...}) keeps the last publish.
+        """
+        if self.owner and (force or self.expired):
+            records = market_info(None, url_store, self.timeout if timeout is None else timeout)
+            if isinstance(records, list):
+                self.publish(records)
+
+    def run(self, url_store=None, timeout=None, interval=None, stop=None):
+        """
+        Refresher loop: publishes every interval seconds (ttl / 2 by default) until stop, a
+        threading.Event or multiprocessing.Event, is set. A failed fetch keeps the last publish.
+        """
+        interval = self.ttl / 2.0 if interval is None else interval
+        while stop is None or not stop.is_set():
+            try:
+                self.refresh(url_store, timeout, force=True)
+            except Exception:
+                pass
+            if stop is None:
+                time.sleep(interval)
+            else:
+                stop.wait(interval)
+
+    # -- readers --
+
+    @property
+    def sequence(self):
+        """ Sequence number of the current publish; it grows by 2 per publish. """
+        return _SEQUENCE.unpack_from(self._memory.buf, _SEQUENCE_OFFSET)[0]
+
+    @property
+    def fetched_at(self):
+        """ Time of the last publish, None before the first one. """
+        published_at = self._read(lambda: HEADER.unpack_from(self._memory.buf, 0)[3])[1]
+        return published_at or None
+
+    @property
+    def expired(self):
+        fetched_at = self.fetched_at
+        return fetched_at is None or time.time() - fetched_at >= self.ttl
+
+    @property
+    def stale(self):
+        """ True when workers should not answer from the segment: never published, or not for stale_after. """
+        fetched_at = self.fetched_at
+        if fetched_at is None:
+            return True
+        return self.stale_after is not None and time.time() - fetched_at >= self.stale_after
+
+    @property
+    def table(self):
+        """
+        The current publish as a MarketTable. The columns are copied out of the segment when this is
+        read after a publish, so the table stays consistent while the publisher writes the next one.
+        Lookups do not need it; they read the segment directly.
+        """
+        while self._table is None or self._table_sequence != self.sequence:
+            sequence, pairs, index = self._decode()
+            columns = [array("d", column[:len(pairs)]) for column in self._columns]
+            if self.sequence == sequence:
+                self._table_sequence, self._table = sequence, MarketTable(pairs, index, *columns)
+        return self._table
+
+    def ensure_fresh(self, url_store=None, timeout=None):
+        """ The refresher refetches an expired snapshot here; workers only read. """
+        if self.owner and self.expired:
+            self.refresh(url_store, timeout)
+
+    def market_info(self, pair):
+        """ Same shape as the market_info() response, or None when the pair is not listed or the segment is stale. """
+        values = self._lookup(pair)
+        if values is None:
+            return None
+        return {"pair": pair, "rate": values[0], "limit": values[1], "min": values[2], "minerFee": values[3]}
+
+    def rate(self, pair):
+        """ Same shape as the rate() response, or None when the pair is not listed or the segment is stale. """
+        values = self._lookup(pair)
+        if values is None:
+            return None
+        return {"pair": pair, "rate": str(values[0])}
+
+    def limit(self, pair):
+        """ Same shape as the limit() response, or None when the pair is not listed or the segment is stale. """
+        values = self._lookup(pair)
+        if values is None:
+            return None
+        return {"pair": pair, "limit": str(values[1]), "min": str(values[2])}
+
+    def __contains__(self, pair):
+        return self._lookup(pair) is not None
+
+    def __len__(self):
+        return self._read(lambda: HEADER.unpack_from(self._memory.buf, 0)[4])[1]
+
+    def close(self):
+        """ Detaches from the segment; the refresher also removes it. """
+        self._names.release()
+        for column in self._columns:
+            column.release()
+        self._columns = []
+        self._memory.close()
+        if self.owner:
+            try:
+                self._memory.unlink()
+            except FileNotFoundError:
+                pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def _read(self, function):
+        """ Internal. Runs function until it saw one complete publish; returns (sequence, result). """
+        while True:
+            sequence = self.sequence
+            if sequence & 1:
+                time.sleep(0)
+                continue
+            result = function()
+            if self.sequence == sequence:
+                return sequence, result
+
+    def _pairs(self, count):
+        """ Internal. Decodes the first count pair names. """
+        names = self._names
+        return [bytes(names[row * PAIR_SIZE:(row + 1) * PAIR_SIZE]).rstrip(b"\0").decode("ascii")
+                for row in range(count)]
+
+    def _decode(self):
+        """
+        Internal. (sequence, pairs, pair -> row) of the current publish. The pair names are decoded
+        once per publish and shared by lookups and table.
+        """
+        while True:
+            decoded = self._decoded
+            sequence = self.sequence
+            if decoded[0] == sequence:
+                return decoded
+            if sequence & 1:
+                time.sleep(0)
+                continue
+            pairs = self._pairs(HEADER.unpack_from(self._memory.buf, 0)[4])
+            if self.sequence == sequence:
+                self._decoded = (sequence, pairs, dict((pair, row) for row, pair in enumerate(pairs)))
+
+    def _lookup(self, pair):
+        """ Internal. (rate, limit, min, miner_fee) of pair read straight from the segment, or None. """
+        if not pair or self.stale:
+            return None
+        while True:
+            sequence, _, index = self._decode()
+            row = index.get(pair)
+            values = None if row is None else tuple(column[row] for column in self._columns)
+            if self.sequence == sequence:
+                return values
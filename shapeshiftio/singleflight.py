@@ -0,0 +1,74 @@
+"""
+Request coalescing for concurrent identical GETs.
+
+While a GET for a URL is in flight, other threads asking for the same URL wait for it instead of
+sending their own request, and all of them get the same parsed result or the same exception.
+The module functions coalesce through default_flight in shapeshiftio.py, keyed by the URL and the
+client's transport, limiter and resilience, so clients configured differently never share a
+response. Set it to None to turn this off. POST requests never go through here.
+"""
+
+import threading
+
+
+class _Call(object):
+    """ Internal. One in-flight call and its outcome. """
+    __slots__ = ("event", "result", "error", "waiters")
+
+    def __init__(self):
+        self.event = threading.Event()
+        self.result = None
+        self.error = None
+        self.waiters = 0
+
+
+class SingleFlight(object):
+    """
+    Thread-safe single-flight group keyed by URL (and by whatever else the caller puts in the key).
+
+    Results are shared between every caller of a coalesced call and must not be mutated.
+    """
+    def __init__(self):
+        self._calls = {}
+        self._lock = threading.Lock()
+        self.calls = 0          # calls that actually ran
+        self.coalesced = 0      # calls that waited on another caller's result
+
+    def do(self, key, fn, timeout=None):
+        """
+        Returns fn(), sharing one execution between concurrent callers with the same key.
+
+        timeout bounds how long a caller waits for another caller's execution, as a request's own
+        timeout would; socket.timeout is raised when it runs out. The execution itself carries on.
+        """
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+                self.calls += 1
+            else:
+                call.waiters += 1
+                self.coalesced += 1
+        if not leader:
+            if not call.event.wait(timeout):
+                import socket
+                raise socket.timeout("timed out")
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = fn()
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.event.set()
+        return call.result
+
+    def in_flight(self):
+        """ Number of distinct keys currently being fetched. """
+        return len(self._calls)
@@ -0,0 +1,124 @@
+"""
+Bulk market snapshot built from one /marketinfo/ call (the "no pair = all markets" form).
+
+The response array is indexed into a compact columnar table: a pair -> row dict plus one array('d')
+per numeric field, instead of one dict per market. With a snapshot installed (default_snapshot, or
+ShapeShiftIO(snapshot=...)) rate, limit and market_info are answered from the table in O(1) until
+it expires, so refreshing a board of ~1000 pairs costs one request.
+"""
+
+from array import array
+from collections import namedtuple
+import threading
+import time
+
+from .shapeshiftio import market_info
+
+# One row per pair; rate/limit/min/miner_fee are array('d') columns aligned with pairs.
+MarketTable = namedtuple("MarketTable", "pairs index rate limit min miner_fee")
+
+
+def build_table(records):
+    """
+    Indexes a /marketinfo/ response array into a MarketTable. Records without a pair are skipped.
+    Raises ValueError for anything but an array, such as an {"error": ...} response.
+    """
+    if not isinstance(records, list):
+        raise ValueError("expected a /marketinfo/ array, got %r" % (records,))
+    pairs = []
+    index = {}
+    columns = (array("d"), array("d"), array("d"), array("d"))
+    for record in records:
+        pair = record.get("pair")
+        if not pair:
+            continue
+        index[pair] = len(pairs)
+        pairs.append(pair)
+        for column, field in zip(columns, ("rate", "limit", "min", "minerFee")):
+            column.append(float(record.get(field) or 0.0))
+    return MarketTable(pairs, index, *columns)
+
+
+def empty_table():
+    """ A MarketTable listing no pair. """
+    return MarketTable([], {}, array("d"), array("d"), array("d"), array("d"))
+
+
+class MarketSnapshot(object):
+    """
+    Thread-safe snapshot of every market, refetched on the first lookup after it expires.
+
+    ttl      seconds the snapshot stays valid.
+    timeout  timeout used for the /marketinfo/ call when the caller gives none.
+    """
+    def __init__(self, ttl=30.0, timeout=None):
+        self.ttl = ttl
+        self.timeout = timeout
+        self.fetched_at = None
+        self._table = empty_table()
+        self._lock = threading.Lock()
+
+    @property
+    def table(self):
+        """ The current MarketTable. Read it once and use the local; refreshes swap in a new one. """
+        return self._table
+
+    @property
+    def expired(self):
+        return self.fetched_at is None or time.time() - self.fetched_at >= self.ttl
+
+    def load(self, records):
+        """ Replaces the snapshot with a /marketinfo/ response array. """
+        self._table = build_table(records)
+        self.fetched_at = time.time()
+
+    def refresh(self, url_store=None, timeout=None, force=False):
+        """
+        Fetches all markets in one call, unless another thread just did. When the API answers with an
+        error the snapshot lists no pair until the next refresh, so lookups fall through to per-pair calls.
+        """
+        with self._lock:
+            if force or self.expired:
+                records = market_info(None, url_store, self.timeout if timeout is None else timeout)
+                if isinstance(records, list):
+                    self.load(records)
+                else:
+                    self._table = empty_table()
+                    self.fetched_at = time.time()
+
+    def ensure_fresh(self, url_store=None, timeout=None):
+        """ Refreshes the snapshot if it has expired and returns the current MarketTable. """
+        if self.expired:
+            self.refresh(url_store, timeout)
+        return self._table
+
+    def market_info(self, pair):
+        """ Same shape as the market_info() response, or None when the pair is not listed. """
+        table = self._table
+        row = table.index.get(pair)
+        if row is None:
+            return None
+        return {"pair": pair, "rate": table.rate[row], "limit": table.limit[row],
+                "min": table.min[row], "minerFee": table.miner_fee[row]}
+
+    def rate(self, pair):
+        """ Same shape as the rate() response, or None when the pair is not listed. """
+        table = self._table
+        row = table.index.get(pair)
+        if row is None:
+            return None
+        return {"pair": pair, "rate": str(table.rate[row])}
+
+    def limit(self, pair):
+        """ Same shape as the limit() response, or None when the pair is not listed. """
+        table = self._table
+        row = table.index.get(pair)
+        if row is None:
+            return None
+        return {"pair": pair, "limit": str(table.limit[row]), "min": str(table.min[row])}
+
+    def __contains__(self, pair):
+        return pair in self._table.index
+
+    def __len__(self):
+        return len(self._table.pairs)
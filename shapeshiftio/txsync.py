@@ -0,0 +1,84 @@
+"""
+Incremental sync of an affiliate's transaction history.
+
+TxSync streams tx_by_api_key / tx_by_address and remembers the status of every transaction it has
+reported in a local SQLite file, so each later run reports only new or status-changed records.
+"""
+
+import hashlib
+import sqlite3
+
+from .shapeshiftio import iter_tx_by_api_key, iter_tx_by_address
+
+
+def tx_key(record):
+    """ Identity of a transaction record: its deposit transaction and address. """
+    return "%s|%s" % (record.get("inputTXID") or "", record.get("inputAddress") or "")
+
+
+class TxSync(object):
+    """
+    path        SQLite database file. ":memory:" keeps the state for the lifetime of this object only.
+    url_store   passed to the streaming calls, so a ShapeShiftIO's transport and settings apply.
+    batch_size  number of seen records written per database transaction.
+
+    The private api key itself is never stored; state is kept under a SHA-256 digest of it.
+    """
+    def __init__(self, path, url_store=None, timeout=None, batch_size=500):
+        self.url_store = url_store
+        self.timeout = timeout
+        self.batch_size = batch_size
+        self._db = sqlite3.connect(path)
+        self._db.execute("CREATE TABLE IF NOT EXISTS tx ("
+                         "scope TEXT NOT NULL, key TEXT NOT NULL, status TEXT, PRIMARY KEY (scope, key))")
+        self._db.commit()
+
+    def changes(self, api_key, address=None):
+        """
+        Yields the records of api_key (or of one of its output addresses) that are new or whose status
+        changed since the last run. A record is remembered once the next one is requested, so a record
+        whose processing was interrupted is reported again on the next run.
+        """
+        scope = hashlib.sha256(api_key.encode("utf-8")).hexdigest()
+        if address:
+            scope += "/" + address
+            records = iter_tx_by_address(api_key, address, self.url_store, self.timeout)
+        else:
+            records = iter_tx_by_api_key(api_key, self.url_store, self.timeout)
+
+        seen = []
+        try:
+            for record in records:
+                key = tx_key(record)
+                status = record.get("status")
+                row = self._db.execute("SELECT status FROM tx WHERE scope = ? AND key = ?", (scope, key)).fetchone()
+                if row is not None and row[0] == status:
+                    continue
+                yield record
+                seen.append((scope, key, status))
+                if len(seen) >= self.batch_size:
+                    self._save(seen)
+                    seen = []
+        finally:
+            self._save(seen)
+
+    def sync(self, api_key, address=None):
+        """ Returns the list of new or status-changed records, see changes(). """
+        return list(self.changes(api_key, address))
+
+    def forget(self, api_key, address=None):
+        """ Drops the remembered state, so the next run reports every record again. """
+        scope = hashlib.sha256(api_key.encode("utf-8")).hexdigest()
+        if address:
+            scope += "/" + address
+        self._db.execute("DELETE FROM tx WHERE scope = ?", (scope,))
+        self._db.commit()
+
+    def close(self):
+        self._db.close()
+
+    def _save(self, seen):
+        """ Internal """
+        if seen:
+            self._db.executemany("INSERT OR REPLACE INTO tx (scope, key, status) VALUES (?, ?, ?)", seen)
+            self._db.commit()
@@ -0,0 +1,203 @@
+"""
+Batch tx_status / time_remaining poller for many deposit addresses.
+
+AddressWatcher polls a set of addresses on a bounded worker pool and schedules each one adaptively:
+fast once a deposit is "received" or a fixed-amount order nears expiry, slower and slower while it
+sits idle in "no_deposits", and never again once it is "complete", "failed" or "expired".
+Status changes are yielded by events() or passed to a callback by run().
+"""
+
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+import heapq
+import itertools
+import threading
+import time
+
+from .shapeshiftio import tx_status, time_remaining
+
+# old_status is None the first time an address is seen. response is the tx_status (or, for
+# "expired", the time_remaining) response that carried the new status.
+StatusChange = namedtuple("StatusChange", "address old_status status response")
+
+TERMINAL_STATUSES = frozenset(("complete", "failed", "expired"))
+
+
+class _Watch(object):
+    """ Internal. Polling state of one address. """
+    __slots__ = ("address", "status", "interval", "expiry", "errors")
+
+    def __init__(self, address, interval):
+        self.address = address
+        self.status = None
+        self.interval = interval
+        self.expiry = None      # None: not checked yet, False: no expiry, float: deadline
+        self.errors = 0
+
+
+class _Scheduler(object):
+    """
+    Internal. The scheduling loop of AddressWatcher and OrderManager: a heap of (due, seq, key) entries
+    polled on a pool of at most workers threads. Subclasses set _heap, _lock, _stopped and workers, and
+    provide _take(entry), returning the item an entry polls or None for a stale entry, and _poll(item).
+    """
+    def stop(self):
+        """ Makes events() return once the polls in flight have finished, also if it has not started yet. """
+        self._stopped = True
+
+    def _finished_polls(self, items):
+        """
+        Internal. Yields lists of (item, future) of finished polls until items is empty or stop() is
+        called. Results are only handled by the caller, so it can reschedule before the next round.
+        """
+        pending = {}
+        executor = ThreadPoolExecutor(self.workers)
+        try:
+            while not self._stopped and (pending or items):
+                now = time.time()
+                with self._lock:
+                    while self._heap and self._heap[0][0] <= now and len(pending) < self.workers:
+                        item = self._take(heapq.heappop(self._heap))
+                        if item is not None:
+                            pending[executor.submit(self._poll, item)] = item
+                    next_due = self._heap[0][0] if self._heap else now + 1.0
+
+                timeout = min(max(next_due - now, 0.0), 1.0)
+                if not pending:
+                    time.sleep(timeout)
+                    continue
+                if len(pending) >= self.workers:
+                    # Nothing can be submitted before a poll finishes, however overdue the heap is.
+                    timeout = 1.0
+                done, _ = wait(pending, timeout, FIRST_COMPLETED)
+                yield [(pending.pop(future), future) for future in done]
+        finally:
+            executor.shutdown(wait=False)
+            # The stop() is used up; a later events() runs again.
+            self._stopped = False
+
+
+class AddressWatcher(_Scheduler):
+    """
+    Polls deposit addresses until they reach a terminal status.
+
+    url_store          passed to tx_status/time_remaining, so a ShapeShiftIO's transport and settings apply.
+    workers            maximum number of polls in flight.
+    received_interval  seconds between polls once a deposit is received.
+    idle_interval      first delay for an address in "no_deposits"; multiplied by backoff on each
+                       unchanged poll, up to max_interval.
+    fast_interval      seconds between polls within near_expiry seconds of a fixed-amount deadline.
+    track_expiry       whether to ask time_remaining for the deadline of addresses without deposits.
+                       It is asked once, and again only once the deadline has passed.
+    """
+    def __init__(self, addresses=(), url_store=None, workers=8, timeout=None, received_interval=5.0,
+                 idle_interval=10.0, max_interval=300.0, backoff=1.5, fast_interval=2.0, near_expiry=60.0,
+                 track_expiry=True):
+        self.url_store = url_store
+        self.workers = workers
+        self.timeout = timeout
+        self.received_interval = received_interval
+        self.idle_interval = idle_interval
+        self.max_interval = max_interval
+        self.backoff = backoff
+        self.fast_interval = fast_interval
+        self.near_expiry = near_expiry
+        self.track_expiry = track_expiry
+        self.statuses = {}      # address -> last seen status
+        self.last_errors = {}   # address -> last exception raised while polling it
+        self._watches = {}
+        self._heap = []
+        self._seq = itertools.count()
+        self._lock = threading.Lock()
+        self._stopped = False
+        for address in addresses:
+            self.add(address)
+
+    def add(self, address):
+        """ Starts watching an address. Safe to call from any thread, also while events() runs. """
+        with self._lock:
+            if address not in self._watches:
+                self._watches[address] = _Watch(address, self.idle_interval)
+                heapq.heappush(self._heap, (time.time(), next(self._seq), address))
+
+    def remove(self, address):
+        """ Stops watching an address. """
+        with self._lock:
+            self._watches.pop(address, None)
+
+    def __len__(self):
+        return len(self._watches)
+
+    def run(self, callback):
+        """ Calls callback(StatusChange) for every status change until all addresses are done. """
+        for event in self.events():
+            callback(event)
+
+    def events(self):
+        """ Yields StatusChange events until every address is in a terminal status, removed, or stop() is called. """
+        for finished in self._finished_polls(self._watches):
+            for watch, future in finished:
+                event = self._handle(watch, future)
+                if event is not None:
+                    yield event
+
+    def _take(self, entry):
+        """ Internal. Caller holds the lock. """
+        return self._watches.get(entry[2])
+
+    def _poll(self, watch):
+        """ Internal. Runs on a worker thread; returns (status, response). """
+        response = tx_status(watch.address, self.url_store, self.timeout)
+        status = response.get("status")
+        if status == "no_deposits" and self.track_expiry:
+            now = time.time()
+            if watch.expiry is None or (watch.expiry and now >= watch.expiry):
+                remaining = time_remaining(watch.address, self.url_store, self.timeout)
+                if remaining.get("status") == "expired":
+                    return "expired", remaining
+                if "seconds_remaining" in remaining:
+                    watch.expiry = now + float(remaining["seconds_remaining"])
+                else:
+                    watch.expiry = False
+        return status, response
+
+    def _handle(self, watch, future):
+        """ Internal. Records a finished poll, reschedules the address and returns the event, if any. """
+        event = None
+        try:
+            status, response = future.result()
+        except Exception as e:
+            watch.errors += 1
+            self.last_errors[watch.address] = e
+            delay = min(self.idle_interval * self.backoff ** watch.errors, self.max_interval)
+        else:
+            watch.errors = 0
+            if status != watch.status:
+                event = StatusChange(watch.address, watch.status, status, response)
+                watch.status = status
+                self.statuses[watch.address] = status
+                watch.interval = self.idle_interval
+            elif status == "no_deposits":
+                watch.interval = min(watch.interval * self.backoff, self.max_interval)
+            if status in TERMINAL_STATUSES:
+                self.remove(watch.address)
+                return event
+            delay = self._delay(watch)
+
+        with self._lock:
+            if watch.address in self._watches:
+                heapq.heappush(self._heap, (time.time() + delay, next(self._seq), watch.address))
+        return event
+
+    def _delay(self, watch):
+        """ Internal. Seconds until the next poll of an address. """
+        if watch.status == "received":
+            return self.received_interval
+        delay = watch.interval
+        if watch.expiry:
+            until_fast = watch.expiry - self.near_expiry - time.time()
+            if until_fast <= 0:
+                delay = min(delay, self.fast_interval)
+            else:
+                delay = min(delay, until_fast)
+        return delay
@@ -0,0 +1,28 @@
+import unittest
+
+from shapeshiftio import AddressValidator
+from shapeshiftio.addresses import is_eip55, to_checksum_address
+
+
+class AddressFormatTest(unittest.TestCase):
+    def test_eip55(self):
+        address = "0x5aAeb6053F3E94C9b9A09f33669435E7Ef1BeAed"
+        self.assertTrue(is_eip55(address))
+        self.assertTrue(is_eip55(address.lower()))
+        self.assertEqual(to_checksum_address(address.lower()), address)
+        self.assertFalse(is_eip55(address[:-1] + "D"))
+
+    def test_eip55_rejects_non_hex_characters(self):
+        for separator in "_+- ":
+            self.assertFalse(is_eip55("0x" + "a" * 19 + separator + "a" * 20))
+
+    def test_local_checks(self):
+        validator = AddressValidator()
+        self.assertTrue(validator.check("1BvBMSEYstWetqTFn5Au4m4GFg7xJaNVN2", "BTC"))
+        self.assertTrue(validator.check("bc1qar0srrr7xfkvy5l643lydnw9re59gtzzwf5mdq", "BTC"))
+        self.assertFalse(validator.check("1BvBMSEYstWetqTFn5Au4m4GFg7xJaNVN3", "BTC"))
+        self.assertIsNone(validator.check("anything", "NOSUCHCOIN"))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,173 @@
+import asyncio
+import unittest
+from urllib.error import HTTPError
+
+from shapeshiftio import AsyncShapeShiftIO
+from shapeshiftio.aio import AsyncConnectionPool, AsyncSingleFlight
+from shapeshiftio.mockserver import MockShapeShiftServer
+
+from test_pool import RawServer
+
+
+def run(coroutine):
+    loop = asyncio.new_event_loop()
+    try:
+        return loop.run_until_complete(coroutine)
+    finally:
+        loop.close()
+
+
+class AsyncShapeShiftIOTest(unittest.TestCase):
+    def setUp(self):
+        self.server = MockShapeShiftServer().start()
+
+    def tearDown(self):
+        self.server.stop()
+
+    def test_endpoints(self):
+        async def scenario():
+            async with AsyncShapeShiftIO(url_base=self.server.url) as api:
+                rate = await api.rate("btc_eth")
+                self.assertEqual(api.url, self.server.url + "/rate/btc_eth")
+                order = await api.send_amount({"pair": "btc_eth", "amount": "1", "withdrawal": "0xabc"})
+                status = await api.tx_status(order["success"]["deposit"])
+                return rate, status
+        rate, status = run(scenario())
+        self.assertEqual(rate["pair"], "btc_eth")
+        self.assertEqual(status["status"], "no_deposits")
+
+    def test_client_built_outside_the_loop(self):
+        api = AsyncShapeShiftIO(url_base=self.server.url, concurrency=1)
+        self.server.latency = 0.05
+
+        async def scenario():
+            try:
+                return await asyncio.gather(api.rate("btc_eth"), api.rate("btc_ltc"), api.limit("btc_eth"))
+            finally:
+                api.close()
+        self.assertEqual([answer["pair"] for answer in asyncio.run(scenario())], ["btc_eth", "btc_ltc", "btc_eth"])
+
+    def test_timeout(self):
+        self.server.latency = 0.5
+
+        async def scenario():
+            api = AsyncShapeShiftIO(url_base=self.server.url, timeout=0.1)
+            with self.assertRaises(asyncio.TimeoutError):
+                await api.rate("btc_eth")
+            api.close()
+        run(scenario())
+
+    def test_coalescing(self):
+        self.server.latency = 0.1
+
+        async def scenario(coalesce):
+            api = AsyncShapeShiftIO(url_base=self.server.url, coalesce=coalesce)
+            await asyncio.gather(*[api.rate("btc_eth") for _ in range(5)])
+            api.close()
+        run(scenario(True))
+        self.assertEqual(self.server.requests, 1)
+        run(scenario(False))
+        self.assertEqual(self.server.requests, 6)
+
+
+class AsyncConnectionPoolTest(unittest.TestCase):
+    def test_connection_is_reused_and_errors_raised(self):
+        async def scenario(url):
+            pool = AsyncConnectionPool()
+            for _ in range(3):
+                self.assertIn(b"btc_eth", await pool.request("GET", url + "/rate/btc_eth"))
+            self.assertEqual([len(idle) for idle in pool._idle.values()], [1])
+            with self.assertRaises(HTTPError) as raised:
+                await pool.request("GET", url + "/nosuchendpoint")
+            self.assertEqual(raised.exception.code, 404)
+            self.assertIn(b"btc_eth", await pool.request("GET", url + "/rate/btc_eth"))
+            pool.close()
+        with MockShapeShiftServer() as server:
+            run(scenario(server.url))
+
+    def test_get_is_resent_on_stale_connection(self):
+        server = RawServer("close_after_reply")
+
+        async def scenario():
+            pool = AsyncConnectionPool()
+            self.assertEqual(await pool.request("GET", server.url + "/rate/btc_eth"), b"ok")
+            await asyncio.sleep(0.05)
+            self.assertEqual(await pool.request("GET", server.url + "/rate/btc_eth"), b"ok")
+            pool.close()
+        try:
+            run(scenario())
+        finally:
+            server.close()
+        self.assertEqual(server.connections, 2)
+
+    def test_post_is_never_resent(self):
+        server = RawServer("drop_posts")
+
+        async def scenario():
+            pool = AsyncConnectionPool()
+            self.assertEqual(await pool.request("GET", server.url + "/rate/btc_eth"), b"ok")
+            with self.assertRaises(Exception):
+                await pool.request("POST", server.url + "/shift", b"pair=btc_eth")
+            pool.close()
+        try:
+            run(scenario())
+        finally:
+            server.close()
+        self.assertEqual(server.requests.count("POST"), 1)
+
+
+class AsyncSingleFlightTest(unittest.TestCase):
+    def test_concurrent_calls_share_one_task(self):
+        flight = AsyncSingleFlight()
+        calls = []
+
+        async def fetch():
+            calls.append(1)
+            await asyncio.sleep(0.05)
+            return "value"
+
+        async def scenario():
+            return await asyncio.gather(*[flight.do("key", fetch) for _ in range(3)])
+        self.assertEqual(run(scenario()), ["value"] * 3)
+        self.assertEqual((len(calls), flight.calls, flight.coalesced), (1, 1, 2))
+
+    def test_request_survives_while_a_caller_remains(self):
+        flight = AsyncSingleFlight()
+
+        async def fetch():
+            await asyncio.sleep(0.2)
+            return "value"
+
+        async def scenario():
+            impatient = asyncio.ensure_future(asyncio.wait_for(flight.do("key", fetch), 0.05))
+            patient = asyncio.ensure_future(flight.do("key", fetch))
+            with self.assertRaises(asyncio.TimeoutError):
+                await impatient
+            return await patient
+        self.assertEqual(run(scenario()), "value")
+        self.assertEqual(flight.calls, 1)
+
+    def test_request_is_cancelled_with_its_last_caller(self):
+        flight = AsyncSingleFlight()
+        cancelled = []
+
+        async def fetch():
+            try:
+                await asyncio.sleep(5)
+            except asyncio.CancelledError:
+                cancelled.append(1)
+                raise
+
+        async def scenario():
+            callers = [asyncio.wait_for(flight.do("key", fetch), 0.05) for _ in range(2)]
+            results = await asyncio.gather(*callers, return_exceptions=True)
+            await asyncio.sleep(0)
+            return results
+        results = run(scenario())
+        self.assertTrue(all(isinstance(result, asyncio.TimeoutError) for result in results))
+        self.assertEqual(cancelled, [1])
+        self.assertEqual(flight._calls, {})
+
+
+if __name__ == "__main__":
+    unittest.main()
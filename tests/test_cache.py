@@ -0,0 +1,33 @@
+import unittest
+
+from shapeshiftio import ShapeShiftIO, TTLCache
+from shapeshiftio.mockserver import MockShapeShiftServer
+
+
+class TTLCacheTest(unittest.TestCase):
+    def test_fresh_value_is_served_from_cache(self):
+        with MockShapeShiftServer() as server:
+            api = ShapeShiftIO(url_base=server.url, cache=TTLCache())
+            first = api.rate("btc_eth")
+            self.assertEqual(api.rate("btc_eth"), first)
+            self.assertEqual(server.requests, 1)
+            self.assertEqual(api.cache.hits, 1)
+
+    def test_api_errors_are_not_cached(self):
+        with MockShapeShiftServer() as server:
+            api = ShapeShiftIO(url_base=server.url, cache=TTLCache())
+            self.assertIn("error", api.rate("btc_nosuchcoin"))
+            self.assertIn("error", api.rate("btc_nosuchcoin"))
+            self.assertEqual(server.requests, 2)
+            self.assertEqual(len(api.cache), 0)
+
+    def test_endpoints_without_ttl_bypass_the_cache(self):
+        cache = TTLCache()
+        calls = []
+        for _ in range(2):
+            cache.get("tx_status", "url", lambda: calls.append(1) or {"status": "complete"})
+        self.assertEqual(len(calls), 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,66 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+try:
+    from urllib2 import HTTPError
+except ImportError:
+    from urllib.error import HTTPError
+
+from shapeshiftio import CassetteMiss, RecordingTransport, ReplayTransport, ShapeShiftIO
+from shapeshiftio.cassette import read_cassette
+from shapeshiftio.mockserver import MockShapeShiftServer
+
+
+class CassetteTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.path = os.path.join(self.directory, "session.cassette")
+        with MockShapeShiftServer() as server:
+            self.url = server.url
+            recorder = RecordingTransport(self.path)
+            api = ShapeShiftIO(url_base=server.url, transport=recorder)
+            self.rate = api.rate("btc_eth")
+            self.order = api.send_amount({"pair": "btc_eth", "amount": "1"})
+            with self.assertRaises(HTTPError) as raised:
+                recorder.request("GET", server.url + "/nosuchendpoint")
+            self.assertIn(b"Not found", raised.exception.read())
+            self.assertEqual(recorder.recorded, 3)
+            recorder.close()
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_replay_without_server(self):
+        replay = ReplayTransport(self.path)
+        api = ShapeShiftIO(url_base=self.url, transport=replay)
+        self.assertEqual(len(replay), 3)
+        self.assertEqual(api.rate("btc_eth"), self.rate)
+        self.assertEqual(api.send_amount({"pair": "btc_eth", "amount": "1"}), self.order)
+        with self.assertRaises(HTTPError) as raised:
+            replay.request("GET", self.url + "/nosuchendpoint")
+        self.assertEqual(raised.exception.code, 404)
+
+    def test_unrecorded_request_misses(self):
+        replay = ReplayTransport(self.path)
+        with self.assertRaises(CassetteMiss):
+            replay.request("GET", self.url + "/rate/btc_ltc")
+        with self.assertRaises(CassetteMiss):
+            replay.request("POST", self.url + "/sendamount", b"pair=btc_ltc&amount=1")
+
+    def test_truncated_tail_is_ignored(self):
+        with open(self.path, "r+b") as cassette:
+            cassette.truncate(os.path.getsize(self.path) - 3)
+        self.assertEqual(len(list(read_cassette(self.path))), 2)
+
+    def test_recording_appends(self):
+        with MockShapeShiftServer() as server:
+            recorder = RecordingTransport(self.path)
+            recorder.request("GET", server.url + "/rate/btc_ltc")
+            recorder.close()
+        self.assertEqual(len(ReplayTransport(self.path)), 4)
+
+
+if __name__ == "__main__":
+    unittest.main()
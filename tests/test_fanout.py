@@ -0,0 +1,88 @@
+import threading
+import unittest
+
+from shapeshiftio.fanout import FanOut, Result
+
+
+class FanOutTest(unittest.TestCase):
+    def setUp(self):
+        self.fanout = FanOut(workers=3)
+
+    def tearDown(self):
+        self.fanout.close()
+
+    def test_completion_order(self):
+        # Each call waits for its own event; the consumer releases items from the last to the first.
+        events = [threading.Event() for _ in range(3)]
+
+        def step(item):
+            if not events[item].wait(5):
+                raise RuntimeError("timed out")
+            return item * 10
+
+        results = []
+        events[2].set()
+        for result in self.fanout.map(step, [0, 1, 2]):
+            results.append(result)
+            if result.item:
+                events[result.item - 1].set()
+        self.assertEqual(results, [Result(2, 20, None), Result(1, 10, None), Result(0, 0, None)])
+
+    def test_error_marks_only_its_item(self):
+        def invert(item):
+            return 1.0 / item
+
+        results = sorted(self.fanout.map(invert, [1, 0, 2, 4]))
+        self.assertEqual([result.item for result in results], [0, 1, 2, 4])
+        self.assertIsNone(results[0].value)
+        self.assertIsInstance(results[0].error, ZeroDivisionError)
+        self.assertEqual([result.value for result in results[1:]], [1.0, 0.5, 0.25])
+        self.assertTrue(all(result.error is None for result in results[1:]))
+
+    def test_early_stop_cancels_pending(self):
+        fanout = FanOut(workers=1, window=4)
+        self.addCleanup(fanout.close)
+        release = threading.Event()
+        running = threading.Event()
+        started = []
+        drawn = []
+
+        def items():
+            for item in range(100):
+                drawn.append(item)
+                yield item
+
+        def call(item):
+            started.append(item)
+            if item:
+                running.set()
+                release.wait(5)
+            return item
+
+        results = fanout.map(call, items())
+        self.assertEqual(next(results), Result(0, 0, None))
+        self.assertTrue(running.wait(5))
+        results.close()
+        release.set()
+        fanout._executor.shutdown(wait=True)
+        # Item 1 was already running; 2..4 were queued and cancelled, the rest never drawn.
+        self.assertEqual(started, [0, 1])
+        self.assertLessEqual(len(drawn), 5)
+
+    def test_window_bounds_items_drawn(self):
+        drawn = []
+
+        def items():
+            for item in range(100):
+                drawn.append(item)
+                yield item
+
+        results = self.fanout.map(lambda item: item, items())
+        first = next(results)
+        self.assertLessEqual(len(drawn), self.fanout.window + 1)
+        self.assertEqual(first.value + sum(result.value for result in results), sum(range(100)))
+        self.assertEqual(len(drawn), 100)
+
+
+if __name__ == "__main__":
+    unittest.main()
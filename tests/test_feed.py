@@ -0,0 +1,89 @@
+import unittest
+
+from shapeshiftio import ShapeShiftIO
+from shapeshiftio.feed import TradeFeed, fingerprint
+from shapeshiftio.mockserver import MockShapeShiftServer
+
+
+def _trade(number, pair="btc_eth", timestamp=None):
+    cur_in, cur_out = pair.split("_")
+    return {"curIn": cur_in.upper(), "curOut": cur_out.upper(), "amount": 1.0 + number,
+            "timestamp": float(number if timestamp is None else timestamp)}
+
+
+class TradeFeedTest(unittest.TestCase):
+    def setUp(self):
+        # A scripted tape, oldest first; the handler serves it newest first like the API.
+        self.tape = []
+        tape = self.tape
+
+        def recent_tx(server, max_results="5"):
+            return list(reversed(tape))[:int(max_results)]
+
+        self.server = MockShapeShiftServer()
+        self.server._get_handlers = dict(MockShapeShiftServer._get_handlers, recenttx=recent_tx)
+        self.server.start()
+        self.addCleanup(self.server.stop)
+        self.api = ShapeShiftIO(url_base=self.server.url)
+
+    def feed(self, **options):
+        return TradeFeed(url_store=self.api, **options)
+
+    def test_overlapping_polls_deduplicated(self):
+        feed = self.feed()
+        self.tape.extend(_trade(number) for number in range(10))
+        self.assertEqual([trade["amount"] for trade in feed.poll()], [1.0 + number for number in range(10)])
+        self.tape.extend(_trade(number) for number in range(10, 15))
+        self.assertEqual([trade["amount"] for trade in feed.poll()], [11.0, 12.0, 13.0, 14.0, 15.0])
+        self.assertEqual(feed.poll(), [])
+        self.assertEqual((feed.total, feed.polls, feed.gaps), (15, 3, 0))
+
+    def test_gap_counted_when_window_entirely_new(self):
+        feed = self.feed()
+        self.tape.extend(_trade(number) for number in range(50))
+        feed.poll()
+        self.tape.extend(_trade(number) for number in range(50, 150))
+        self.assertEqual(len(feed.poll()), 50)
+        self.assertEqual(feed.gaps, 1)
+
+    def test_ring_buffer_wraps_at_capacity(self):
+        feed = self.feed(capacity=8)
+        for start in (0, 6, 12):
+            self.tape.extend(_trade(number) for number in range(start, start + 6))
+            feed.poll()
+        self.assertEqual(feed.total, 18)
+        self.assertEqual([trade["timestamp"] for trade in feed.last()], [float(number) for number in range(10, 18)])
+        self.assertEqual(feed.last(3), [{"curIn": "btc", "curOut": "eth", "amount": 1.0 + number,
+                                         "timestamp": float(number)} for number in (15, 16, 17)])
+        self.assertEqual(feed.last(100), feed.last())
+
+    def test_volumes_expire_at_volume_window(self):
+        feed = self.feed(volume_window=100.0)
+        self.tape.extend([_trade(0, timestamp=0), _trade(1, timestamp=10), _trade(2, "eth_btc", timestamp=50)])
+        feed.poll()
+        self.assertEqual(feed.volumes(), {"btc_eth": (2, 3.0), "eth_btc": (1, 3.0)})
+        # The newest trade moves the horizon to 50: the trades at 0 and 10 leave the window, the one at 50 stays.
+        self.tape.append(_trade(3, timestamp=150))
+        feed.poll()
+        self.assertEqual(feed.volumes(), {"btc_eth": (1, 4.0), "eth_btc": (1, 3.0)})
+        self.tape.append(_trade(4, "ltc_btc", timestamp=300))
+        feed.poll()
+        self.assertEqual(feed.volumes(), {"ltc_btc": (1, 5.0)})
+
+    def test_volumes_limited_to_ring_buffer(self):
+        feed = self.feed(capacity=2)
+        self.tape.extend(_trade(number) for number in range(5))
+        feed.poll()
+        self.assertEqual(feed.volumes(), {"btc_eth": (2, 9.0)})
+
+    def test_fingerprint(self):
+        self.assertEqual(fingerprint(_trade(1)), fingerprint(dict(_trade(1))))
+        self.assertNotEqual(fingerprint(_trade(1)), fingerprint(_trade(1, timestamp=2)))
+
+    def test_capacity_must_be_positive(self):
+        with self.assertRaises(ValueError):
+            TradeFeed(capacity=0)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,224 @@
+import socket
+import threading
+import time
+import unittest
+
+try:
+    import h2
+except ImportError:
+    h2 = None
+
+
+class H2Server(object):
+    """
+    In-process HTTP/2 server speaking h2c with prior knowledge. Every request is answered with
+    "METHOD PATH BODY", or big_response bytes for /big. Answers are held while gate is cleared.
+    With goaway set, the answer to /big is preceded by a GOAWAY naming its stream as the last one.
+    """
+    big_response = 300000
+
+    def __init__(self, max_streams=100):
+        self.max_streams = max_streams
+        self.connections = 0
+        self.requests = []      # (method, path) in the order they were received in full
+        self.resets = []        # ids of the streams the client reset
+        self.gate = threading.Event()
+        self.gate.set()
+        self.goaway = False
+        self._sock = socket.socket()
+        self._sock.bind(("127.0.0.1", 0))
+        self._sock.listen(16)
+        self.url = "http://127.0.0.1:%d" % self._sock.getsockname()[1]
+        self._stopped = False
+        thread = threading.Thread(target=self._accept)
+        thread.daemon = True
+        thread.start()
+
+    def close(self):
+        self._stopped = True
+        self._sock.close()
+
+    def _accept(self):
+        while True:
+            try:
+                conn, _ = self._sock.accept()
+            except socket.error:
+                return
+            self.connections += 1
+            thread = threading.Thread(target=self._serve, args=(conn,))
+            thread.daemon = True
+            thread.start()
+
+    def _serve(self, conn):
+        from h2.config import H2Configuration
+        from h2.connection import H2Connection
+        from h2.settings import SettingCodes
+        from hyperframe.frame import GoAwayFrame
+        import h2.events as events
+
+        connection = H2Connection(H2Configuration(client_side=False, header_encoding="utf-8"))
+        connection.initiate_connection()
+        connection.update_settings({SettingCodes.MAX_CONCURRENT_STREAMS: self.max_streams})
+        conn.sendall(connection.data_to_send())
+        conn.settimeout(0.01)
+        requests = {}   # stream id -> [method, path, body]
+        pending = []    # stream ids received in full, not answered yet
+        outgoing = {}   # stream id -> response bytes not sent yet
+        try:
+            while not self._stopped:
+                try:
+                    data = conn.recv(65536)
+                except socket.timeout:
+                    data = None
+                if data == b"":
+                    return
+                for event in connection.receive_data(data) if data else ():
+                    if isinstance(event, events.RequestReceived):
+                        headers = dict(event.headers)
+                        requests[event.stream_id] = [headers[":method"], headers[":path"], b""]
+                    elif isinstance(event, events.DataReceived):
+                        requests[event.stream_id][2] += event.data
+                        connection.acknowledge_received_data(event.flow_controlled_length, event.stream_id)
+                    elif isinstance(event, events.StreamEnded):
+                        method, path, _ = requests[event.stream_id]
+                        self.requests.append((method, path))
+                        pending.append(event.stream_id)
+                    elif isinstance(event, events.StreamReset):
+                        self.resets.append(event.stream_id)
+                        if event.stream_id in pending:
+                            pending.remove(event.stream_id)
+                        outgoing.pop(event.stream_id, None)
+                if self.gate.is_set():
+                    for stream_id in pending:
+                        method, path, body = requests[stream_id]
+                        if path == "/big":
+                            response = b"x" * self.big_response
+                            if self.goaway:
+                                frame = GoAwayFrame(0)
+                                frame.last_stream_id = stream_id
+                                conn.sendall(connection.data_to_send() + frame.serialize())
+                        else:
+                            response = ("%s %s " % (method, path)).encode("ascii") + body
+                        connection.send_headers(stream_id, [(":status", "200"),
+                                                            ("content-length", str(len(response)))])
+                        outgoing[stream_id] = response
+                    del pending[:]
+                for stream_id, response in list(outgoing.items()):
+                    size = min(connection.local_flow_control_window(stream_id), connection.max_outbound_frame_size,
+                               len(response))
+                    if size > 0 or not response:
+                        connection.send_data(stream_id, response[:size], end_stream=size == len(response))
+                        outgoing[stream_id] = response[size:]
+                        if size == len(response):
+                            del outgoing[stream_id]
+                data = connection.data_to_send()
+                if data:
+                    conn.sendall(data)
+        except socket.error:
+            pass
+        finally:
+            conn.close()
+
+
+@unittest.skipIf(h2 is None, "needs the h2 package")
+class HTTP2TransportTest(unittest.TestCase):
+    def setUp(self):
+        self.server = None
+        self.transport = None
+
+    def tearDown(self):
+        if self.transport is not None:
+            self.transport.close()
+        if self.server is not None:
+            self.server.close()
+
+    def _start(self, max_streams=100, **options):
+        from shapeshiftio import HTTP2Transport
+        self.server = H2Server(max_streams)
+        self.transport = HTTP2Transport(cleartext=True, **options)
+        return self.transport
+
+    def _in_background(self, method, path, body=None):
+        results = []
+
+        def run():
+            results.append(self.transport.request(method, self.server.url + path, body, timeout=5))
+        thread = threading.Thread(target=run)
+        thread.start()
+        thread.results = results
+        return thread
+
+    def _wait_for_requests(self, count):
+        deadline = time.time() + 5
+        while len(self.server.requests) < count and time.time() < deadline:
+            time.sleep(0.005)
+        self.assertEqual(len(self.server.requests), count)
+
+    def test_round_trip(self):
+        transport = self._start()
+        self.assertEqual(transport.request("GET", self.server.url + "/rate/btc_eth"), b"GET /rate/btc_eth ")
+        self.assertEqual(transport.request("POST", self.server.url + "/shift", b"pair=btc_eth"),
+                         b"POST /shift pair=btc_eth")
+        self.assertEqual(self.server.connections, 1)
+
+    def test_requests_are_multiplexed_over_one_connection(self):
+        self._start()
+        self.server.gate.clear()
+        threads = [self._in_background("GET", "/rate/%d" % i) for i in range(5)]
+        # All five are in flight at once, on one connection.
+        self._wait_for_requests(5)
+        self.server.gate.set()
+        for i, thread in enumerate(threads):
+            thread.join()
+            self.assertEqual(thread.results, [("GET /rate/%d " % i).encode("ascii")])
+        self.assertEqual(self.server.connections, 1)
+
+    def test_posts_get_the_next_stream_slot_first(self):
+        self._start(max_streams=1)
+        self.server.gate.clear()
+        threads = [self._in_background("GET", "/first")]
+        self._wait_for_requests(1)
+        for method, path in (("GET", "/a"), ("GET", "/b"), ("POST", "/shift")):
+            threads.append(self._in_background(method, path, b"pair=btc_eth" if method == "POST" else None))
+            time.sleep(0.05)
+        self.server.gate.set()
+        for thread in threads:
+            thread.join()
+        self.assertEqual([path for _, path in self.server.requests], ["/first", "/shift", "/a", "/b"])
+
+    def test_timed_out_stream_is_reset(self):
+        transport = self._start()
+        self.server.gate.clear()
+        with self.assertRaises(socket.timeout):
+            transport.request("GET", self.server.url + "/slow", timeout=0.2)
+        deadline = time.time() + 5
+        while not self.server.resets and time.time() < deadline:
+            time.sleep(0.005)
+        self.assertEqual(self.server.resets, [1])
+        self.server.gate.set()
+        self.assertEqual(transport.request("GET", self.server.url + "/next", timeout=5), b"GET /next ")
+        self.assertEqual(self.server.connections, 1)
+
+    def test_stream_is_answered_after_goaway(self):
+        transport = self._start(window=65535)
+        self.server.goaway = True
+        data = transport.request("GET", self.server.url + "/big", timeout=5)
+        self.assertEqual(len(data), H2Server.big_response)
+        # New requests go to a new connection.
+        self.server.goaway = False
+        self.assertEqual(transport.request("GET", self.server.url + "/next", timeout=5), b"GET /next ")
+        self.assertEqual(self.server.connections, 2)
+
+    def test_alpn_is_set_on_a_given_ssl_context(self):
+        class Context(object):
+            protocols = None
+
+            def set_alpn_protocols(self, protocols):
+                self.protocols = protocols
+        context = Context()
+        self._start(ssl_context=context)
+        self.assertEqual(context.protocols, ["h2", "http/1.1"])
+
+
+if __name__ == "__main__":
+    unittest.main()
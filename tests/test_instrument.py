@@ -0,0 +1,46 @@
+import gc
+import threading
+import unittest
+
+from shapeshiftio import LatencyHistogram, Metrics, ShapeShiftIO
+from shapeshiftio.mockserver import MockShapeShiftServer
+
+
+class LatencyHistogramTest(unittest.TestCase):
+    def test_percentile(self):
+        histogram = LatencyHistogram((0.1, 0.2, 0.5))
+        for value in (0.05, 0.05, 0.15, 0.3):
+            histogram.observe(value)
+        self.assertEqual(histogram.percentile(0.5), 0.1)
+        self.assertEqual(histogram.percentile(1.0), 0.5)
+        histogram.observe(1.0)
+        self.assertEqual(histogram.percentile(1.0), float("inf"))
+
+    def test_finished_threads_do_not_keep_shards(self):
+        histogram = LatencyHistogram()
+        for _ in range(100):
+            thread = threading.Thread(target=histogram.observe, args=(0.02,))
+            thread.start()
+            thread.join()
+        gc.collect()
+        self.assertLessEqual(len(histogram._live), 1)
+        cumulative, total, count = histogram.snapshot()
+        self.assertEqual(count, 100)
+        self.assertAlmostEqual(total, 2.0)
+
+
+class MetricsTest(unittest.TestCase):
+    def test_requests_are_counted(self):
+        metrics = Metrics()
+        with MockShapeShiftServer() as server:
+            api = ShapeShiftIO(url_base=server.url, instrumentation=metrics)
+            api.rate("btc_eth")
+            api.limit("btc_eth")
+        self.assertEqual(metrics.counter("requests_total", endpoint="rate", status="200"), 1)
+        self.assertEqual(metrics.histogram("limit").snapshot()[2], 1)
+        self.assertIn('shapeshiftio_request_duration_seconds_count{endpoint="rate",phase="total"} 1',
+                      metrics.prometheus())
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,43 @@
+# -*- coding: utf-8 -*-
+import io
+import json
+import unittest
+
+from shapeshiftio.jsonstream import iter_json_array
+
+DOCUMENT = [{"inputTXID": "ab", "note": u"café € \U0001f680", "amount": 12345.678},
+            -0.5, 1e-07, 123456789012345678, [1, [2, 3]], "", True, None, 7]
+
+
+class IterJsonArrayTest(unittest.TestCase):
+    def _parse(self, text, chunk_size):
+        return list(iter_json_array(io.BytesIO(text.encode("utf-8")), chunk_size))
+
+    def test_every_chunk_size(self):
+        text = json.dumps(DOCUMENT, ensure_ascii=False)
+        # Chunk boundaries fall inside every token, multi-byte character and number at least once.
+        for chunk_size in range(1, len(text.encode("utf-8")) + 2):
+            self.assertEqual(self._parse(text, chunk_size), DOCUMENT, chunk_size)
+
+    def test_number_split_across_reads(self):
+        self.assertEqual(self._parse("[123,45678]", 6), [123, 45678])
+        self.assertEqual(self._parse("[1.5e10]", 4), [1.5e10])
+
+    def test_whitespace_and_empty_arrays(self):
+        self.assertEqual(self._parse(" [ ] ", 1), [])
+        self.assertEqual(self._parse("\n[ 1 ,\n 2 ]\n", 1), [1, 2])
+
+    def test_error_object_raises_with_its_text(self):
+        with self.assertRaises(ValueError) as raised:
+            self._parse('{"error": "Invalid API key"}', 4)
+        self.assertIn("Invalid API key", str(raised.exception))
+
+    def test_malformed_array(self):
+        with self.assertRaises(ValueError):
+            self._parse("[1 2]", 1)
+        with self.assertRaises(ValueError):
+            self._parse("[1, 2", 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,38 @@
+import unittest
+
+from shapeshiftio.mockserver import MockShapeShiftServer
+
+
+class MockShapeShiftServerTest(unittest.TestCase):
+    def setUp(self):
+        self.server = MockShapeShiftServer()
+
+    def tearDown(self):
+        self.server._server.server_close()
+
+    def test_arguments_are_checked_before_dispatch(self):
+        self.assertEqual(self.server.handle("GET", "/rate", None), (200, {"error": "Missing parameters"}))
+        self.assertEqual(self.server.handle("GET", "/txbyaddress/addr", None), (200, {"error": "Missing parameters"}))
+        self.assertEqual(self.server.handle("GET", "/rate/btc_eth/extra", None)[0], 404)
+        self.assertEqual(self.server.handle("GET", "/rate/btc_eth", None)[1]["pair"], "btc_eth")
+        self.assertEqual(len(self.server.handle("GET", "/recenttx", None)[1]), 5)
+
+    def test_bad_arguments_get_an_error_payload(self):
+        self.assertEqual(self.server.handle("GET", "/recenttx/abc", None), (200, {"error": "Invalid number of results"}))
+        self.assertEqual(self.server.handle("POST", "/sendamount", {"pair": "btc_eth", "amount": "x"}),
+                         (200, {"error": "Invalid amount"}))
+
+    def test_handler_bugs_are_not_hidden(self):
+        def broken(mock, pair):
+            raise TypeError("bug in the handler")
+        self.server._get_handlers = dict(MockShapeShiftServer._get_handlers, rate=broken)
+        with self.assertRaises(TypeError):
+            self.server.handle("GET", "/rate/btc_eth", None)
+
+    def test_error_rate(self):
+        self.server.error_rate = 1.0
+        self.assertEqual(self.server.handle("GET", "/rate/btc_eth", None)[0], 500)
+
+
+if __name__ == "__main__":
+    unittest.main()
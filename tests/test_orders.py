@@ -0,0 +1,87 @@
+import os
+import shutil
+import tempfile
+import threading
+import time
+import unittest
+
+from shapeshiftio import OrderManager, ShapeShiftIO
+from shapeshiftio.mockserver import MockShapeShiftServer
+
+# Moves every address one step along on each event: no_deposits -> received -> complete.
+NEXT_STATUS = {"no_deposits": "received", "received": "complete"}
+
+
+class OrderManagerTest(unittest.TestCase):
+    def setUp(self):
+        self.server = MockShapeShiftServer().start()
+        self.api = ShapeShiftIO(url_base=self.server.url)
+        self.directory = tempfile.mkdtemp()
+
+    def tearDown(self):
+        self.server.stop()
+        shutil.rmtree(self.directory)
+
+    def _place(self, manager):
+        response = manager.place({"pair": "btc_eth", "amount": "1", "withdrawal": "0xabc"})
+        return response["success"]["deposit"]
+
+    def test_order_lifecycle(self):
+        manager = OrderManager(url_store=self.api, idle_interval=0.02, received_interval=0.02)
+        deposit = self._place(manager)
+        statuses = []
+        for event in manager.events():
+            statuses.append((event.old_status, event.status))
+            if event.status in NEXT_STATUS:
+                self.server.set_status(deposit, NEXT_STATUS[event.status])
+        self.assertEqual(statuses, [(None, "no_deposits"), ("no_deposits", "received"), ("received", "complete")])
+        manager.close()
+
+    def test_expired_order_is_cancelled(self):
+        self.server.order_ttl = 0.5
+        manager = OrderManager(url_store=self.api, idle_interval=0.1, expiry_grace=0.1, received_interval=0.1)
+        deposit = self._place(manager)
+        events = list(manager.events())
+        self.assertEqual(events[-1].status, "cancelled")
+        self.assertEqual(self.server.orders[deposit]["status"], "failed")
+        manager.close()
+
+    def test_state_survives_restart(self):
+        path = os.path.join(self.directory, "orders.sqlite")
+        manager = OrderManager(path, url_store=self.api, idle_interval=0.02)
+        deposit = self._place(manager)
+        manager.close()
+
+        self.server.set_status(deposit, "complete")
+        manager = OrderManager(path, url_store=self.api, idle_interval=0.02)
+        self.assertEqual(len(manager), 1)
+        self.assertEqual([event.status for event in manager.events()], ["complete"])
+        manager.close()
+
+        self.assertEqual(len(OrderManager(path, url_store=self.api)), 0)
+
+    def test_does_not_spin_while_workers_are_busy(self):
+        self.server.latency = 0.2
+        manager = OrderManager(url_store=self.api, workers=2, idle_interval=0.01)
+        for i in range(20):
+            manager.track("deposit%d" % i, time.time() + 600)
+        timer = threading.Timer(1.0, manager.stop)
+        timer.start()
+        cpu = time.process_time()
+        for _ in manager.events():
+            pass
+        self.assertLess(time.process_time() - cpu, 0.5)
+        manager.close()
+
+    def test_stop_before_events(self):
+        manager = OrderManager(url_store=self.api, idle_interval=0.02)
+        manager.track("deposit", time.time() + 600)
+        manager.stop()
+        self.assertEqual(list(manager.events()), [])
+        self.assertEqual(self.server.requests, 0)
+        self.assertEqual(next(manager.events()).status, "no_deposits")
+        manager.close()
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,26 @@
+import os
+import subprocess
+import sys
+import unittest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+class LazyImportTest(unittest.TestCase):
+    def _run(self, statement):
+        return subprocess.check_output([sys.executable, "-c", statement], cwd=ROOT).decode("ascii").strip()
+
+    def test_import_loads_no_submodule(self):
+        loaded = self._run("import sys, shapeshiftio; print(sorted(m for m in sys.modules if m.startswith('shapeshiftio.')))")
+        self.assertEqual(loaded, "[]")
+
+    def test_exported_names_and_submodules_resolve(self):
+        import shapeshiftio
+        self.assertIs(shapeshiftio.rate, shapeshiftio.shapeshiftio.rate)
+        self.assertTrue(hasattr(shapeshiftio.shapeshiftio, "default_cache"))
+        self.assertIs(shapeshiftio.pool.ConnectionPool, shapeshiftio.ConnectionPool)
+        self.assertFalse(hasattr(shapeshiftio, "nosuchname"))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,156 @@
+import socket
+import threading
+import time
+import unittest
+
+try:
+    from urllib2 import HTTPError
+except ImportError:
+    from urllib.error import HTTPError
+
+from shapeshiftio import ConnectionPool, ShapeShiftIO
+from shapeshiftio.mockserver import MockShapeShiftServer
+
+
+class RawServer(object):
+    """
+    Bare socket HTTP server for failures MockShapeShiftServer cannot produce. Every request is
+    answered with "ok" and then, depending on the mode, the connection is handled as follows:
+
+        drop_posts         POSTs are read and the connection closed without an answer.
+        close_after_reply  the connection is closed right after every answer (without announcing it).
+    """
+    def __init__(self, mode):
+        self.mode = mode
+        self.requests = []
+        self.connections = 0
+        self._sock = socket.socket()
+        self._sock.bind(("127.0.0.1", 0))
+        self._sock.listen(16)
+        self.url = "http://127.0.0.1:%d" % self._sock.getsockname()[1]
+        thread = threading.Thread(target=self._accept)
+        thread.daemon = True
+        thread.start()
+
+    def close(self):
+        self._sock.close()
+
+    def _accept(self):
+        while True:
+            try:
+                conn, _ = self._sock.accept()
+            except socket.error:
+                return
+            self.connections += 1
+            thread = threading.Thread(target=self._serve, args=(conn,))
+            thread.daemon = True
+            thread.start()
+
+    def _serve(self, conn):
+        try:
+            while True:
+                data = conn.recv(65536)
+                if not data:
+                    return
+                self.requests.append(data.split(b" ", 1)[0].decode("ascii"))
+                if self.mode == "drop_posts" and data.startswith(b"POST"):
+                    return
+                conn.sendall(b"HTTP/1.1 200 OK\r\nContent-Length: 2\r\n\r\nok")
+                if self.mode == "close_after_reply":
+                    return
+        finally:
+            conn.close()
+
+
+class ConnectionPoolTest(unittest.TestCase):
+    def setUp(self):
+        self.server = MockShapeShiftServer().start()
+        self.pool = ConnectionPool()
+
+    def tearDown(self):
+        self.pool.close()
+        self.server.stop()
+
+    def test_connection_is_reused(self):
+        for _ in range(5):
+            self.assertIn(b"btc_eth", self.pool.request("GET", self.server.url + "/rate/btc_eth"))
+        self.assertEqual(list(self.pool._open.values()), [1])
+
+    def test_http_error_keeps_pool_usable(self):
+        with self.assertRaises(HTTPError) as raised:
+            self.pool.request("GET", self.server.url + "/nosuchendpoint")
+        self.assertEqual(raised.exception.code, 404)
+        self.assertIn(b"Not found", raised.exception.read())
+        self.assertIn(b"btc_eth", self.pool.request("GET", self.server.url + "/rate/btc_eth"))
+
+    def test_maxsize_bounds_concurrent_connections(self):
+        pool = ConnectionPool(maxsize=2)
+        self.server.latency = 0.05
+        threads = [threading.Thread(target=pool.request, args=("GET", self.server.url + "/rate/btc_eth"))
+                   for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(list(pool._open.values()), [2])
+        pool.close()
+
+    def test_waiting_for_a_connection_honours_the_timeout(self):
+        pool = ConnectionPool(maxsize=1)
+        self.server.latency = 1.0
+        busy = threading.Thread(target=pool.request, args=("GET", self.server.url + "/rate/btc_eth"))
+        busy.start()
+        time.sleep(0.1)
+        start = time.time()
+        with self.assertRaises(socket.timeout):
+            pool.request("GET", self.server.url + "/rate/btc_eth", timeout=0.2)
+        self.assertLess(time.time() - start, 0.6)
+        busy.join()
+        pool.close()
+
+    def test_client_uses_pool(self):
+        api = ShapeShiftIO(url_base=self.server.url, transport=self.pool)
+        self.assertEqual(api.rate("btc_eth")["pair"], "btc_eth")
+        self.assertEqual(api.send_amount({"pair": "btc_eth", "amount": "1"})["success"]["pair"], "btc_eth")
+
+
+class StaleConnectionTest(unittest.TestCase):
+    def test_get_is_resent_on_stale_connection(self):
+        server = RawServer("close_after_reply")
+        pool = ConnectionPool()
+        try:
+            self.assertEqual(pool.request("GET", server.url + "/rate/btc_eth"), b"ok")
+            time.sleep(0.05)
+            self.assertEqual(pool.request("GET", server.url + "/rate/btc_eth"), b"ok")
+            self.assertEqual(server.connections, 2)
+        finally:
+            pool.close()
+            server.close()
+
+    def test_post_is_never_resent(self):
+        server = RawServer("drop_posts")
+        pool = ConnectionPool()
+        try:
+            self.assertEqual(pool.request("GET", server.url + "/rate/btc_eth"), b"ok")
+            with self.assertRaises(Exception):
+                pool.request("POST", server.url + "/shift", b"pair=btc_eth")
+            self.assertEqual(server.requests.count("POST"), 1)
+        finally:
+            pool.close()
+            server.close()
+
+    def test_post_skips_connection_closed_while_idle(self):
+        server = RawServer("close_after_reply")
+        pool = ConnectionPool()
+        try:
+            self.assertEqual(pool.request("GET", server.url + "/rate/btc_eth"), b"ok")
+            time.sleep(0.05)
+            self.assertEqual(pool.request("POST", server.url + "/shift", b"pair=btc_eth"), b"ok")
+            self.assertEqual(server.requests.count("POST"), 1)
+        finally:
+            pool.close()
+            server.close()
+
+
+if __name__ == "__main__":
+    unittest.main()
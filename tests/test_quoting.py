@@ -0,0 +1,68 @@
+import math
+import unittest
+
+from shapeshiftio import MarketSnapshot, ShapeShiftIO, quote_batch
+from shapeshiftio import quoting
+from shapeshiftio.mockserver import MockShapeShiftServer
+from shapeshiftio.quoting import ABOVE_LIMIT, BELOW_MIN, OK, UNKNOWN_PAIR
+from shapeshiftio.snapshot import build_table, empty_table
+
+TABLE = build_table([{"pair": "btc_eth", "rate": 15.0, "limit": 2.0, "min": 0.01, "minerFee": 0.003},
+                     {"pair": "eth_btc", "rate": 0.066, "limit": 30.0, "min": 0.2, "minerFee": 0.0005},
+                     {"pair": "doge_btc", "rate": 0.000002, "limit": 0.0, "min": 10.0, "minerFee": 0.0005}])
+
+PAIRS = ["btc_eth", "btc_eth", "btc_eth", "eth_btc", "nosuch_pair", "doge_btc", "doge_btc", "eth_btc"]
+AMOUNTS = [1.0, 0.001, 3.0, 0.5, 1.0, 100.0, 1000000.0, 25.0]
+STATUS = [OK, BELOW_MIN, ABOVE_LIMIT, OK, UNKNOWN_PAIR, BELOW_MIN, OK, OK]
+
+
+def _values(column):
+    return [None if math.isnan(value) else round(float(value), 12) for value in column]
+
+
+class QuoteBatchTest(unittest.TestCase):
+    def test_array_path(self):
+        batch = quoting._quote_array(TABLE, PAIRS, AMOUNTS, 10.0)
+        self.assertEqual(list(batch.status), STATUS)
+        self.assertEqual(list(batch.needs_binding), [0, 0, 0, 0, 0, 0, 1, 1])
+        self.assertAlmostEqual(batch.output[0], 14.997)
+        self.assertTrue(math.isnan(batch.rate[4]))
+        self.assertEqual(batch.ok(), [0, 3, 6, 7])
+        self.assertEqual(batch.row(3)["pair"], "eth_btc")
+
+    @unittest.skipIf(quoting.numpy is None, "needs NumPy")
+    def test_numpy_and_array_paths_agree(self):
+        for table in (TABLE, empty_table()):
+            for bind_above in (None, 10.0):
+                vectorized = quoting._quote_numpy(table, PAIRS, AMOUNTS, bind_above)
+                looped = quoting._quote_array(table, PAIRS, AMOUNTS, bind_above)
+                for name in ("amount", "rate", "output", "miner_fee", "min", "limit"):
+                    self.assertEqual(_values(getattr(vectorized, name)), _values(getattr(looped, name)), name)
+                self.assertEqual(list(vectorized.status), list(looped.status))
+                self.assertEqual(list(vectorized.needs_binding), list(looped.needs_binding))
+                self.assertEqual(vectorized.ok(), looped.ok())
+
+    def test_lengths_must_match(self):
+        snapshot = MarketSnapshot(ttl=3600)
+        snapshot.load([{"pair": "btc_eth", "rate": 15.0, "limit": 2.0, "min": 0.01, "minerFee": 0.003}])
+        with self.assertRaises(ValueError):
+            quote_batch(snapshot, ["btc_eth"], [])
+
+    def test_bind(self):
+        with MockShapeShiftServer() as server:
+            api = ShapeShiftIO(url_base=server.url)
+            snapshot = MarketSnapshot()
+            batch = quote_batch(snapshot, ["btc_eth", "btc_ltc", "eth_btc", "btc_nosuch"], [0.1, 0.5, 2.0, 1.0],
+                                bind_above=0.5, url_store=api)
+            self.assertEqual(list(batch.needs_binding), [0, 1, 1, 0])
+            results = batch.bind(url_store=api)
+            self.assertEqual(sorted(results), [1, 2])
+            self.assertEqual(results[1]["success"]["pair"], "btc_ltc")
+            self.assertEqual(results[1]["success"]["withdrawalAmount"], "%.8f" % batch.output[1])
+            self.assertEqual(sorted(batch.bind([0], url_store=api)), [0])
+            # One /marketinfo/ call for the quotes, one send_amount per bound row.
+            self.assertEqual(server.requests, 4)
+
+
+if __name__ == "__main__":
+    unittest.main()
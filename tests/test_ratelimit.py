@@ -0,0 +1,81 @@
+import threading
+import time
+import unittest
+
+from shapeshiftio import RateLimiter, ShapeShiftIO
+from shapeshiftio.mockserver import MockShapeShiftServer
+from shapeshiftio.ratelimit import PRIORITY_INFO, PRIORITY_ORDER, PRIORITY_POST
+
+
+class RateLimiterTest(unittest.TestCase):
+    def test_higher_priority_lanes_are_served_first(self):
+        limiter = RateLimiter(rate=10, burst=1)
+        limiter.acquire()
+        served = []
+
+        def request(priority):
+            limiter.acquire(priority)
+            served.append(priority)
+        threads = []
+        for priority in (PRIORITY_INFO, PRIORITY_POST, PRIORITY_ORDER):
+            thread = threading.Thread(target=request, args=(priority,))
+            thread.start()
+            threads.append(thread)
+            time.sleep(0.01)
+        self.assertEqual(limiter.queue_depth, 3)
+        for thread in threads:
+            thread.join()
+        self.assertEqual(served, [PRIORITY_ORDER, PRIORITY_POST, PRIORITY_INFO])
+
+    def test_burst_then_sustained_rate(self):
+        limiter = RateLimiter(rate=20, burst=3)
+        start = time.time()
+        for _ in range(5):
+            limiter.acquire()
+        self.assertGreaterEqual(time.time() - start, 0.09)
+
+    def test_stats(self):
+        limiter = RateLimiter(rate=20, burst=1)
+        for _ in range(3):
+            limiter.acquire(PRIORITY_POST)
+        limiter.acquire(PRIORITY_ORDER)
+        stats = limiter.stats()
+        self.assertEqual(stats["queue_depth"], 0)
+        self.assertEqual(stats["lanes"][PRIORITY_POST]["acquired"], 3)
+        self.assertEqual(stats["lanes"][PRIORITY_ORDER]["acquired"], 1)
+        self.assertGreater(stats["lanes"][PRIORITY_POST]["max_wait"], 0.03)
+        self.assertAlmostEqual(stats["lanes"][PRIORITY_POST]["mean_wait"],
+                               stats["lanes"][PRIORITY_POST]["total_wait"] / 3)
+
+    def test_interrupted_wait_leaves_no_ticket(self):
+        limiter = RateLimiter(rate=20, burst=1)
+        limiter.acquire()
+
+        def interrupted(timeout=None):
+            raise KeyboardInterrupt()
+        limiter._cond.wait = interrupted
+        with self.assertRaises(KeyboardInterrupt):
+            limiter.acquire()
+        del limiter._cond.wait
+        self.assertEqual(limiter.queue_depth, 0)
+        limiter.acquire()
+
+    def test_invalid_settings(self):
+        with self.assertRaises(ValueError):
+            RateLimiter(rate=0)
+        with self.assertRaises(ValueError):
+            RateLimiter(burst=0)
+
+    def test_client_requests_use_their_lane(self):
+        limiter = RateLimiter(rate=100, burst=10)
+        with MockShapeShiftServer() as server:
+            api = ShapeShiftIO(url_base=server.url, limiter=limiter)
+            api.rate("btc_eth")
+            api.send_amount({"pair": "btc_eth", "amount": "1"})
+        lanes = limiter.stats()["lanes"]
+        self.assertEqual(lanes[PRIORITY_INFO]["acquired"], 1)
+        self.assertEqual(lanes[PRIORITY_ORDER]["acquired"], 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,94 @@
+# -*- coding: utf-8 -*-
+import sys
+import unittest
+from decimal import Decimal
+
+from shapeshiftio import MarketInfo, Rate, ShiftResult, TypedShapeShiftIO
+from shapeshiftio import fastjson
+from shapeshiftio.mockserver import MockShapeShiftServer
+from shapeshiftio.records import decode
+
+
+class RecordTest(unittest.TestCase):
+    def test_fields_are_converted_to_decimal(self):
+        rate = Rate({"pair": "btc_eth", "rate": "70.1234"})
+        self.assertEqual(rate.rate, Decimal("70.1234"))
+        # Floats go through their shortest repr.
+        self.assertEqual(Rate({"pair": "btc_eth", "rate": 0.1}).rate, Decimal("0.1"))
+
+    def test_lazy_fields_are_converted_on_first_read(self):
+        info = MarketInfo({"pair": "btc_eth", "rate": 15.0, "limit": 1.5, "min": 0.001, "minerFee": 0.003})
+        self.assertEqual(info._miner_fee, 0.003)
+        self.assertEqual(info.miner_fee, Decimal("0.003"))
+        self.assertIs(type(info._miner_fee), Decimal)
+        self.assertIsNone(info.max_limit)
+
+    def test_send_amount_success_wrapper_is_removed(self):
+        result = ShiftResult({"success": {"pair": "btc_eth", "depositAmount": "0.5", "expiration": 1500000000000,
+                                          "deposit": "1abc"}})
+        self.assertEqual(result.pair, "btc_eth")
+        self.assertEqual(result.deposit_amount, Decimal("0.5"))
+        self.assertEqual(result.expiration, 1500000000000)
+        self.assertEqual(ShiftResult({"deposit": "1abc"}).deposit, "1abc")
+
+    def test_errors_are_decoded(self):
+        self.assertEqual(Rate({"error": "Unknown pair"}).error, "Unknown pair")
+        self.assertIsNone(Rate({"pair": "btc_eth", "rate": "1"}).error)
+
+    def test_equality_and_hashing(self):
+        first = Rate({"pair": "btc_eth", "rate": "1.5"})
+        self.assertEqual(first, Rate({"pair": "btc_eth", "rate": "1.50"}))
+        self.assertNotEqual(first, Rate({"pair": "btc_eth", "rate": "2"}))
+        with self.assertRaises(TypeError):
+            hash(first)
+
+    def test_decode_lists(self):
+        records = decode("market_info", [{"pair": "btc_eth", "rate": 1}, {"pair": "eth_btc", "rate": 2}])
+        self.assertEqual([record.pair for record in records], ["btc_eth", "eth_btc"])
+
+    def test_typed_client(self):
+        with MockShapeShiftServer() as server:
+            api = TypedShapeShiftIO(url_base=server.url)
+            self.assertIsInstance(api.rate("btc_eth").rate, Decimal)
+            order = api.send_amount({"pair": "btc_eth", "amount": "1", "withdrawal": "0xabc"})
+            self.assertEqual(order.withdrawal_amount, Decimal("1.00000000"))
+            self.assertEqual(api.tx_status(order.deposit).status, "no_deposits")
+
+
+class FastJsonTest(unittest.TestCase):
+    def setUp(self):
+        self.saved = fastjson.backend, fastjson._loads
+
+    def tearDown(self):
+        fastjson.backend, fastjson._loads = self.saved
+
+    def _select(self):
+        fastjson.backend = fastjson._loads = None
+        return fastjson.loads(b'{"rate": "1.5", "list": [1, 2.5, null, true], "text": "caf\\u00e9"}')
+
+    def test_stdlib_fallback_without_orjson(self):
+        saved = sys.modules.get("orjson")
+        sys.modules["orjson"] = None    # makes "import orjson" raise ImportError
+        try:
+            value = self._select()
+        finally:
+            if saved is None:
+                del sys.modules["orjson"]
+            else:
+                sys.modules["orjson"] = saved
+        self.assertEqual(fastjson.backend, "json")
+        self.assertEqual(value, {"rate": "1.5", "list": [1, 2.5, None, True], "text": u"café"})
+
+    def test_backends_agree(self):
+        try:
+            import orjson  # noqa: F401
+        except ImportError:
+            self.skipTest("orjson is not installed")
+        value = self._select()
+        self.assertEqual(fastjson.backend, "orjson")
+        self.assertEqual(value, {"rate": "1.5", "list": [1, 2.5, None, True], "text": u"café"})
+        self.assertEqual(fastjson.loads("[1]"), [1])
+
+
+if __name__ == "__main__":
+    unittest.main()
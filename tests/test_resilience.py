@@ -0,0 +1,98 @@
+import socket
+import threading
+import time
+import unittest
+
+from shapeshiftio import CircuitOpenError, Resilience, ShapeShiftIO
+from shapeshiftio.mockserver import MockShapeShiftServer
+
+
+class ResilienceTest(unittest.TestCase):
+    def test_transient_get_errors_are_retried(self):
+        resilience = Resilience(backoff=0.001, hedge=False)
+        attempts = []
+
+        def fetch():
+            attempts.append(1)
+            if len(attempts) < 3:
+                raise socket.timeout("timed out")
+            return "value"
+        self.assertEqual(resilience.get("rate", "url", fetch), "value")
+        self.assertEqual(resilience.retried, 2)
+
+    def test_posts_are_not_retried(self):
+        resilience = Resilience(backoff=0.001)
+        attempts = []
+
+        def send():
+            attempts.append(1)
+            raise socket.timeout("timed out")
+        with self.assertRaises(socket.timeout):
+            resilience.call("shift", send)
+        self.assertEqual(len(attempts), 1)
+
+    def test_open_circuit_serves_last_good_value(self):
+        resilience = Resilience(retries=0, failure_threshold=2, reset_timeout=60, hedge=False)
+        self.assertEqual(resilience.get("rate", "url", lambda: "good"), "good")
+
+        def fail():
+            raise socket.timeout("timed out")
+        with self.assertRaises(socket.timeout):
+            resilience.get("rate", "url", fail)
+        self.assertEqual(resilience.get("rate", "url", fail), "good")
+        self.assertEqual(resilience.breaker("rate").state, "open")
+        with self.assertRaises(CircuitOpenError):
+            resilience.get("rate", "other-url", fail)
+
+    def test_unhedged_gets_run_on_the_callers_thread(self):
+        resilience = Resilience(hedge=False)
+        threads = []
+        resilience.get("rate", "url", lambda: threads.append(threading.current_thread()))
+        self.assertEqual(threads, [threading.current_thread()])
+
+    def _warmed_up(self, **options):
+        resilience = Resilience(hedge_min_samples=5, hedge_budget=1.0, **options)
+        for _ in range(5):
+            resilience.get("rate", "url", lambda: time.sleep(0.01))
+        return resilience
+
+    def test_hedge_answers_for_a_slow_original(self):
+        resilience = self._warmed_up()
+
+        def fetch():
+            if threading.current_thread().name == "shapeshiftio-hedged-get":
+                time.sleep(1.0)
+                return "slow original"
+            return "hedged"
+        start = time.time()
+        self.assertEqual(resilience.get("rate", "url", fetch), "hedged")
+        self.assertLess(time.time() - start, 0.5)
+        self.assertEqual((resilience.hedged, resilience.hedge_wins), (1, 1))
+
+    def test_hedge_rescues_a_stalled_original(self):
+        resilience = self._warmed_up(retries=0)
+
+        def fetch():
+            if threading.current_thread().name == "shapeshiftio-hedged-get":
+                time.sleep(0.3)
+                raise socket.timeout("timed out")
+            time.sleep(0.5)
+            return "hedged"
+        self.assertEqual(resilience.get("rate", "url", fetch), "hedged")
+        self.assertEqual(resilience.hedge_wins, 1)
+
+    def test_fast_original_is_not_hedged(self):
+        resilience = self._warmed_up()
+        self.assertEqual(resilience.get("rate", "url", lambda: "original"), "original")
+        self.assertEqual(resilience.hedged, 0)
+
+    def test_client_integration(self):
+        with MockShapeShiftServer(error_rate=0.5, seed=1) as server:
+            api = ShapeShiftIO(url_base=server.url, resilience=Resilience(retries=8, backoff=0.001,
+                                                                          failure_threshold=100))
+            for _ in range(5):
+                self.assertEqual(api.rate("btc_eth")["pair"], "btc_eth")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,75 @@
+import unittest
+
+from shapeshiftio import MarketSnapshot, RouteGraph, ShapeShiftIO
+from shapeshiftio.mockserver import MockShapeShiftServer
+from shapeshiftio.snapshot import build_table
+
+
+def market(pair, rate, limit=1000.0, minimum=0.0, fee=0.0):
+    return {"pair": pair, "rate": rate, "limit": limit, "min": minimum, "minerFee": fee}
+
+
+MARKETS = [market("btc_xmr", 100.0, fee=0.1), market("btc_eth", 15.0, fee=0.003),
+           market("eth_xmr", 7.0, limit=50.0, fee=0.001), market("xmr_btc", 0.0095)]
+
+
+class RouteGraphTest(unittest.TestCase):
+    def test_two_hops_beat_the_direct_pair_after_fees(self):
+        graph = RouteGraph(build_table(MARKETS))
+        route = graph.best_route("BTC", "XMR", 1.0)
+        self.assertEqual(route.coins, ["btc", "eth", "xmr"])
+        self.assertEqual(route.pairs, ["btc_eth", "eth_xmr"])
+        self.assertAlmostEqual(route.amount_out, (1.0 * 15.0 - 0.003) * 7.0 - 0.001)
+        direct = graph.quote_path(["btc", "xmr"], 1.0)
+        self.assertAlmostEqual(direct.amount_out, 99.9)
+        self.assertGreater(route.amount_out, direct.amount_out)
+        self.assertEqual(graph.best_rate("btc", "xmr").pairs, ["btc_eth", "eth_xmr"])
+
+    def test_direct_pair_wins_when_the_fees_outweigh_the_better_rate(self):
+        graph = RouteGraph(build_table(MARKETS[:1] + [market("btc_eth", 15.0, fee=0.003),
+                                                      market("eth_xmr", 7.0, fee=10.0)]))
+        self.assertEqual(graph.best_route("btc", "xmr", 1.0).pairs, ["btc_xmr"])
+
+    def test_min_and_limit_reject_hops(self):
+        graph = RouteGraph(build_table(MARKETS))
+        # 4 btc become ~60 eth, above the eth_xmr limit of 50.
+        self.assertEqual(graph.best_route("btc", "xmr", 4.0).pairs, ["btc_xmr"])
+        self.assertIsNone(graph.quote_path(["btc", "eth", "xmr"], 4.0))
+        graph = RouteGraph(build_table([market("btc_xmr", 100.0, minimum=0.5)]))
+        self.assertIsNone(graph.best_route("btc", "xmr", 0.1))
+        self.assertIsNone(graph.best_route("btc", "nosuchcoin", 1.0))
+
+    def test_update_touches_only_changed_edges(self):
+        graph = RouteGraph(build_table(MARKETS))
+        version = graph.version
+        self.assertEqual(graph.update(build_table(MARKETS)), 0)
+        self.assertEqual(graph.version, version)
+
+        changed = list(MARKETS)
+        changed[1] = market("btc_eth", 16.0, fee=0.003)
+        self.assertEqual(graph.update(build_table(changed)), 1)
+        self.assertEqual(graph.version, version + 1)
+        self.assertAlmostEqual(graph.quote_path(["btc", "eth"], 1.0).amount_out, 15.997)
+
+    def test_delisted_pairs_are_deactivated(self):
+        graph = RouteGraph(build_table(MARKETS))
+        self.assertEqual(graph.update(build_table(MARKETS[:1] + MARKETS[2:])), 1)
+        self.assertIsNone(graph.quote_path(["btc", "eth"], 1.0))
+        self.assertEqual(graph.best_route("btc", "xmr", 1.0).pairs, ["btc_xmr"])
+        # Listed again with the same numbers: reactivated.
+        self.assertEqual(graph.update(build_table(MARKETS)), 1)
+        self.assertEqual(graph.best_route("btc", "xmr", 1.0).pairs, ["btc_eth", "eth_xmr"])
+
+    def test_sync_with_a_snapshot(self):
+        with MockShapeShiftServer() as server:
+            api = ShapeShiftIO(url_base=server.url)
+            snapshot = MarketSnapshot()
+            graph = RouteGraph.from_snapshot(snapshot, api)
+            self.assertEqual(len(graph.pairs), 90)
+            self.assertEqual(graph.sync(snapshot, api), 0)
+            self.assertEqual(server.requests, 1)
+        self.assertIsNotNone(graph.best_route("btc", "eth", 0.1))
+
+
+if __name__ == "__main__":
+    unittest.main()
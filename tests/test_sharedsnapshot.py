@@ -0,0 +1,64 @@
+import os
+import unittest
+
+try:
+    from multiprocessing import shared_memory
+except ImportError:
+    shared_memory = None
+
+from shapeshiftio import SharedMarketSnapshot, ShapeShiftIO
+from shapeshiftio.mockserver import MockShapeShiftServer
+
+RECORDS = [{"pair": "btc_eth", "rate": 15.0, "limit": 1.5, "min": 0.001, "minerFee": 0.003},
+           {"pair": "eth_btc", "rate": 0.066, "limit": 25.0, "min": 0.02, "minerFee": 0.0005}]
+
+
+@unittest.skipIf(shared_memory is None, "needs multiprocessing.shared_memory")
+class SharedMarketSnapshotTest(unittest.TestCase):
+    def setUp(self):
+        self.name = "shapeshiftio-test-%d" % os.getpid()
+        self.owner = SharedMarketSnapshot(self.name, create=True, capacity=128)
+        self.worker = SharedMarketSnapshot(self.name)
+
+    def tearDown(self):
+        self.worker.close()
+        self.owner.close()
+
+    def test_workers_read_what_the_owner_publishes(self):
+        self.assertIsNone(self.worker.rate("btc_eth"))
+        self.owner.publish(RECORDS)
+        self.assertEqual(self.worker.rate("btc_eth"), {"pair": "btc_eth", "rate": "15.0"})
+        self.assertEqual(self.worker.limit("eth_btc"), {"pair": "eth_btc", "limit": "25.0", "min": "0.02"})
+        self.assertIsNone(self.worker.rate("btc_ltc"))
+        self.assertEqual(len(self.worker), 2)
+
+    def test_workers_do_not_copy_the_table(self):
+        self.owner.publish(RECORDS)
+        self.worker.ensure_fresh()
+        self.worker.rate("btc_eth")
+        self.assertIsNone(self.worker._table)
+        # Lookups and the table share the names decoded once per publish.
+        decoded = self.worker._decoded
+        table = self.worker.table
+        self.assertIs(table.index, decoded[2])
+        self.assertEqual(list(table.rate), [15.0, 0.066])
+        self.owner.publish(RECORDS[:1])
+        self.assertEqual(self.worker.table.pairs, ["btc_eth"])
+        self.assertIsNot(self.worker._decoded, decoded)
+
+    def test_long_pair_names_are_rejected(self):
+        with self.assertRaises(ValueError):
+            self.owner.publish(RECORDS + [{"pair": "x" * 25 + "_btc", "rate": 1.0}])
+
+    def test_client_answers_from_the_segment(self):
+        with MockShapeShiftServer() as server:
+            api = ShapeShiftIO(url_base=server.url, snapshot=self.owner)
+            self.assertEqual(api.rate("btc_eth")["pair"], "btc_eth")
+            self.assertEqual(server.requests, 1)
+            worker = ShapeShiftIO(url_base=server.url, snapshot=self.worker)
+            self.assertEqual(worker.rate("ltc_btc")["pair"], "ltc_btc")
+            self.assertEqual(server.requests, 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,130 @@
+import socket
+import threading
+import time
+import unittest
+
+from shapeshiftio import ConnectionPool, ShapeShiftIO, SingleFlight
+from shapeshiftio.mockserver import MockShapeShiftServer
+
+
+class SingleFlightTest(unittest.TestCase):
+    def test_concurrent_calls_share_one_execution(self):
+        flight = SingleFlight()
+        started = threading.Event()
+        release = threading.Event()
+        calls = []
+
+        def slow():
+            calls.append(1)
+            started.set()
+            release.wait()
+            return "value"
+
+        results = []
+        leader = threading.Thread(target=lambda: results.append(flight.do("key", slow)))
+        leader.start()
+        started.wait()
+        waiters = [threading.Thread(target=lambda: results.append(flight.do("key", slow))) for _ in range(4)]
+        for waiter in waiters:
+            waiter.start()
+        time.sleep(0.05)
+        release.set()
+        for thread in [leader] + waiters:
+            thread.join()
+        self.assertEqual(results, ["value"] * 5)
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(flight.coalesced, 4)
+        self.assertEqual(flight.in_flight(), 0)
+
+    def test_waiter_times_out(self):
+        flight = SingleFlight()
+        release = threading.Event()
+        leader = threading.Thread(target=flight.do, args=("key", release.wait))
+        leader.start()
+        while not flight.in_flight():
+            time.sleep(0.001)
+        start = time.time()
+        with self.assertRaises(socket.timeout):
+            flight.do("key", release.wait, 0.1)
+        self.assertLess(time.time() - start, 0.5)
+        release.set()
+        leader.join()
+
+    def test_exception_is_shared(self):
+        flight = SingleFlight()
+
+        def fail():
+            raise ValueError("boom")
+        with self.assertRaises(ValueError):
+            flight.do("key", fail)
+        self.assertEqual(flight.in_flight(), 0)
+
+
+class CoalescingTest(unittest.TestCase):
+    def setUp(self):
+        self.server = MockShapeShiftServer(latency=0.3).start()
+
+    def tearDown(self):
+        self.server.stop()
+
+    def _in_background(self, api, pair):
+        thread = threading.Thread(target=api.rate, args=(pair,))
+        thread.start()
+        time.sleep(0.1)
+        return thread
+
+    def test_identical_gets_share_a_request(self):
+        api = ShapeShiftIO(url_base=self.server.url)
+        threads = [threading.Thread(target=api.rate, args=("btc_eth",)) for _ in range(5)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(self.server.requests, 1)
+
+    def test_waiter_honours_its_own_timeout(self):
+        self.server.latency = 1.0
+        thread = self._in_background(ShapeShiftIO(url_base=self.server.url, timeout=5), "btc_eth")
+        start = time.time()
+        with self.assertRaises(socket.timeout):
+            ShapeShiftIO(url_base=self.server.url, timeout=0.2).rate("btc_eth")
+        self.assertLess(time.time() - start, 0.6)
+        thread.join()
+
+    def test_clients_with_different_transports_do_not_share(self):
+        first = ShapeShiftIO(url_base=self.server.url, transport=ConnectionPool())
+        second = ShapeShiftIO(url_base=self.server.url, transport=ConnectionPool())
+        thread = self._in_background(first, "btc_eth")
+        second.rate("btc_eth")
+        thread.join()
+        self.assertEqual(self.server.requests, 2)
+
+
+class AsyncSingleFlightTest(unittest.TestCase):
+    def test_abandoned_request_frees_its_slot(self):
+        import asyncio
+        from shapeshiftio import AsyncShapeShiftIO
+
+        def latency(path):
+            return 5.0 if path.startswith("/rate/") else 0.0
+
+        async def scenario(url):
+            api = AsyncShapeShiftIO(url_base=url, concurrency=2)
+            for pair in ("btc_eth", "btc_ltc"):
+                with self.assertRaises(asyncio.TimeoutError):
+                    await api.rate(pair, timeout=0.2)
+            # Both slots were held by the abandoned rate() calls before they were cancelled.
+            limit = await api.limit("btc_eth", timeout=1.0)
+            api.close()
+            return limit
+
+        with MockShapeShiftServer(latency=latency) as server:
+            loop = asyncio.new_event_loop()
+            try:
+                self.assertEqual(loop.run_until_complete(scenario(server.url))["pair"], "btc_eth")
+            finally:
+                loop.close()
+
+
+if __name__ == "__main__":
+    unittest.main()
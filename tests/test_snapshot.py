@@ -0,0 +1,57 @@
+import unittest
+
+from shapeshiftio import MarketSnapshot, ShapeShiftIO
+from shapeshiftio.mockserver import MockShapeShiftServer
+from shapeshiftio.snapshot import build_table
+
+
+def _failing_market_info(mock, pair=""):
+    if pair:
+        return mock._market(pair) or {"error": "Unknown pair"}
+    return {"error": "Service unavailable"}
+
+
+class MarketSnapshotTest(unittest.TestCase):
+    def setUp(self):
+        self.server = MockShapeShiftServer().start()
+
+    def tearDown(self):
+        self.server.stop()
+
+    def test_pairs_are_answered_from_one_call(self):
+        api = ShapeShiftIO(url_base=self.server.url, snapshot=MarketSnapshot())
+        self.assertEqual(api.rate("btc_eth")["pair"], "btc_eth")
+        self.assertEqual(api.limit("eth_ltc")["pair"], "eth_ltc")
+        self.assertEqual(api.market_info("ltc_btc")["pair"], "ltc_btc")
+        self.assertEqual(self.server.requests, 1)
+        self.assertEqual(len(api.snapshot), 90)
+
+    def test_unlisted_pair_falls_through(self):
+        api = ShapeShiftIO(url_base=self.server.url, snapshot=MarketSnapshot())
+        self.assertIn("error", api.rate("btc_nosuchcoin"))
+        self.assertEqual(self.server.requests, 2)
+
+    def test_url_is_the_called_api(self):
+        api = ShapeShiftIO(url_base=self.server.url, snapshot=MarketSnapshot())
+        api.rate("btc_eth")
+        self.assertEqual(api.url, self.server.url + "/rate/btc_eth")
+        api.snapshot.fetched_at = None
+        api.limit("btc_eth")
+        self.assertEqual(api.url, self.server.url + "/limit/btc_eth")
+
+    def test_error_response_falls_through_to_pair_request(self):
+        self.server._get_handlers = dict(MockShapeShiftServer._get_handlers, marketinfo=_failing_market_info)
+        api = ShapeShiftIO(url_base=self.server.url, snapshot=MarketSnapshot())
+        self.assertEqual(api.rate("btc_eth")["pair"], "btc_eth")
+        self.assertEqual(len(api.snapshot), 0)
+        # The failed refresh is not repeated before the ttl has passed.
+        self.assertEqual(api.rate("btc_ltc")["pair"], "btc_ltc")
+        self.assertEqual(self.server.requests, 3)
+
+    def test_build_table_rejects_error_response(self):
+        with self.assertRaises(ValueError):
+            build_table({"error": "Service unavailable"})
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,65 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+from shapeshiftio import ShapeShiftIO, TxSync
+from shapeshiftio.mockserver import MockShapeShiftServer
+
+
+class TxSyncTest(unittest.TestCase):
+    def setUp(self):
+        self.server = MockShapeShiftServer(transactions=20).start()
+        self.api = ShapeShiftIO(url_base=self.server.url)
+        self.directory = tempfile.mkdtemp()
+        self.path = os.path.join(self.directory, "tx.sqlite")
+
+    def tearDown(self):
+        self.server.stop()
+        shutil.rmtree(self.directory)
+
+    def test_only_new_and_changed_records_across_runs(self):
+        sync = TxSync(self.path, url_store=self.api, batch_size=7)
+        self.assertEqual(len(sync.sync("key")), 20)
+        self.assertEqual(sync.sync("key"), [])
+        sync.close()
+
+        transactions = self.server._transactions
+        transactions[3] = dict(transactions[3], status="failed")
+        transactions.append(dict(transactions[0], inputTXID="ff" * 32))
+        sync = TxSync(self.path, url_store=self.api)
+        changed = sync.sync("key")
+        self.assertEqual([record["inputTXID"] for record in changed],
+                         [transactions[3]["inputTXID"], "ff" * 32])
+        self.assertEqual(changed[0]["status"], "failed")
+        # Another api key has a state of its own.
+        self.assertEqual(len(sync.sync("otherkey")), 21)
+        sync.close()
+
+    def test_interrupted_record_is_reported_again(self):
+        sync = TxSync(":memory:", url_store=self.api)
+        changes = sync.changes("key")
+        first = next(changes)
+        second = next(changes)
+        changes.close()
+        remaining = sync.sync("key")
+        self.assertEqual(len(remaining), 19)
+        self.assertNotIn(first, remaining)
+        self.assertIn(second, remaining)
+
+    def test_forget(self):
+        sync = TxSync(":memory:", url_store=self.api)
+        sync.sync("key")
+        sync.forget("key")
+        self.assertEqual(len(sync.sync("key")), 20)
+
+    def test_api_key_is_not_stored(self):
+        sync = TxSync(self.path, url_store=self.api)
+        sync.sync("secretkey")
+        sync.close()
+        with open(self.path, "rb") as db:
+            self.assertNotIn(b"secretkey", db.read())
+
+
+if __name__ == "__main__":
+    unittest.main()
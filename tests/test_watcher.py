@@ -0,0 +1,60 @@
+import threading
+import time
+import unittest
+
+from shapeshiftio import AddressWatcher, ShapeShiftIO
+from shapeshiftio.mockserver import MockShapeShiftServer
+
+# Moves every address one step along on each event: no_deposits -> received -> complete.
+NEXT_STATUS = {"no_deposits": "received", "received": "complete"}
+
+
+class AddressWatcherTest(unittest.TestCase):
+    def setUp(self):
+        self.server = MockShapeShiftServer().start()
+        self.api = ShapeShiftIO(url_base=self.server.url)
+
+    def tearDown(self):
+        self.server.stop()
+
+    def test_events_follow_status_changes(self):
+        watcher = AddressWatcher(["addr1", "addr2"], url_store=self.api, idle_interval=0.02,
+                                 received_interval=0.02, track_expiry=False)
+        seen = {}
+        for event in watcher.events():
+            seen.setdefault(event.address, []).append(event.status)
+            if event.status in NEXT_STATUS:
+                self.server.set_status(event.address, NEXT_STATUS[event.status])
+        self.assertEqual(seen, {"addr1": ["no_deposits", "received", "complete"],
+                                "addr2": ["no_deposits", "received", "complete"]})
+        self.assertEqual(len(watcher), 0)
+
+    def test_expired_address(self):
+        deposit = self.api.send_amount({"pair": "btc_eth", "amount": "1", "withdrawal": "0xabc"})["success"]["deposit"]
+        with self.server._lock:
+            self.server.orders[deposit]["expiration"] = int(time.time() * 1000) - 1000
+        watcher = AddressWatcher([deposit], url_store=self.api, idle_interval=0.02)
+        self.assertEqual([event.status for event in watcher.events()], ["expired"])
+
+    def test_does_not_spin_while_workers_are_busy(self):
+        self.server.latency = 0.2
+        watcher = AddressWatcher(["addr%d" % i for i in range(20)], url_store=self.api, workers=2,
+                                 idle_interval=0.01, track_expiry=False)
+        timer = threading.Timer(1.0, watcher.stop)
+        timer.start()
+        cpu = time.process_time()
+        for _ in watcher.events():
+            pass
+        self.assertLess(time.process_time() - cpu, 0.5)
+
+    def test_stop_before_events(self):
+        watcher = AddressWatcher(["addr1"], url_store=self.api, idle_interval=0.02, track_expiry=False)
+        watcher.stop()
+        self.assertEqual(list(watcher.events()), [])
+        self.assertEqual(self.server.requests, 0)
+        # The stop() is used up by the events() it ended.
+        self.assertEqual(next(watcher.events()).status, "no_deposits")
+
+
+if __name__ == "__main__":
+    unittest.main()